@@ -1,13 +1,50 @@
+import asyncio
 import json
+import logging
 import os
-from typing import Dict, Any, List
-import aiohttp
-from .tools import TOOLS
+from typing import Dict, Any, List, AsyncIterator, Optional, Tuple
+from .tools import TOOLS, call_tool, render_tools
+from .llm_client import OllamaClient
+from .response_cache import ResponseCache
+from .token_budget import fit_tool_result, TOOL_RESULT_TOKEN_BUDGET
+from .session_store import Session, SessionStore, RECALL_TOOL
+
+logger = logging.getLogger(__name__)
+
+# LLM round trips per query, tool calls run at once, and seconds each tool may take
+AGENT_MAX_ITERATIONS = int(os.getenv('AGENT_MAX_ITERATIONS', '5'))
+AGENT_TOOL_CONCURRENCY = int(os.getenv('AGENT_TOOL_CONCURRENCY', '4'))
+AGENT_TOOL_TIMEOUT = float(os.getenv('AGENT_TOOL_TIMEOUT', '30'))
+# How long Ollama keeps the model (and its cached prompt prefix) loaded between requests
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+
+# Sent once the iteration budget is spent, to get an answer instead of more tool calls
+FINAL_ANSWER_PROMPT = "Tool budget exhausted. Answer the question with the tool results you already have."
+INCOMPLETE_ANSWER = "I couldn't complete the search for this question. Please try asking something more specific."
 
 class FederalRegisterAgent:
-    def __init__(self, model_name="qwen2.5-0.5b"):
+    def __init__(self, model_name="qwen2.5-0.5b", llm_client: Optional[OllamaClient] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 session_store: Optional[SessionStore] = None,
+                 tool_result_budget: int = TOOL_RESULT_TOKEN_BUDGET,
+                 max_iterations: int = AGENT_MAX_ITERATIONS,
+                 tool_concurrency: int = AGENT_TOOL_CONCURRENCY,
+                 tool_timeout: float = AGENT_TOOL_TIMEOUT,
+                 keep_alive: Optional[str] = OLLAMA_KEEP_ALIVE):
         self.model_name = model_name
+        self.keep_alive = keep_alive
+        # Upper bound on the tokens the tool results of one turn add to the conversation
+        self.tool_result_budget = tool_result_budget
+        self.max_iterations = max_iterations
+        self.tool_timeout = tool_timeout
+        self._tool_slots = asyncio.Semaphore(tool_concurrency)
         self.base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        # Shared HTTP client: keep-alive session, retries and a global concurrency limit
+        self.llm = llm_client or OllamaClient(self.base_url)
+        # Final answers keyed on normalized query + data version
+        self.response_cache = response_cache or ResponseCache()
+        # Multi-turn conversations, keyed per WebSocket connection or cookie
+        self.sessions = session_store or SessionStore()
         self.system_prompt = """You are a helpful assistant that provides information about Federal Register documents.
 You have access to a database of Federal Register documents and can search through them using various tools.
 When a user asks a question, you should:
@@ -18,91 +55,283 @@ When a user asks a question, you should:
 Available tools:
 {tools}
 
+To use a tool, reply with only a JSON object {{"name": "<tool>", "arguments": {{...}}}}.
+To use several tools at once (e.g. one search per agency), reply with a JSON list of such objects;
+they run in parallel and all results come back together.
+
 Remember to:
 - Be specific and accurate in your responses
 - Cite document numbers when referencing specific documents
 - Provide dates when discussing time-sensitive information
 - Summarize information when there are multiple relevant documents
+- Tool results are paginated; pass next_cursor back as cursor only if you need more documents
 """
+        # Rendered once: every request starts with the same bytes, so Ollama can
+        # reuse the evaluated prefix instead of re-reading the tool list each time
+        self.system_message = self.system_prompt.format(tools=render_tools(TOOLS))
+
+    def _llm_options(self) -> Dict[str, Any]:
+        return {"keep_alive": self.keep_alive} if self.keep_alive else {}
 
     async def _call_llm(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
         """Call the LLM API."""
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/api/chat",
-                json={
-                    "model": self.model_name,
-                    "messages": messages,
-                    "stream": False
-                }
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    raise Exception(f"LLM API call failed: {response.status}")
-
-    async def _execute_tool(self, tool_name: str, tool_args: Dict[str, Any]) -> Any:
-        """Execute a tool call."""
-        # Import the tool function dynamically
-        from .tools import globals()[tool_name]
-        tool_func = globals()[tool_name]
-        
-        # Execute the tool
-        return await tool_func(**tool_args)
-
-    async def process_query(self, user_query: str) -> str:
-        """Process a user query and return a response."""
-        # Prepare the system message with available tools
-        system_message = self.system_prompt.format(
-            tools=json.dumps(TOOLS, indent=2)
-        )
-        
-        # Initial messages
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_query}
+        return await self.llm.chat(self.model_name, messages, **self._llm_options())
+
+    async def _stream_llm(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Call the LLM API in streaming mode and yield content chunks as they arrive."""
+        async for chunk in self.llm.chat_stream(self.model_name, messages, **self._llm_options()):
+            content = chunk.get("message", {}).get("content", "")
+            if content:
+                yield content
+
+    @staticmethod
+    def _parse_tool_calls(assistant_message: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the tool calls in an assistant message, or None if it is a plain answer.
+
+        A single {"name", "arguments"} object, a list of them, or
+        {"tool_calls": [...]} are accepted.
+        """
+        try:
+            parsed = json.loads(assistant_message)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(parsed, dict) and isinstance(parsed.get("tool_calls"), list):
+            parsed = parsed["tool_calls"]
+        calls = parsed if isinstance(parsed, list) else [parsed]
+        if calls and all(isinstance(call, dict) and "name" in call and "arguments" in call for call in calls):
+            return calls
+        return None
+
+    async def _execute_tool(self, tool_name: str, tool_args: Dict[str, Any],
+                            session: Optional[Session] = None) -> Any:
+        """Execute a tool call through the registry, which validates the arguments.
+
+        recall_documents is answered from the session's retrieved documents;
+        documents returned by the other tools are added to the session.
+        """
+        if session is not None and tool_name == RECALL_TOOL:
+            return session.recall(tool_args.get("document_numbers"))
+        result = await call_tool(tool_name, tool_args)
+        if session is not None:
+            session.remember(result)
+        return result
+
+    async def _run_tool(self, tool_call: Dict[str, Any], session: Optional[Session] = None) -> Any:
+        """Execute one tool call under the concurrency cap and timeout; failures become error results."""
+        async with self._tool_slots:
+            try:
+                return await asyncio.wait_for(
+                    self._execute_tool(tool_call["name"], tool_call["arguments"], session),
+                    timeout=self.tool_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Tool {tool_call['name']} timed out after {self.tool_timeout}s")
+                return {"error": f"Tool timed out after {self.tool_timeout:g}s"}
+            except Exception as e:
+                logger.error(f"Tool {tool_call['name']} failed: {str(e)}")
+                return {"error": str(e)}
+
+    async def _execute_tools(self, tool_calls: List[Dict[str, Any]],
+                             session: Optional[Session] = None) -> List[Any]:
+        """Execute the tool calls of one turn concurrently; results are in call order."""
+        return await asyncio.gather(*(self._run_tool(tool_call, session) for tool_call in tool_calls))
+
+    def _initial_messages(self, user_query: str, session: Optional[Session] = None) -> List[Dict[str, str]]:
+        """System prompt, the session's history (if any) and the new question.
+
+        The system prompt always comes first and unchanged, so the cached
+        prompt prefix still applies to multi-turn conversations.
+        """
+        messages = [{"role": "system", "content": self.system_message}]
+        if session is not None:
+            messages.extend(session.messages())
+        messages.append({"role": "user", "content": user_query})
+        return messages
+
+    def _tool_result_message(self, tool_calls: List[Dict[str, Any]], results: List[Any]) -> Dict[str, str]:
+        """One conversation message carrying every result of a turn, within the token budget."""
+        if len(tool_calls) == 1:
+            return {"role": "user", "content": f"Tool result: {fit_tool_result(results[0], self.tool_result_budget)}"}
+        # The turn's budget is shared between its calls
+        budget = max(self.tool_result_budget // len(tool_calls), 100)
+        parts = [
+            f"{i}. {call['name']}({json.dumps(call['arguments'], default=str)}): {fit_tool_result(result, budget)}"
+            for i, (call, result) in enumerate(zip(tool_calls, results), 1)
         ]
+        return {"role": "user", "content": "Tool results:\n" + "\n".join(parts)}
+
+    @staticmethod
+    def _result_count(tool_result: Any) -> Optional[int]:
+        """Number of documents in a tool result, if it is a listing."""
+        if isinstance(tool_result, dict) and isinstance(tool_result.get("documents"), list):
+            return len(tool_result["documents"])
+        if isinstance(tool_result, list):
+            return len(tool_result)
+        return None
+
+    @staticmethod
+    def _tool_failed(results: List[Any]) -> bool:
+        """Whether a tool call of the turn failed or timed out."""
+        return any(isinstance(result, dict) and "error" in result for result in results)
+
+    async def process_query(self, user_query: str, session: Optional[Session] = None) -> str:
+        """Process a user query and return a response, served from the cache when possible.
+
+        With a session, earlier turns are part of the prompt and the exchange
+        is recorded. Only a session's first question can be answered from the
+        response cache, since follow-ups depend on the conversation, and only
+        complete answers (see _answer_query) are cached.
+        """
+        cacheable = session is None or session.is_new
+        cached = await self.response_cache.get(user_query) if cacheable else None
+        if cached is not None:
+            response = cached
+        else:
+            response, complete = await self._answer_query(user_query, session)
+            if cacheable and complete:
+                await self.response_cache.set(user_query, response)
+        if session is not None:
+            session.add_exchange(user_query, response)
+        return response
+
+    async def process_query_stream(self, user_query: str,
+                                   session: Optional[Session] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming counterpart of process_query; see _answer_query_stream for the events."""
+        cacheable = session is None or session.is_new
+        cached = await self.response_cache.get(user_query) if cacheable else None
+        if cached is not None:
+            if session is not None:
+                session.add_exchange(user_query, cached)
+            yield {"type": "token", "content": cached}
+            yield {"type": "done", "complete": True, "cached": True}
+            return
+
+        parts = []
+        async for event in self._answer_query_stream(user_query, session):
+            if event["type"] == "token":
+                parts.append(event["content"])
+            elif event["type"] == "done":
+                if cacheable and event["complete"]:
+                    await self.response_cache.set(user_query, "".join(parts))
+                if session is not None:
+                    session.add_exchange(user_query, "".join(parts))
+            yield event
+
+    async def _answer_query(self, user_query: str, session: Optional[Session] = None) -> Tuple[str, bool]:
+        """Run the tool-using LLM loop for a query; returns the final answer and whether it is complete.
+
+        An answer is incomplete when the tool budget ran out or a tool call
+        failed along the way, so it may not be worth repeating.
+        """
+        messages = self._initial_messages(user_query, session)
+        failed = False
         
-        while True:
+        for _ in range(self.max_iterations):
             # Get LLM response
             response = await self._call_llm(messages)
             assistant_message = response["message"]["content"]
             
-            # Check if the response contains a tool call
-            try:
-                tool_call = json.loads(assistant_message)
-                if isinstance(tool_call, dict) and "name" in tool_call and "arguments" in tool_call:
-                    # Execute the tool
-                    tool_result = await self._execute_tool(
-                        tool_call["name"],
-                        tool_call["arguments"]
-                    )
-                    
-                    # Add the tool result to the conversation
-                    messages.append({
-                        "role": "assistant",
-                        "content": assistant_message
-                    })
-                    messages.append({
-                        "role": "user",
-                        "content": f"Tool result: {json.dumps(tool_result)}"
-                    })
-                    continue
-            except json.JSONDecodeError:
-                # Not a tool call, return the response
-                return assistant_message
+            # Check if the response contains tool calls
+            tool_calls = self._parse_tool_calls(assistant_message)
+            if tool_calls is None:
+                return assistant_message, not failed
+
+            # Execute the tools concurrently
+            results = await self._execute_tools(tool_calls, session)
+            failed = failed or self._tool_failed(results)
             
-            return assistant_message
+            # Add all the tool results to the conversation in one turn
+            messages.append({
+                "role": "assistant",
+                "content": assistant_message
+            })
+            messages.append(self._tool_result_message(tool_calls, results))
+
+        logger.warning(f"Query reached {self.max_iterations} tool iterations, asking for a final answer")
+        messages.append({"role": "user", "content": FINAL_ANSWER_PROMPT})
+        response = await self._call_llm(messages)
+        assistant_message = response["message"]["content"]
+        if self._parse_tool_calls(assistant_message) is not None:
+            return INCOMPLETE_ANSWER, False
+        return assistant_message, False
+
+    async def _answer_query_stream(self, user_query: str,
+                                   session: Optional[Session] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Run the LLM loop for a query, yielding protocol events as the answer is generated.
+
+        Events are dicts with a "type" of "tool_started", "tool_finished",
+        "token" or "done"; tool events carry the call's index within its turn,
+        and "done" whether the answer is complete (as for _answer_query).
+        Output is buffered only while it could still be a tool call (i.e. it
+        starts with "{" or "["); otherwise tokens are relayed as soon as
+        Ollama emits them.
+        """
+        messages = self._initial_messages(user_query, session)
+        failed = False
+
+        for iteration in range(self.max_iterations + 1):
+            if iteration == self.max_iterations:
+                logger.warning(f"Query reached {self.max_iterations} tool iterations, asking for a final answer")
+                messages.append({"role": "user", "content": FINAL_ANSWER_PROMPT})
+
+            buffer = ""
+            streaming = False
+            async for chunk in self._stream_llm(messages):
+                if streaming:
+                    yield {"type": "token", "content": chunk}
+                    continue
+                buffer += chunk
+                prefix = buffer.lstrip()
+                if prefix and not prefix.startswith(("{", "[")):
+                    # Cannot be a tool call: flush the buffer and stream the rest
+                    streaming = True
+                    yield {"type": "token", "content": buffer}
+
+            complete = not failed and iteration < self.max_iterations
+            if streaming:
+                yield {"type": "done", "complete": complete}
+                return
+
+            tool_calls = self._parse_tool_calls(buffer)
+            if tool_calls is None:
+                # JSON-looking answer that is not a tool call
+                if buffer:
+                    yield {"type": "token", "content": buffer}
+                yield {"type": "done", "complete": complete}
+                return
+            if iteration == self.max_iterations:
+                break
+
+            for index, tool_call in enumerate(tool_calls):
+                yield {"type": "tool_started", "index": index, "name": tool_call["name"],
+                       "arguments": tool_call["arguments"]}
+            results = await self._execute_tools(tool_calls, session)
+            failed = failed or self._tool_failed(results)
+            for index, (tool_call, tool_result) in enumerate(zip(tool_calls, results)):
+                yield {
+                    "type": "tool_finished",
+                    "index": index,
+                    "name": tool_call["name"],
+                    "results": self._result_count(tool_result),
+                    "error": tool_result.get("error") if isinstance(tool_result, dict) else None
+                }
+
+            messages.append({"role": "assistant", "content": buffer})
+            messages.append(self._tool_result_message(tool_calls, results))
+
+        yield {"type": "token", "content": INCOMPLETE_ANSWER}
+        yield {"type": "done", "complete": False}
 
 if __name__ == "__main__":
     # Test the agent
-    import asyncio
-    
     async def test_agent():
         agent = FederalRegisterAgent()
-        response = await agent.process_query(
-            "What are the latest documents from the Environmental Protection Agency?"
-        )
-        print(response)
+        try:
+            response = await agent.process_query(
+                "What are the latest documents from the Environmental Protection Agency?"
+            )
+            print(response)
+        finally:
+            await agent.llm.close()
     
     asyncio.run(test_agent()) 
\ No newline at end of file
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+import aiomysql
+from data_pipeline.db_config import DB_CONFIG, POOL_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class DatabasePool:
+    """Process-wide aiomysql connection pool shared by all agent tools."""
+
+    def __init__(self, db_config: Optional[Dict[str, Any]] = None, minsize: int = 2,
+                 maxsize: int = 10, pool_recycle: int = 3600,
+                 health_check_interval: float = 30.0):
+        self.db_config = db_config or DB_CONFIG
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.pool_recycle = pool_recycle
+        self.health_check_interval = health_check_interval
+        self._pool = None
+        self._lock = asyncio.Lock()
+        # Last time each connection was handed back, used to decide when to ping it
+        self._last_used = weakref.WeakKeyDictionary()
+
+        # Metrics
+        self.waiters = 0
+        self.acquire_count = 0
+        self.acquire_time_total = 0.0
+        self.acquire_time_max = 0.0
+        self.health_check_failures = 0
+
+    async def start(self) -> None:
+        """Create the underlying pool if it does not exist yet."""
+        async with self._lock:
+            if self._pool is None:
+                self._pool = await aiomysql.create_pool(
+                    minsize=self.minsize,
+                    maxsize=self.maxsize,
+                    pool_recycle=self.pool_recycle,
+                    **self.db_config
+                )
+                logger.info(f"Database pool started (minsize={self.minsize}, maxsize={self.maxsize})")
+
+    async def warmup(self) -> None:
+        """Start the pool and verify that the initial connections are usable."""
+        await self.start()
+        conns = [await self._pool.acquire() for _ in range(self.minsize)]
+        try:
+            await asyncio.gather(*(conn.ping(reconnect=True) for conn in conns))
+        finally:
+            for conn in conns:
+                self._last_used[conn] = time.monotonic()
+                self._pool.release(conn)
+        logger.info(f"Database pool warmed up with {len(conns)} connections")
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        async with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                await self._pool.wait_closed()
+                self._pool = None
+                logger.info("Database pool closed")
+
+    async def _check_connection(self, conn) -> None:
+        """Ping a connection that has been idle longer than the health-check interval."""
+        last_used = self._last_used.get(conn)
+        if last_used is None or time.monotonic() - last_used < self.health_check_interval:
+            return
+        try:
+            await conn.ping(reconnect=True)
+        except Exception:
+            self.health_check_failures += 1
+            raise
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Check a connection out of the pool for the duration of the block."""
+        if self._pool is None:
+            await self.start()
+
+        self.waiters += 1
+        started = time.perf_counter()
+        try:
+            conn = await self._pool.acquire()
+        finally:
+            self.waiters -= 1
+        elapsed = time.perf_counter() - started
+        self.acquire_count += 1
+        self.acquire_time_total += elapsed
+        self.acquire_time_max = max(self.acquire_time_max, elapsed)
+
+        try:
+            await self._check_connection(conn)
+            yield conn
+        finally:
+            self._last_used[conn] = time.monotonic()
+            self._pool.release(conn)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return a snapshot of pool usage statistics."""
+        size = self._pool.size if self._pool is not None else 0
+        free = self._pool.freesize if self._pool is not None else 0
+        avg = self.acquire_time_total / self.acquire_count if self.acquire_count else 0.0
+        return {
+            "started": self._pool is not None,
+            "minsize": self.minsize,
+            "maxsize": self.maxsize,
+            "size": size,
+            "free": free,
+            "in_use": size - free,
+            "waiters": self.waiters,
+            "acquire_count": self.acquire_count,
+            "acquire_latency_avg_ms": round(avg * 1000, 3),
+            "acquire_latency_max_ms": round(self.acquire_time_max * 1000, 3),
+            "health_check_failures": self.health_check_failures
+        }
+
+_pool = None
+
+def get_pool() -> DatabasePool:
+    """Return the shared pool, creating it from POOL_CONFIG on first use."""
+    global _pool
+    if _pool is None:
+        _pool = DatabasePool(**POOL_CONFIG)
+    return _pool
+
+async def init_pool() -> DatabasePool:
+    """Start and warm up the shared pool (called at application startup)."""
+    pool = get_pool()
+    await pool.warmup()
+    return pool
+
+async def close_pool() -> None:
+    """Close the shared pool (called at application shutdown)."""
+    if _pool is not None:
+        await _pool.close()
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, Any, List, AsyncIterator, Optional
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_MAX_CONNECTIONS = int(os.getenv('OLLAMA_MAX_CONNECTIONS', '8'))
+OLLAMA_MAX_CONCURRENCY = int(os.getenv('OLLAMA_MAX_CONCURRENCY', '4'))
+OLLAMA_TIMEOUT = float(os.getenv('OLLAMA_TIMEOUT', '300'))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv('OLLAMA_CONNECT_TIMEOUT', '10'))
+OLLAMA_MAX_RETRIES = int(os.getenv('OLLAMA_MAX_RETRIES', '2'))
+
+class OllamaClient:
+    """Shared HTTP client for the Ollama chat API.
+
+    One keep-alive ClientSession is reused for every call. A global semaphore
+    caps in-flight generations so bursts queue here instead of overloading the
+    local Ollama server; connection errors and 429/5xx responses are retried
+    with exponential backoff as long as no output has been received yet.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url: str, max_connections: int = OLLAMA_MAX_CONNECTIONS,
+                 max_concurrency: int = OLLAMA_MAX_CONCURRENCY, timeout: float = OLLAMA_TIMEOUT,
+                 connect_timeout: float = OLLAMA_CONNECT_TIMEOUT, max_retries: int = OLLAMA_MAX_RETRIES,
+                 backoff_base: float = 0.5):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._limiter = asyncio.Semaphore(max_concurrency)
+
+        # Metrics
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.queued = 0
+        self._latencies = deque(maxlen=1000)
+        self._queue_waits = deque(maxlen=1000)
+        self._first_token_latencies = deque(maxlen=1000)
+        # Tokens Ollama evaluated for the prompt; low counts mean the cached prefix was reused
+        self.prompt_eval_tokens = 0
+        self.eval_tokens = 0
+        self._prompt_eval_counts = deque(maxlen=1000)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _acquire_slot(self) -> None:
+        self.queued += 1
+        started = time.perf_counter()
+        try:
+            await self._limiter.acquire()
+        finally:
+            self.queued -= 1
+        self._queue_waits.append(time.perf_counter() - started)
+        self.in_flight += 1
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        self._limiter.release()
+
+    async def _backoff(self, attempt: int, error: str) -> None:
+        delay = self.backoff_base * (2 ** attempt)
+        self.retries += 1
+        logger.warning(f"LLM API call failed ({error}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    def _record_usage(self, body: Dict[str, Any]) -> None:
+        """Record token counts from a response or the final stream chunk."""
+        prompt_tokens = body.get("prompt_eval_count")
+        if prompt_tokens is not None:
+            self.prompt_eval_tokens += prompt_tokens
+            self._prompt_eval_counts.append(prompt_tokens)
+        self.eval_tokens += body.get("eval_count") or 0
+
+    async def chat(self, model: str, messages: List[Dict[str, str]], **extra: Any) -> Dict[str, Any]:
+        """Non-streaming chat completion; returns Ollama's response body."""
+        payload = {"model": model, "messages": messages, "stream": False, **extra}
+        await self._acquire_slot()
+        started = time.perf_counter()
+        self.calls += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self._get_session().post(f"{self.base_url}/api/chat", json=payload) as response:
+                        if response.status == 200:
+                            body = await response.json()
+                            self._record_usage(body)
+                            return body
+                        error = f"status {response.status}"
+                        if response.status not in self.RETRY_STATUSES:
+                            break
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = f"{type(e).__name__}: {str(e)}"
+                if attempt < self.max_retries:
+                    await self._backoff(attempt, error)
+            self.errors += 1
+            raise Exception(f"LLM API call failed: {error}")
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+            self._release_slot()
+
+    async def chat_stream(self, model: str, messages: List[Dict[str, str]],
+                          **extra: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming chat completion; yields Ollama's NDJSON chunks as they arrive."""
+        payload = {"model": model, "messages": messages, "stream": True, **extra}
+        await self._acquire_slot()
+        started = time.perf_counter()
+        self.calls += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                received = False
+                try:
+                    async with self._get_session().post(f"{self.base_url}/api/chat", json=payload) as response:
+                        if response.status != 200:
+                            error = f"status {response.status}"
+                            if response.status not in self.RETRY_STATUSES:
+                                break
+                        else:
+                            # Ollama streams one JSON object per line
+                            async for line in response.content:
+                                if not line.strip():
+                                    continue
+                                if not received:
+                                    received = True
+                                    self._first_token_latencies.append(time.perf_counter() - started)
+                                chunk = json.loads(line)
+                                if chunk.get("done"):
+                                    self._record_usage(chunk)
+                                yield chunk
+                                if chunk.get("done"):
+                                    break
+                            return
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if received:
+                        # Output already reached the caller; retrying would duplicate it
+                        self.errors += 1
+                        raise
+                    error = f"{type(e).__name__}: {str(e)}"
+                if attempt < self.max_retries:
+                    await self._backoff(attempt, error)
+            self.errors += 1
+            raise Exception(f"LLM API call failed: {error}")
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+            self._release_slot()
+
+    @staticmethod
+    def _summary(samples) -> Dict[str, float]:
+        if not samples:
+            return {"avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(samples)
+        return {
+            "avg_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1)
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return call counts and latency statistics over the recent calls."""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "latency": self._summary(self._latencies),
+            "queue_wait": self._summary(self._queue_waits),
+            "first_token": self._summary(self._first_token_latencies),
+            "prompt_eval_tokens": self.prompt_eval_tokens,
+            "eval_tokens": self.eval_tokens,
+            "prompt_eval_per_call": round(
+                sum(self._prompt_eval_counts) / len(self._prompt_eval_counts), 1
+            ) if self._prompt_eval_counts else 0.0
+        }
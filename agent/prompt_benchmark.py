@@ -0,0 +1,176 @@
+import re
+import sys
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional
+from aiohttp import web
+from .agent import FederalRegisterAgent, OLLAMA_KEEP_ALIVE
+from .llm_client import OllamaClient
+from .response_cache import ResponseCache
+from .tools import TOOLS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUERIES = [
+    "What rules did the EPA publish last week?",
+    "Show the latest notices from the Commerce Department",
+    "Find documents about clean air standards",
+    "Which agencies published proposed rules in January 2024?",
+    "Summarize recent FDA guidance on medical devices",
+    "Any executive orders about artificial intelligence?",
+]
+
+def _duration(value: Any, default: float) -> float:
+    """Seconds of an Ollama keep_alive value ("30m", "1h", 300, ...)."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([smh]?)", str(value).strip())
+    if not match:
+        return default
+    return float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+
+class StubOllama:
+    """Minimal /api/chat server that models Ollama's prompt-prefix cache.
+
+    The model keeps the tokens of its last prompt while loaded; a request
+    only pays prompt evaluation for the tokens after the longest common
+    prefix. A model idle for longer than its keep_alive (Ollama's default is
+    five minutes) is unloaded, which drops the cache and costs a reload.
+    Time is virtual so idle gaps between user sessions can be simulated.
+    """
+
+    DEFAULT_KEEP_ALIVE = 300.0
+
+    def __init__(self, per_token_ms: float = 0.4, load_ms: float = 150.0):
+        self.per_token_ms = per_token_ms
+        self.load_ms = load_ms
+        self.clock = 0.0
+        self._cache: Dict[str, List[str]] = {}
+        self._expires: Dict[str, float] = {}
+
+    def reset(self) -> None:
+        """Unload every model and rewind the virtual clock."""
+        self.clock = 0.0
+        self._cache.clear()
+        self._expires.clear()
+
+    @staticmethod
+    def _tokens(messages: List[Dict[str, str]]) -> List[str]:
+        text = "".join(f"<|{m['role']}|>{m['content']}<|end|>" for m in messages)
+        return re.findall(r"\w+|[^\w\s]|\s+", text)
+
+    async def chat(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        model = body["model"]
+        tokens = self._tokens(body["messages"])
+
+        cold = self._expires.get(model, -1.0) < self.clock
+        if cold:
+            self._cache.pop(model, None)
+        cached = self._cache.get(model, [])
+        reused = 0
+        for a, b in zip(cached, tokens):
+            if a != b:
+                break
+            reused += 1
+        evaluated = len(tokens) - reused
+
+        delay_ms = evaluated * self.per_token_ms + (self.load_ms if cold else 0.0)
+        await asyncio.sleep(delay_ms / 1000)
+        self._cache[model] = tokens
+        self._expires[model] = self.clock + _duration(body.get("keep_alive"), self.DEFAULT_KEEP_ALIVE)
+
+        return web.json_response({
+            "model": model,
+            "message": {"role": "assistant", "content": "Here is a summary of the matching documents."},
+            "done": True,
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(evaluated * self.per_token_ms * 1e6),
+            "load_duration": int((self.load_ms if cold else 0.0) * 1e6),
+            "eval_count": 9
+        })
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post("/api/chat", self.chat)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        return runner
+
+async def run_scenario(stub: StubOllama, base_url: str, keep_alive: Optional[str],
+                       legacy_prompt: bool, rounds: int, idle_gap: float) -> Dict[str, Any]:
+    """Answer every query `rounds` times, advancing the virtual clock between queries.
+
+    The response cache keeps nothing, so every round reaches the model.
+    """
+    client = OllamaClient(base_url)
+    agent = FederalRegisterAgent(llm_client=client, keep_alive=keep_alive,
+                                 response_cache=ResponseCache(max_entries=0, db_path=None))
+    if legacy_prompt:
+        # The prompt as it was sent before: tool schemas as indented JSON
+        agent.system_message = agent.system_prompt.format(tools=json.dumps(TOOLS, indent=2))
+    stub.reset()
+
+    started = time.perf_counter()
+    try:
+        for _ in range(rounds):
+            for query in QUERIES:
+                await agent.process_query(query)
+                stub.clock += idle_gap
+    finally:
+        await client.close()
+    elapsed = time.perf_counter() - started
+    metrics = client.metrics()
+    return {
+        "keep_alive": keep_alive or "default",
+        "system_prompt_chars": len(agent.system_message),
+        "calls": metrics["calls"],
+        "prompt_eval_tokens": metrics["prompt_eval_tokens"],
+        "prompt_eval_per_call": metrics["prompt_eval_per_call"],
+        "latency": metrics["latency"],
+        "wall_s": round(elapsed, 2)
+    }
+
+async def main(rounds: int = 3, idle_gap: float = 120.0, port: int = 11935):
+    """Compare prompt evaluation before and after the precomputed prompt and keep_alive.
+
+    The prompt column changes only the prompt, so it compares with before
+    under the same keep_alive; after also sets OLLAMA_KEEP_ALIVE, which only
+    matters once idle_gap exceeds Ollama's default of five minutes.
+    """
+    stub = StubOllama()
+    runner = await stub.start(port)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        results = {
+            "before": await run_scenario(stub, base_url, None, True, rounds, idle_gap),
+            "prompt": await run_scenario(stub, base_url, None, False, rounds, idle_gap),
+            "after": await run_scenario(stub, base_url, OLLAMA_KEEP_ALIVE, False, rounds, idle_gap)
+        }
+    finally:
+        await runner.cleanup()
+
+    print(f"{len(QUERIES) * rounds} queries, {idle_gap:.0f}s (virtual) between queries")
+    print(f"{'':24}" + "".join(f"{name:>12}" for name in results))
+    for label, key in (("keep_alive", "keep_alive"),
+                       ("system prompt chars", "system_prompt_chars"),
+                       ("prompt eval tokens", "prompt_eval_tokens"),
+                       ("prompt eval per call", "prompt_eval_per_call")):
+        print(f"{label:24}" + "".join(f"{result[key]:>12}" for result in results.values()))
+    for label, key in (("latency avg ms", "avg_ms"), ("latency p95 ms", "p95_ms")):
+        print(f"{label:24}" + "".join(f"{result['latency'][key]:>12}" for result in results.values()))
+    return results
+
+if __name__ == "__main__":
+    # python -m agent.prompt_benchmark [rounds] [idle gap seconds]
+    args = sys.argv[1:]
+    asyncio.run(main(
+        rounds=int(args[0]) if args else 3,
+        idle_gap=float(args[1]) if len(args) > 1 else 120.0
+    ))
@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable
+import aiosqlite
+from data_pipeline.utils import get_data_version
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '256'))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+# Optional SQLite file that lets cached answers survive restarts
+RESPONSE_CACHE_DB = os.getenv('RESPONSE_CACHE_DB')
+
+CACHE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS response_cache (
+    key TEXT PRIMARY KEY,
+    version TEXT,
+    response TEXT,
+    expires_at REAL,
+    last_used REAL
+)
+"""
+
+class ResponseCache:
+    """LRU/TTL cache of final agent answers.
+
+    Keys are the normalized query text plus the current data version, so
+    answers are never served across an ingest; when the version changes the
+    stale entries are dropped from memory and from the optional disk store.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 db_path: Optional[str] = RESPONSE_CACHE_DB,
+                 version_func: Callable[[], str] = get_data_version):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.version_func = version_func
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._db: Optional[aiosqlite.Connection] = None
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case-fold, drop punctuation and collapse whitespace."""
+        query = re.sub(r"[^\w\s-]", " ", query.casefold())
+        return " ".join(query.split())
+
+    def _key(self, query: str, version: str) -> str:
+        return hashlib.sha256(f"{version}\0{self.normalize(query)}".encode('utf-8')).hexdigest()
+
+    async def _get_db(self) -> Optional[aiosqlite.Connection]:
+        if self.db_path is None:
+            return None
+        if self._db is None:
+            self._db = await aiosqlite.connect(self.db_path)
+            await self._db.execute(CACHE_SCHEMA_SQL)
+            await self._db.commit()
+        return self._db
+
+    async def _current_version(self) -> str:
+        """Return the data version, invalidating everything cached for an older one."""
+        version = self.version_func()
+        if version != self._version:
+            if self._version is not None:
+                self.invalidations += 1
+                logger.info("Data version changed, invalidating response cache")
+            self._version = version
+            self._entries.clear()
+            db = await self._get_db()
+            if db is not None:
+                await db.execute("DELETE FROM response_cache WHERE version != ?", (version,))
+                await db.commit()
+        return version
+
+    async def get(self, query: str) -> Optional[str]:
+        """Return the cached answer for a query, or None."""
+        version = await self._current_version()
+        key = self._key(query, version)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is None:
+            db = await self._get_db()
+            if db is not None:
+                async with db.execute(
+                    "SELECT response, expires_at FROM response_cache WHERE key = ?", (key,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                if row is not None:
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+
+        if entry is None or entry[1] < now:
+            if entry is not None:
+                self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    async def set(self, query: str, response: str) -> None:
+        """Cache the answer to a query."""
+        version = await self._current_version()
+        key = self._key(query, version)
+        now = time.time()
+        entry = (response, now + self.ttl)
+        self._remember(key, entry)
+
+        db = await self._get_db()
+        if db is not None:
+            await db.execute("""
+            INSERT INTO response_cache (key, version, response, expires_at, last_used)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+            response = excluded.response,
+            expires_at = excluded.expires_at,
+            last_used = excluded.last_used
+            """, (key, version, response, entry[1], now))
+            # Keep the disk store bounded as well
+            await db.execute("""
+            DELETE FROM response_cache WHERE expires_at < ? OR key NOT IN (
+                SELECT key FROM response_cache ORDER BY last_used DESC LIMIT ?
+            )
+            """, (now, self.max_entries * 4))
+            await db.commit()
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def close(self) -> None:
+        """Close the disk store, if any."""
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "persistent": self.db_path is not None
+        }
@@ -0,0 +1,249 @@
+import os
+import re
+import asyncio
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from data_pipeline.utils import get_data_version
+from .token_budget import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Tokens of conversation context (summary, retrieved-document index and turns) sent per query
+SESSION_TOKEN_BUDGET = int(os.getenv('SESSION_TOKEN_BUDGET', '1500'))
+# Seconds a session may sit idle before it is evicted, and sessions kept at most
+SESSION_IDLE_TTL = float(os.getenv('SESSION_IDLE_TTL', '1800'))
+SESSION_MAX = int(os.getenv('SESSION_MAX', '1000'))
+# Retrieved documents a session keeps for follow-up questions
+SESSION_MAX_DOCUMENTS = int(os.getenv('SESSION_MAX_DOCUMENTS', '30'))
+
+# Share of the budget the running summary of dropped turns may use
+SUMMARY_SHARE = 0.2
+# Characters of a dropped turn kept in the summary, and of a stored abstract
+SUMMARY_LINE_CHARS = 160
+ABSTRACT_CHARS = 600
+
+# Fields kept for retrieved documents, stored as tuples in this order
+DOCUMENT_FIELDS = ("document_number", "title", "publication_date", "document_type",
+                   "agency_names", "abstract")
+
+# Local tool answering from a session's retrieved documents, without the database
+RECALL_TOOL = "recall_documents"
+
+def _first_sentence(text: str, limit: int = SUMMARY_LINE_CHARS) -> str:
+    text = " ".join(text.split())
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= limit else sentence[:limit - 3] + "..."
+
+def _listing(result: Any) -> List[Dict[str, Any]]:
+    """Documents in a tool or search result, if it is a listing."""
+    if isinstance(result, dict):
+        result = result.get("documents")
+    if not isinstance(result, list):
+        return []
+    return [doc for doc in result if isinstance(doc, dict) and doc.get("document_number")]
+
+class Session:
+    """Conversation state of one client, kept compact.
+
+    Turns are (role, text, tokens) tuples holding only the user questions and
+    final answers, never the tool traffic. When they exceed the token budget
+    the oldest turns are folded into a short extractive summary; summary lines
+    beyond their share of the budget are dropped. Retrieved documents are kept
+    as field tuples (abstracts shortened) in LRU order so follow-ups can reuse
+    them through recall_documents. Queries continuing the conversation hold
+    lock, so they run one at a time and each sees the previous answer.
+    """
+
+    __slots__ = ("id", "turns", "summary", "documents", "version", "last_used", "token_budget",
+                 "max_documents", "recalls", "lock")
+
+    def __init__(self, session_id: str, version: str, token_budget: int = SESSION_TOKEN_BUDGET,
+                 max_documents: int = SESSION_MAX_DOCUMENTS):
+        self.id = session_id
+        self.turns: List[Tuple[str, str, int]] = []
+        self.summary: List[str] = []
+        self.documents: "OrderedDict[str, tuple]" = OrderedDict()
+        self.version = version
+        self.last_used = time.time()
+        self.token_budget = token_budget
+        self.max_documents = max_documents
+        self.recalls = 0
+        self.lock = asyncio.Lock()
+
+    @property
+    def is_new(self) -> bool:
+        return not self.turns and not self.summary
+
+    def add_exchange(self, question: str, answer: str) -> None:
+        """Record a question and its final answer, then fit the session to its budget."""
+        for role, text in (("user", question), ("assistant", answer)):
+            self.turns.append((role, text, estimate_tokens(text)))
+        self._fit()
+
+    def remember(self, result: Any) -> int:
+        """Keep the documents of a tool or search result. Returns how many were new."""
+        added = 0
+        for doc in _listing(result):
+            number = str(doc["document_number"])
+            stored = self.documents.pop(number, None)
+            values = []
+            for i, field in enumerate(DOCUMENT_FIELDS):
+                value = doc.get(field)
+                if value is None and stored is not None:
+                    # A projection without this field keeps what was stored before
+                    value = stored[i]
+                if isinstance(value, str) and field == "abstract" and len(value) > ABSTRACT_CHARS:
+                    value = value[:ABSTRACT_CHARS] + "..."
+                values.append(value)
+            self.documents[number] = tuple(values)
+            added += stored is None
+        while len(self.documents) > self.max_documents:
+            self.documents.popitem(last=False)
+        if added:
+            self._fit()
+        return added
+
+    def recall(self, document_numbers: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Stored documents by number (all of them if none are given), as a tool result."""
+        self.recalls += 1
+        if isinstance(document_numbers, str):
+            document_numbers = [number.strip() for number in document_numbers.split(",")]
+        numbers = [str(n) for n in document_numbers] if document_numbers else list(self.documents)
+        found = []
+        for number in numbers:
+            if number in self.documents:
+                self.documents.move_to_end(number)
+                found.append(dict(zip(DOCUMENT_FIELDS, self.documents[number])))
+        missing = [number for number in numbers if number not in self.documents]
+        result: Dict[str, Any] = {"documents": found}
+        if missing:
+            result["missing"] = missing
+            result["hint"] = "Not retrieved in this conversation; use a search tool"
+        return result
+
+    def find(self, text: str) -> List[Dict[str, Any]]:
+        """Stored documents whose numbers appear in the text."""
+        return [dict(zip(DOCUMENT_FIELDS, values))
+                for number, values in self.documents.items() if number in text]
+
+    def context(self) -> Optional[str]:
+        """Summary of dropped turns and an index of retrieved documents, or None."""
+        parts = []
+        if self.summary:
+            parts.append("Earlier in this conversation:\n" + "\n".join(self.summary))
+        if self.documents:
+            index = "\n".join(
+                f"- {number} ({values[2]}) {values[1]} [{values[4]}]"
+                for number, values in self.documents.items()
+            )
+            parts.append(
+                "Documents already retrieved in this conversation. If they answer a follow-up, "
+                f'call {{"name": "{RECALL_TOOL}", "arguments": {{"document_numbers": [...]}}}} '
+                "for their details instead of searching again:\n" + index
+            )
+        return "\n\n".join(parts) or None
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Conversation messages to place between the system prompt and a new question."""
+        context = self.context()
+        messages = [{"role": "system", "content": context}] if context else []
+        messages.extend({"role": role, "content": text} for role, text, _ in self.turns)
+        return messages
+
+    def tokens(self) -> int:
+        context = self.context()
+        return (estimate_tokens(context) if context else 0) + sum(tokens for _, _, tokens in self.turns)
+
+    def _fit(self) -> None:
+        # Fold the oldest turns into the summary, keeping at least the last exchange
+        while self.tokens() > self.token_budget and len(self.turns) > 2:
+            role, text, _ = self.turns.pop(0)
+            prefix = "User asked" if role == "user" else "Assistant answered"
+            self.summary.append(f"- {prefix}: {_first_sentence(text)}")
+            summary_budget = int(self.token_budget * SUMMARY_SHARE)
+            while self.summary and estimate_tokens("\n".join(self.summary)) > summary_budget:
+                self.summary.pop(0)
+        # Then shed the least recently used documents
+        while self.tokens() > self.token_budget and self.documents:
+            self.documents.popitem(last=False)
+
+class SessionStore:
+    """In-memory sessions keyed by WebSocket connection or cookie.
+
+    Sessions idle for longer than idle_ttl are evicted, and at most
+    max_sessions are kept (least recently used go first). Retrieved documents
+    are dropped when the data version changes, since an ingest may have
+    updated them; the conversation itself is kept.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX, idle_ttl: float = SESSION_IDLE_TTL,
+                 token_budget: int = SESSION_TOKEN_BUDGET, max_documents: int = SESSION_MAX_DOCUMENTS,
+                 version_func: Callable[[], str] = get_data_version):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.token_budget = token_budget
+        self.max_documents = max_documents
+        self.version_func = version_func
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+        # Metrics
+        self.created = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def get(self, session_id: Optional[str] = None) -> Session:
+        """The session with this id, or a new one if it is unknown or expired."""
+        now = time.time()
+        self._expire(now)
+        version = self.version_func()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            session = Session(session_id or self.new_id(), version, self.token_budget, self.max_documents)
+            self._sessions[session.id] = session
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        elif session.version != version:
+            session.documents.clear()
+            session.version = version
+        session.last_used = now
+        self._sessions.move_to_end(session.id)
+        return session
+
+    def drop(self, session_id: str) -> None:
+        """Forget a session."""
+        self._sessions.pop(session_id, None)
+
+    def _expire(self, now: float) -> None:
+        # Sessions are in last-used order, so the idle ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expirations += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return session counts and the memory they hold."""
+        self._expire(time.time())
+        sessions = list(self._sessions.values())
+        return {
+            "active": len(sessions),
+            "created": self.created,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "max_sessions": self.max_sessions,
+            "turns": sum(len(session.turns) for session in sessions),
+            "documents": sum(len(session.documents) for session in sessions),
+            "context_tokens": sum(session.tokens() for session in sessions),
+            "recalls": sum(session.recalls for session in sessions)
+        }
@@ -0,0 +1,74 @@
+import json
+import math
+import os
+from typing import Any, Dict, List
+
+# Tokens a single tool result may take up in the LLM context
+TOOL_RESULT_TOKEN_BUDGET = int(os.getenv('TOOL_RESULT_TOKEN_BUDGET', '1500'))
+
+# Roughly four characters per token for English prose and JSON
+CHARS_PER_TOKEN = 4
+
+# Successively tighter caps applied to long string fields (abstracts, snippets)
+FIELD_CHAR_CAPS = (1000, 500, 250, 120)
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; no tokenizer is needed to stay within a budget."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+def _shorten(document: Any, cap: int) -> Any:
+    if not isinstance(document, dict):
+        return document
+    return {
+        key: value[:cap] + "..." if isinstance(value, str) and len(value) > cap else value
+        for key, value in document.items()
+    }
+
+def fit_tool_result(result: Any, max_tokens: int = TOOL_RESULT_TOKEN_BUDGET) -> str:
+    """Serialize a tool result as compact JSON no larger than max_tokens.
+
+    Long text fields are shortened first; if that is not enough, trailing
+    documents are dropped and the result says how many were omitted, so the
+    model can ask for a smaller page or fewer fields instead of silently
+    missing data.
+    """
+    text = _dumps(result)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    if isinstance(result, list):
+        result = {"documents": result}
+    documents = result.get("documents") if isinstance(result, dict) else None
+    if not isinstance(documents, list):
+        # Not a document listing: cut the serialized text
+        return text[:max_tokens * CHARS_PER_TOKEN - 15] + "...(truncated)"
+
+    for cap in FIELD_CHAR_CAPS:
+        shortened = {**result, "documents": [_shorten(doc, cap) for doc in documents]}
+        text = _dumps(shortened)
+        if estimate_tokens(text) <= max_tokens:
+            return text
+
+    # Keep the longest prefix of documents that fits
+    documents: List[Dict[str, Any]] = shortened["documents"]
+    low, high = 0, len(documents)
+    best = None
+    while low <= high:
+        keep = (low + high) // 2
+        candidate = {
+            **shortened,
+            "documents": documents[:keep],
+            "next_cursor": None,
+            "omitted": len(documents) - keep,
+            "hint": "Result truncated to fit the context; request a smaller limit or fewer fields"
+        }
+        candidate_text = _dumps(candidate)
+        if estimate_tokens(candidate_text) <= max_tokens:
+            best = candidate_text
+            low = keep + 1
+        else:
+            high = keep - 1
+    return best if best is not None else candidate_text[:max_tokens * CHARS_PER_TOKEN]
@@ -1,153 +1,463 @@
+import os
+import json
+import time
+import base64
+import inspect
+import logging
+import typing
 import aiomysql
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from .db_config import DB_CONFIG
-
-async def search_documents_by_date(start_date: str, end_date: str) -> List[Dict[str, Any]]:
-    """Search for documents within a date range."""
-    pool = await aiomysql.create_pool(**DB_CONFIG)
-    
-    try:
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
-                sql = """
-                SELECT id, document_number, title, abstract, document_type, 
-                       publication_date, agency_names
-                FROM federal_register_documents
-                WHERE publication_date BETWEEN %s AND %s
-                ORDER BY publication_date DESC
-                """
-                await cur.execute(sql, (start_date, end_date))
-                results = await cur.fetchall()
-                return [dict(row) for row in results]
-    finally:
-        pool.close()
-        await pool.wait_closed()
-
-async def search_documents_by_agency(agency_name: str) -> List[Dict[str, Any]]:
-    """Search for documents from a specific agency."""
-    pool = await aiomysql.create_pool(**DB_CONFIG)
-    
-    try:
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
-                sql = """
-                SELECT id, document_number, title, abstract, document_type, 
-                       publication_date, agency_names
-                FROM federal_register_documents
-                WHERE agency_names LIKE %s
-                ORDER BY publication_date DESC
-                """
-                await cur.execute(sql, (f'%{agency_name}%',))
-                results = await cur.fetchall()
-                return [dict(row) for row in results]
-    finally:
-        pool.close()
-        await pool.wait_closed()
-
-async def get_latest_documents(limit: int = 10) -> List[Dict[str, Any]]:
-    """Get the most recent documents."""
-    pool = await aiomysql.create_pool(**DB_CONFIG)
-    
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Callable, Awaitable, Union
+from data_pipeline.retrieval import get_retriever
+from data_pipeline.utils import get_data_version
+from data_pipeline.agencies import resolve_agency
+from data_pipeline.storage import MySQLConnection
+from .db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Hard server-side cap on the rows a single tool call may return
+TOOL_MAX_ROWS = int(os.getenv('TOOL_MAX_ROWS', '50'))
+DEFAULT_PAGE_SIZE = 10
+
+# Seconds memoized tool results stay valid, and entries kept per tool
+TOOL_MEMO_TTL = float(os.getenv('TOOL_MEMO_TTL', '300'))
+TOOL_MEMO_SIZE = int(os.getenv('TOOL_MEMO_SIZE', '128'))
+
+# Columns a caller may project; id and publication_date are always read for the cursor
+DOCUMENT_FIELDS = ("id", "document_number", "title", "abstract", "document_type",
+                   "publication_date", "agency_names")
+DEFAULT_FIELDS = ("document_number", "title", "abstract", "document_type",
+                  "publication_date", "agency_names")
+
+# Next page of a (publication_date DESC, id DESC) listing
+DATE_KEYSET_SQL = "AND (publication_date < %s OR (publication_date = %s AND id < %s))"
+# Next page of a (score DESC, id DESC) relevance listing
+SCORE_KEYSET_SQL = "AND (score < %s OR (score = %s AND id < %s))"
+
+# Queries issued by the tools; check_db.py --explain runs EXPLAIN on each of them.
+# {columns} comes from _columns() and {keyset} is "" or one of the *_KEYSET_SQL clauses.
+DATE_RANGE_SQL = """
+SELECT {columns}
+FROM federal_register_documents
+WHERE publication_date BETWEEN %s AND %s {keyset}
+ORDER BY publication_date DESC, id DESC
+LIMIT %s
+"""
+
+AGENCY_DOCUMENTS_SQL = """
+SELECT {columns}
+FROM federal_register_documents
+WHERE id IN (
+    SELECT document_id FROM document_agencies WHERE agency_id IN ({placeholders})
+) {keyset}
+ORDER BY publication_date DESC, id DESC
+LIMIT %s
+"""
+
+LATEST_SQL = """
+SELECT {columns}
+FROM federal_register_documents
+WHERE 1 {keyset}
+ORDER BY publication_date DESC, id DESC
+LIMIT %s
+"""
+
+# Uses the ft_documents FULLTEXT index, ranked by relevance. The score is
+# rounded so the cursor can compare it exactly on the next page.
+KEYWORD_SQL = """
+SELECT * FROM (
+    SELECT {columns},
+           ROUND(MATCH(title, abstract, agency_names) AGAINST (%s IN NATURAL LANGUAGE MODE), 6) AS score
+    FROM federal_register_documents
+    WHERE MATCH(title, abstract, agency_names) AGAINST (%s IN NATURAL LANGUAGE MODE)
+) ranked
+WHERE 1 {keyset}
+ORDER BY score DESC, id DESC
+LIMIT %s
+"""
+
+def _page_size(limit: Optional[int]) -> int:
+    """Clamp a requested page size to [1, TOOL_MAX_ROWS]."""
     try:
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
-                sql = """
-                SELECT id, document_number, title, abstract, document_type, 
-                       publication_date, agency_names
-                FROM federal_register_documents
-                ORDER BY publication_date DESC
-                LIMIT %s
-                """
-                await cur.execute(sql, (limit,))
-                results = await cur.fetchall()
-                return [dict(row) for row in results]
-    finally:
-        pool.close()
-        await pool.wait_closed()
-
-async def search_documents_by_keyword(keyword: str) -> List[Dict[str, Any]]:
-    """Search for documents containing specific keywords in title or abstract."""
-    pool = await aiomysql.create_pool(**DB_CONFIG)
-    
+        limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, TOOL_MAX_ROWS))
+
+def _fields(fields: Optional[Sequence[str]]) -> List[str]:
+    """Validated projection; unknown names are ignored, an empty selection means the defaults."""
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",")]
+    selected = [field for field in (fields or []) if field in DOCUMENT_FIELDS]
+    return list(dict.fromkeys(selected)) or list(DEFAULT_FIELDS)
+
+def _columns(fields: List[str]) -> str:
+    """SELECT list for a projection, plus the columns the cursor needs."""
+    return ", ".join(dict.fromkeys(["id", "publication_date"] + fields))
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor for the position after a row."""
+    values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[list]:
+    """Inverse of encode_cursor; None for a missing or malformed cursor."""
+    if not cursor:
+        return None
     try:
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
-                sql = """
-                SELECT id, document_number, title, abstract, document_type, 
-                       publication_date, agency_names
-                FROM federal_register_documents
-                WHERE title LIKE %s OR abstract LIKE %s
-                ORDER BY publication_date DESC
-                """
-                search_term = f'%{keyword}%'
-                await cur.execute(sql, (search_term, search_term))
-                results = await cur.fetchall()
-                return [dict(row) for row in results]
-    finally:
-        pool.close()
-        await pool.wait_closed()
-
-# Tool definitions for the agent
-TOOLS = [
-    {
-        "name": "search_documents_by_date",
-        "description": "Search for Federal Register documents within a date range",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "start_date": {
-                    "type": "string",
-                    "description": "Start date in YYYY-MM-DD format"
-                },
-                "end_date": {
-                    "type": "string",
-                    "description": "End date in YYYY-MM-DD format"
-                }
-            },
-            "required": ["start_date", "end_date"]
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        return None
+    return values if isinstance(values, list) and len(values) == 2 else None
+
+def _keyset(cursor: Optional[str], clause: str) -> Tuple[str, list]:
+    """Keyset condition and parameters for a cursor, or ("", []) for the first page."""
+    position = decode_cursor(cursor)
+    if position is None:
+        return "", []
+    return clause, [position[0], position[0], position[1]]
+
+def _page(rows: List[Dict[str, Any]], fields: List[str], limit: int, sort_key: str) -> Dict[str, Any]:
+    """Project a fetched page (limit + 1 rows) and attach the cursor for the next one."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    documents = []
+    for row in rows:
+        document = {}
+        for field in fields:
+            value = row[field]
+            document[field] = value.isoformat() if isinstance(value, (date, datetime)) else value
+        documents.append(document)
+    return {
+        "documents": documents,
+        "next_cursor": encode_cursor([rows[-1][sort_key], rows[-1]["id"]]) if has_more else None
+    }
+
+class ToolError(ValueError):
+    """Unknown tool or arguments that do not match its schema."""
+
+# JSON schema types for the annotations tools use
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+def _json_schema(annotation: Any) -> Dict[str, Any]:
+    """JSON schema of a parameter annotation; Optional[X] is described as X."""
+    if typing.get_origin(annotation) is Union:
+        annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+    origin = typing.get_origin(annotation) or annotation
+    schema = {"type": JSON_TYPES.get(origin, "string")}
+    if origin is list and typing.get_args(annotation):
+        schema["items"] = _json_schema(typing.get_args(annotation)[0])
+    return schema
+
+class Tool:
+    """A registered tool: its function, JSON schema and optional memoized results."""
+
+    def __init__(self, func: Callable[..., Awaitable[Any]], description: str,
+                 params: Dict[str, Any], memoize_ttl: Optional[float] = None):
+        self.func = func
+        self.name = func.__name__
+        self.memoize_ttl = memoize_ttl
+        self._memo: "OrderedDict[str, Tuple[str, float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # Build the schema from the signature once; params adds descriptions and overrides
+        hints = typing.get_type_hints(func)
+        properties = {}
+        required = []
+        self.defaults = {}
+        for name, parameter in inspect.signature(func).parameters.items():
+            schema = _json_schema(hints.get(name, str))
+            extra = params.get(name, {})
+            schema.update({"description": extra} if isinstance(extra, str) else extra)
+            if parameter.default is inspect.Parameter.empty:
+                required.append(name)
+            elif parameter.default is not None:
+                schema["default"] = parameter.default
+            properties[name] = schema
+        self.properties = properties
+        self.required = required
+        self.schema = {
+            "name": self.name,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties}
         }
+        if required:
+            self.schema["parameters"]["required"] = required
+
+    def validate(self, arguments: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Check arguments against the schema, coercing stringly-typed numbers and booleans."""
+        if arguments is None:
+            arguments = {}
+        if not isinstance(arguments, dict):
+            raise ToolError(f"{self.name}: arguments must be an object")
+        missing = [name for name in self.required if arguments.get(name) in (None, "")]
+        if missing:
+            raise ToolError(f"{self.name}: missing required argument(s): {', '.join(missing)}")
+
+        validated = {}
+        for name, value in arguments.items():
+            schema = self.properties.get(name)
+            if schema is None:
+                # Models sometimes invent extra arguments; ignore them rather than fail the call
+                logger.warning(f"{self.name}: ignoring unknown argument {name!r}")
+                continue
+            if value is None:
+                continue
+            validated[name] = self._coerce(name, value, schema)
+        return validated
+
+    def _coerce(self, name: str, value: Any, schema: Dict[str, Any]) -> Any:
+        expected = schema["type"]
+        try:
+            if expected == "integer" and not isinstance(value, bool):
+                return int(value)
+            if expected == "number" and not isinstance(value, bool):
+                return float(value)
+            if expected == "boolean":
+                if isinstance(value, str) and value.lower() in ("true", "false"):
+                    return value.lower() == "true"
+                if isinstance(value, bool):
+                    return value
+            if expected == "string" and isinstance(value, (str, int, float)) and not isinstance(value, bool):
+                return str(value)
+            if expected == "array":
+                if isinstance(value, str):
+                    return [item.strip() for item in value.split(",") if item.strip()]
+                if isinstance(value, list):
+                    return value
+            if expected == "object" and isinstance(value, dict):
+                return value
+        except (TypeError, ValueError):
+            pass
+        raise ToolError(f"{self.name}: argument {name!r} must be of type {expected}")
+
+    async def __call__(self, arguments: Optional[Dict[str, Any]]) -> Any:
+        kwargs = self.validate(arguments)
+        if self.memoize_ttl is None:
+            return await self.func(**kwargs)
+
+        key = json.dumps(kwargs, sort_keys=True, default=str)
+        version = get_data_version()
+        now = time.monotonic()
+        entry = self._memo.get(key)
+        if entry is not None and entry[0] == version and entry[1] > now:
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+        self.misses += 1
+        result = await self.func(**kwargs)
+        self._memo[key] = (version, now + self.memoize_ttl, result)
+        self._memo.move_to_end(key)
+        while len(self._memo) > TOOL_MEMO_SIZE:
+            self._memo.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        """Drop memoized results."""
+        self._memo.clear()
+
+# Registered tools by name, and their schemas in registration order for the system prompt
+REGISTRY: Dict[str, Tool] = {}
+TOOLS: List[Dict[str, Any]] = []
+
+def tool(description: str, params: Optional[Dict[str, Any]] = None,
+         memoize_ttl: Optional[float] = None) -> Callable:
+    """Register an async function as an agent tool.
+
+    The JSON schema is derived from the signature: annotations give the
+    types, parameters without defaults are required, and params supplies
+    per-argument descriptions (a string) or schema overrides (a dict).
+    Results of idempotent tools can be memoized for memoize_ttl seconds;
+    entries are keyed by the validated arguments and dropped when the data
+    version changes, i.e. after every ingest.
+    """
+    def register(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        registered = Tool(func, description, params or {}, memoize_ttl)
+        REGISTRY[registered.name] = registered
+        TOOLS.append(registered.schema)
+        return func
+    return register
+
+async def call_tool(name: str, arguments: Optional[Dict[str, Any]]) -> Any:
+    """Validate arguments and dispatch a tool call by name."""
+    registered = REGISTRY.get(name)
+    if registered is None:
+        raise ToolError(f"Unknown tool: {name}")
+    return await registered(arguments)
+
+def tool_metrics() -> Dict[str, Any]:
+    """Memoization hit/miss counters of the tools that memoize."""
+    return {
+        name: {"hits": t.hits, "misses": t.misses, "size": len(t._memo), "ttl": t.memoize_ttl}
+        for name, t in REGISTRY.items() if t.memoize_ttl is not None
+    }
+
+def _type_label(schema: Dict[str, Any]) -> str:
+    if schema["type"] == "array" and "items" in schema:
+        return f"list of {schema['items']['type']}"
+    return schema["type"]
+
+def _describe(schema: Dict[str, Any]) -> str:
+    description = schema.get("description", "")
+    enum = schema.get("items", {}).get("enum") or schema.get("enum")
+    if enum:
+        description += f" (any of: {', '.join(enum)})"
+    return description
+
+def render_tools(tools: List[Dict[str, Any]]) -> str:
+    """Compact, prompt-friendly description of tool schemas.
+
+    One signature line per tool instead of indented JSON; an argument
+    description shared by several tools is written once under "Common
+    arguments". Roughly a third of the tokens of json.dumps(TOOLS, indent=2).
+    """
+    seen: Dict[Tuple[str, str], int] = {}
+    for schema in tools:
+        for name, prop in schema["parameters"]["properties"].items():
+            key = (name, _describe(prop))
+            seen[key] = seen.get(key, 0) + 1
+    common = {key for key, count in seen.items() if count > 1}
+
+    lines = []
+    for schema in tools:
+        required = set(schema["parameters"].get("required", []))
+        args = []
+        notes = []
+        for name, prop in schema["parameters"]["properties"].items():
+            arg = f"{name}{'' if name in required else '?'}: {_type_label(prop)}"
+            if "default" in prop:
+                arg += f" = {json.dumps(prop['default'])}"
+            args.append(arg)
+            if (name, _describe(prop)) not in common and _describe(prop):
+                notes.append(f"    {name}: {_describe(prop)}")
+        lines.append(f"- {schema['name']}({', '.join(args)}): {schema['description']}")
+        lines.extend(notes)
+
+    if common:
+        lines.append("Common arguments:")
+        lines.extend(f"    {name}: {description}" for name, description in sorted(common))
+    return "\n".join(lines)
+
+# Paging and projection parameters shared by the listing tools
+PAGE_PARAMS = {
+    "limit": f"Maximum number of documents to return (at most {TOOL_MAX_ROWS})",
+    "cursor": "next_cursor from a previous result, to fetch the following page",
+    "fields": {
+        "items": {"type": "string", "enum": list(DOCUMENT_FIELDS)},
+        "description": "Document fields to return; omit abstract to keep results short"
+    }
+}
+
+@tool(
+    "Search for Federal Register documents within a date range",
+    {
+        "start_date": "Start date in YYYY-MM-DD format",
+        "end_date": "End date in YYYY-MM-DD format",
+        **PAGE_PARAMS
     },
+    memoize_ttl=TOOL_MEMO_TTL
+)
+async def search_documents_by_date(start_date: str, end_date: str, limit: int = DEFAULT_PAGE_SIZE,
+                                   cursor: Optional[str] = None,
+                                   fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Search for documents within a date range, newest first, one page at a time."""
+    limit, fields = _page_size(limit), _fields(fields)
+    keyset, keyset_params = _keyset(cursor, DATE_KEYSET_SQL)
+    async with get_pool().acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            sql = DATE_RANGE_SQL.format(columns=_columns(fields), keyset=keyset)
+            await cur.execute(sql, [start_date, end_date] + keyset_params + [limit + 1])
+            results = await cur.fetchall()
+            return _page(results, fields, limit, "publication_date")
+
+@tool(
+    "Search for Federal Register documents from a specific agency, including its sub-agencies",
     {
-        "name": "search_documents_by_agency",
-        "description": "Search for Federal Register documents from a specific agency",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "agency_name": {
-                    "type": "string",
-                    "description": "Name of the agency to search for"
-                }
-            },
-            "required": ["agency_name"]
-        }
+        "agency_name": "Name, slug or id of the agency to search for",
+        "include_subagencies": "Also return documents from agencies under this one",
+        **PAGE_PARAMS
     },
+    memoize_ttl=TOOL_MEMO_TTL
+)
+async def search_documents_by_agency(agency_name: str, include_subagencies: bool = True,
+                                     limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                     fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Search for documents from a specific agency (id, slug or name), optionally including its sub-agencies."""
+    limit, fields = _page_size(limit), _fields(fields)
+    keyset, keyset_params = _keyset(cursor, DATE_KEYSET_SQL)
+    async with get_pool().acquire() as conn:
+        # Agencies are resolved like the retriever's, through the storage layer
+        agency_ids = await resolve_agency(MySQLConnection(conn), agency_name, include_subagencies)
+        if not agency_ids:
+            return {"documents": [], "next_cursor": None}
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            placeholders = ", ".join(["%s"] * len(agency_ids))
+            sql = AGENCY_DOCUMENTS_SQL.format(columns=_columns(fields), placeholders=placeholders, keyset=keyset)
+            await cur.execute(sql, agency_ids + keyset_params + [limit + 1])
+            results = await cur.fetchall()
+            return _page(results, fields, limit, "publication_date")
+
+@tool("Get the most recent Federal Register documents", PAGE_PARAMS, memoize_ttl=TOOL_MEMO_TTL)
+async def get_latest_documents(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                               fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Get the most recent documents."""
+    limit, fields = _page_size(limit), _fields(fields)
+    keyset, keyset_params = _keyset(cursor, DATE_KEYSET_SQL)
+    async with get_pool().acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            sql = LATEST_SQL.format(columns=_columns(fields), keyset=keyset)
+            await cur.execute(sql, keyset_params + [limit + 1])
+            results = await cur.fetchall()
+            return _page(results, fields, limit, "publication_date")
+
+@tool(
+    "Search for Federal Register documents containing specific keywords",
     {
-        "name": "get_latest_documents",
-        "description": "Get the most recent Federal Register documents",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "limit": {
-                    "type": "integer",
-                    "description": "Maximum number of documents to return",
-                    "default": 10
-                }
-            }
-        }
+        "keyword": "Keyword to search for in title or abstract",
+        **PAGE_PARAMS
     },
+    memoize_ttl=TOOL_MEMO_TTL
+)
+async def search_documents_by_keyword(keyword: str, limit: int = DEFAULT_PAGE_SIZE,
+                                      cursor: Optional[str] = None,
+                                      fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Search for documents containing specific keywords in title or abstract, most relevant first."""
+    limit, fields = _page_size(limit), _fields(fields)
+    keyset, keyset_params = _keyset(cursor, SCORE_KEYSET_SQL)
+    async with get_pool().acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            sql = KEYWORD_SQL.format(columns=_columns(fields), keyset=keyset)
+            await cur.execute(sql, [keyword, keyword] + keyset_params + [limit + 1])
+            results = await cur.fetchall()
+            return _page(results, fields, limit, "score")
+
+@tool(
+    "Search Federal Register documents by exact terms (document numbers, acronyms) and by meaning, "
+    "optionally filtered by date range, agency or document type",
     {
-        "name": "search_documents_by_keyword",
-        "description": "Search for Federal Register documents containing specific keywords",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "keyword": {
-                    "type": "string",
-                    "description": "Keyword to search for in title or abstract"
-                }
-            },
-            "required": ["keyword"]
-        }
+        "query": "Free-text question or keywords",
+        "limit": PAGE_PARAMS["limit"],
+        "start_date": "Earliest publication date in YYYY-MM-DD format",
+        "end_date": "Latest publication date in YYYY-MM-DD format",
+        "agency": "Agency name to restrict results to",
+        "document_type": "Document type, e.g. Rule, Proposed Rule, Notice",
+        "fields": PAGE_PARAMS["fields"]
     }
-] 
\ No newline at end of file
+)
+async def hybrid_search(query: str, limit: int = DEFAULT_PAGE_SIZE, start_date: Optional[str] = None,
+                        end_date: Optional[str] = None, agency: Optional[str] = None,
+                        document_type: Optional[str] = None,
+                        fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Search documents by exact terms and meaning at once, with optional filters."""
+    limit, fields = _page_size(limit), _fields(fields)
+    results = await get_retriever().search(
+        query, limit=limit, start_date=start_date, end_date=end_date,
+        agency=agency, document_type=document_type
+    )
+    # Fused rankings have no stable sort key to page on, so there is no cursor
+    documents = [{**{field: doc[field] for field in fields}, "snippet": doc["snippet"]} for doc in results]
+    return {"documents": documents, "next_cursor": None}
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from contextlib import nullcontext
+from typing import Dict, Any
+from fastapi import WebSocket, WebSocketDisconnect
+
+logger = logging.getLogger(__name__)
+
+# Queries a single connection may run at once, and may have waiting behind them
+WS_MAX_CONCURRENCY = int(os.getenv('WS_MAX_CONCURRENCY', '2'))
+WS_MAX_PENDING = int(os.getenv('WS_MAX_PENDING', '8'))
+
+class ConnectionHandler:
+    """Runs the queries of one WebSocket connection concurrently.
+
+    Client frames are either plain text (a query) or JSON:
+      {"type": "query", "id": "<optional request id>", "text": "..."}
+      {"type": "cancel", "id": "<request id>"}
+
+    Each query becomes a task; at most max_concurrency run at once and up to
+    max_pending more wait in FIFO order. Queries beyond that are rejected so a
+    single client cannot monopolize the LLM backend. Every server frame carries
+    the request_id it belongs to. Disconnecting cancels all in-flight queries.
+    Queries share the connection's conversation session, if one is given; they
+    then take turns on the session's lock, in the order they arrived, since
+    each continues the conversation the previous one left.
+    """
+
+    def __init__(self, websocket: WebSocket, agent, max_concurrency: int = WS_MAX_CONCURRENCY,
+                 max_pending: int = WS_MAX_PENDING, session=None):
+        self.websocket = websocket
+        self.agent = agent
+        self.session = session
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._send_lock = asyncio.Lock()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._closed = False
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        """Send a frame; frames from concurrent queries are serialized."""
+        if self._closed:
+            return
+        async with self._send_lock:
+            try:
+                await self.websocket.send_json(frame)
+            except Exception:
+                # The client went away; run() cancels the remaining queries
+                self._closed = True
+
+    async def run(self) -> None:
+        """Read client frames until the socket closes."""
+        try:
+            while True:
+                message = await self.websocket.receive_text()
+                await self._dispatch(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._closed = True
+            await self._cancel_all()
+
+    async def _dispatch(self, message: str) -> None:
+        try:
+            frame = json.loads(message)
+        except json.JSONDecodeError:
+            frame = None
+        if not isinstance(frame, dict):
+            frame = {"type": "query", "text": message}
+
+        if frame.get("type") == "cancel":
+            await self.cancel(str(frame.get("id")))
+        elif frame.get("type") == "query":
+            await self.submit(str(frame.get("id") or uuid.uuid4().hex[:12]), str(frame.get("text", "")))
+        else:
+            await self.send({"type": "error", "request_id": frame.get("id"),
+                             "message": f"Unknown frame type: {frame.get('type')}"})
+
+    async def submit(self, request_id: str, text: str) -> None:
+        """Queue a query, or reject it if the connection is over its limits."""
+        if request_id in self._tasks:
+            await self.send({"type": "error", "request_id": request_id, "message": "Duplicate request id"})
+            return
+        if len(self._tasks) >= self.max_concurrency + self.max_pending:
+            await self.send({"type": "error", "request_id": request_id, "message": "Too many pending requests"})
+            return
+
+        task = asyncio.create_task(self._handle(request_id, text))
+        self._tasks[request_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(request_id, None))
+
+    async def cancel(self, request_id: str) -> None:
+        """Cancel a queued or running query and confirm it to the client."""
+        task = self._tasks.get(request_id)
+        if task is None:
+            return
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if task.cancelled():
+            await self.send({"type": "cancelled", "request_id": request_id})
+
+    async def _cancel_all(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _handle(self, request_id: str, text: str) -> None:
+        try:
+            await self.send({"type": "accepted", "request_id": request_id})
+            # Wait for the session before taking a slot, so waiting queries hold none
+            async with self.session.lock if self.session is not None else nullcontext():
+                async with self._slots:
+                    async for event in self.agent.process_query_stream(text, self.session):
+                        event["request_id"] = request_id
+                        await self.send(event)
+        except Exception as e:
+            logger.error(f"Error processing query {request_id}: {str(e)}")
+            await self.send({"type": "error", "request_id": request_id, "message": str(e)})
@@ -2,9 +2,12 @@ from fastapi import FastAPI, WebSocket
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
+from starlette.websockets import WebSocketState
 from fastapi import Request
 import json
 import asyncio
+import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 import sys
 
@@ -13,8 +16,28 @@ project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
 from agent.agent import FederalRegisterAgent
+from agent.db_pool import init_pool, close_pool, get_pool
+from agent.tools import tool_metrics
+from data_pipeline.retrieval import get_retriever, close_retriever
+from api.connection import ConnectionHandler
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up the shared database pool on startup; close the shared resources on shutdown."""
+    try:
+        await init_pool()
+    except Exception as e:
+        # Tools will retry lazily on first use
+        logger.error(f"Database pool warmup failed: {str(e)}")
+    yield
+    await agent.llm.close()
+    await agent.response_cache.close()
+    await close_pool()
+    await close_retriever()
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -25,31 +48,58 @@ templates = Jinja2Templates(directory="templates")
 # Create agent instance
 agent = FederalRegisterAgent()
 
+# Cookie naming the conversation session; the WebSocket handshake sends it back
+SESSION_COOKIE = "session_id"
+
 @app.get("/", response_class=HTMLResponse)
 async def get_chat_interface(request: Request):
-    """Serve the chat interface."""
-    return templates.TemplateResponse("chat.html", {"request": request})
+    """Serve the chat interface, starting a conversation session if there is none."""
+    response = templates.TemplateResponse("chat.html", {"request": request})
+    if SESSION_COOKIE not in request.cookies:
+        response.set_cookie(SESSION_COOKIE, agent.sessions.new_id(), httponly=True, samesite="lax")
+    return response
+
+@app.get("/metrics")
+async def metrics():
+    """Expose runtime metrics for the shared resources."""
+    return {
+        "db_pool": get_pool().metrics(),
+        "llm": agent.llm.metrics(),
+        "response_cache": agent.response_cache.metrics(),
+        "tool_memo": tool_metrics(),
+        "sessions": agent.sessions.metrics(),
+        "retriever_pool": get_retriever().repository.metrics()
+    }
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    """Handle WebSocket connections for chat."""
+    """Handle WebSocket connections for chat.
+
+    Queries are sent as plain text or {"type": "query", "id": ..., "text": ...}
+    and cancelled with {"type": "cancel", "id": ...}; see ConnectionHandler.
+    Queries continue the conversation of the session_id cookie (or, without
+    one, of this connection), so follow-ups see earlier turns and documents.
+    The server answers with JSON frames tagged with the request_id:
+      {"type": "accepted"}                  (query queued)
+      {"type": "tool_started", "index": i, "name": ..., "arguments": {...}}
+      {"type": "tool_finished", "index": i, "name": ..., "results": <row count>, "error": ...}
+                                            (one pair per call; a turn's calls run in parallel)
+      {"type": "token", "content": "..."}   (answer text, in order)
+      {"type": "done", "complete": bool}    (end of this answer; complete is false when the
+                                            tool budget ran out or a tool failed)
+      {"type": "cancelled"}
+      {"type": "error", "message": "..."}
+    """
     await websocket.accept()
-    
+    session = agent.sessions.get(websocket.cookies.get(SESSION_COOKIE))
+
     try:
-        while True:
-            # Receive message from client
-            message = await websocket.receive_text()
-            
-            # Process the message with the agent
-            response = await agent.process_query(message)
-            
-            # Send response back to client
-            await websocket.send_text(response)
-            
+        await ConnectionHandler(websocket, agent, session=session).run()
     except Exception as e:
         print(f"WebSocket error: {str(e)}")
     finally:
-        await websocket.close()
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
 
 if __name__ == "__main__":
     import uvicorn
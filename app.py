@@ -1,55 +1,75 @@
-from fastapi import FastAPI, Request, Form
+from fastapi import FastAPI, Request, Form, Query, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
-import aiosqlite
-from pathlib import Path
+from contextlib import asynccontextmanager
+import asyncio
 import logging
-from typing import List, Dict
+import sqlite3
+from typing import List, Dict, Optional
+from data_pipeline.retrieval import HybridRetriever
+from data_pipeline.storage import SQLiteRepository, open_repository
+from data_pipeline.payloads import load_payload
+from agent.session_store import Session, SessionStore
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Read-only connection pool and retriever, created at startup
+repository: Optional[SQLiteRepository] = None
+retriever: Optional[HybridRetriever] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the reader pool for the application's lifetime and close it on shutdown."""
+    global repository, retriever
+    # Connections to the SQLite replica (or its published snapshot) at READ_DATABASE_URL
+    repository = open_repository(readonly=True)
+    if not isinstance(repository, SQLiteRepository):
+        # Search runs on the FTS5 index, so the web tier always reads SQLite
+        raise RuntimeError("READ_DATABASE_URL must be an sqlite:/// URL")
+    # Lexical (FTS5/BM25) + vector retrieval fused with reciprocal rank fusion
+    retriever = HybridRetriever(repository.path, repository=repository)
+    try:
+        await repository.warmup()
+    except Exception as e:
+        # Connections are opened lazily on first use instead
+        logger.error(f"Database warmup failed: {str(e)}")
+    yield
+    await repository.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files and templates
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
+# Conversation history and retrieved documents per session_id cookie
+sessions = SessionStore()
+SESSION_COOKIE = "session_id"
+
 class ChatMessage:
     def __init__(self, role: str, content: str):
         self.role = role
         self.content = content
 
-async def search_documents(query: str) -> List[Dict]:
-    """Search for relevant documents in the database."""
-    db_path = Path("data_pipeline/rag_chat.db")
-    if not db_path.exists():
-        logger.error(f"Database not found at {db_path}")
-        return []
+async def search_documents(query: str, session: Optional[Session] = None) -> List[Dict]:
+    """Search for relevant documents in the database.
+
+    A follow-up naming documents the session already retrieved is answered
+    from the session without querying the database again.
+    """
+    if session is not None:
+        known = session.find(query)
+        if known:
+            return known
 
     try:
-        async with aiosqlite.connect(db_path) as db:
-            search_query = """
-                SELECT id, document_number, title, abstract, publication_date, agency_names 
-                FROM federal_register_documents 
-                WHERE title LIKE ? OR abstract LIKE ?
-                ORDER BY publication_date DESC 
-                LIMIT 5
-            """
-            search_term = f"%{query}%"
-            async with db.execute(search_query, (search_term, search_term)) as cursor:
-                rows = await cursor.fetchall()
-            
-            return [{
-                "id": row[0],
-                "document_number": row[1],
-                "title": row[2],
-                "abstract": row[3],
-                "publication_date": row[4],
-                "agency_names": row[5]
-            } for row in rows]
+        results = await retriever.search(query, limit=5)
+        if session is not None:
+            session.remember(results)
+        return results
     except Exception as e:
         logger.error(f"Error searching documents: {str(e)}")
         return []
@@ -63,6 +83,7 @@ async def generate_response(query: str, context_docs: List[Dict]) -> str:
         f"Document {doc['document_number']} ({doc['publication_date']}):\n"
         f"Title: {doc['title']}\n"
         f"Abstract: {doc['abstract']}\n"
+        f"Excerpt: {doc.get('snippet') or ''}\n"
         f"Agency: {doc['agency_names']}"
         for doc in context_docs
     ])
@@ -71,25 +92,65 @@ async def generate_response(query: str, context_docs: List[Dict]) -> str:
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    """Render the chat interface."""
-    return templates.TemplateResponse("index.html", {
+    """Render the chat interface, with the history of the current session."""
+    session = sessions.get(request.cookies.get(SESSION_COOKIE))
+    response = templates.TemplateResponse("index.html", {
         "request": request,
-        "messages": []
+        "messages": [ChatMessage(role, text) for role, text, _ in session.turns]
     })
+    response.set_cookie(SESSION_COOKIE, session.id, httponly=True, samesite="lax")
+    return response
+
+@app.get("/search")
+async def search(q: str, limit: int = Query(10, ge=1, le=100), start_date: Optional[str] = None,
+                 end_date: Optional[str] = None, agency: Optional[str] = None,
+                 document_type: Optional[str] = None):
+    """Hybrid document search as JSON, with optional metadata filters."""
+    try:
+        results = await retriever.search(
+            q, limit=limit, start_date=start_date, end_date=end_date,
+            agency=agency, document_type=document_type
+        )
+    except (asyncio.TimeoutError, sqlite3.OperationalError) as e:
+        # Every reader busy past the checkout timeout, or no database to read
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {str(e) or 'busy'}")
+    return {"query": q, "count": len(results), "results": results}
+
+@app.get("/documents/{document_number}")
+async def get_document(document_number: str):
+    """The full API document; payloads are only read and decompressed here."""
+    try:
+        async with repository.acquire() as conn:
+            document = await load_payload(conn.raw, document_number)
+    except (asyncio.TimeoutError, sqlite3.OperationalError) as e:
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {str(e) or 'busy'}")
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+@app.get("/metrics")
+async def metrics():
+    """Expose reader pool and session metrics."""
+    return {
+        "reader_pool": repository.metrics(),
+        "sessions": sessions.metrics()
+    }
 
 @app.post("/chat", response_class=HTMLResponse)
 async def chat(request: Request, query: str = Form(...)):
-    """Handle chat messages and return responses."""
+    """Handle chat messages and return the conversation so far."""
+    session = sessions.get(request.cookies.get(SESSION_COOKIE))
     try:
-        context_docs = await search_documents(query)
+        context_docs = await search_documents(query, session)
         response = await generate_response(query, context_docs)
-        return templates.TemplateResponse("chat_messages.html", {
+        session.add_exchange(query, response)
+        # Older turns may have been folded into the session summary
+        page = templates.TemplateResponse("chat_messages.html", {
             "request": request,
-            "messages": [
-                ChatMessage("user", query),
-                ChatMessage("assistant", response)
-            ]
+            "messages": [ChatMessage(role, text) for role, text, _ in session.turns]
         })
+        page.set_cookie(SESSION_COOKIE, session.id, httponly=True, samesite="lax")
+        return page
     except Exception as e:
         logger.error(f"Error processing chat: {str(e)}")
         return templates.TemplateResponse("error.html", {
@@ -1,28 +1,142 @@
+import sys
+import asyncio
 import sqlite3
 from pathlib import Path
+from typing import Optional
 
-def check_database():
-    db_path = Path("data_pipeline/rag_chat.db")
-    if not db_path.exists():
+async def _check_database(database_url: Optional[str] = None):
+    from data_pipeline.storage import SQLiteRepository, open_repository
+
+    repository = open_repository(database_url, readonly=True)
+    if isinstance(repository, SQLiteRepository) and not repository.path.exists():
         print("Database file not found!")
         return
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Check documents count
-    cursor.execute("SELECT COUNT(*) FROM federal_register_documents")
-    count = cursor.fetchone()[0]
-    print(f"Number of documents in database: {count}")
+    async with repository:
+        async with repository.acquire() as conn:
+            # Check documents count
+            count = await conn.count_documents()
+            print(f"Number of documents in database: {count}")
 
-    # Check pipeline logs
-    cursor.execute("SELECT * FROM pipeline_logs ORDER BY created_at DESC LIMIT 5")
-    logs = cursor.fetchall()
+            # Check pipeline logs
+            logs = await conn.recent_pipeline_logs(5)
     print("\nRecent pipeline logs:")
     for log in logs:
-        print(f"Pipeline: {log[1]}, Status: {log[2]}, Records: {log[5]}")
+        print(f"Pipeline: {log[0]}, Status: {log[1]}, Records: {log[4]}")
+
+def check_database(database_url: Optional[str] = None):
+    """Print the document count and recent pipeline runs (READ_DATABASE_URL by default)."""
+    asyncio.run(_check_database(database_url))
+
+def sqlite_queries():
+    """(name, sql, params) for every read query the app and retriever issue against SQLite."""
+    from data_pipeline import retrieval
+    from data_pipeline.agencies import AGENCY_TREE_SQL, agency_lookup_sql
+    from data_pipeline.storage import SQLITE
+
+    date_filter = "AND d.publication_date >= ? AND d.publication_date <= ?"
+    date_params = ["2024-01-01", "2024-12-31"]
+    type_filter = "AND d.document_type = ?"
+    agency_filter = "AND d.id IN (SELECT document_id FROM document_agencies WHERE agency_id IN (?, ?))"
+    return [
+        ("exact document number", retrieval.EXACT_SQL.format(placeholders="?", filters=""), ["2024-30535"]),
+        ("lexical, no filters", retrieval.LEXICAL_SQL.format(filters=""), ['"rule"', 50]),
+        ("lexical, date range", retrieval.LEXICAL_SQL.format(filters=date_filter), ['"rule"'] + date_params + [50]),
+        ("candidates, date range", retrieval.CANDIDATES_SQL.format(filters=date_filter), date_params),
+        ("candidates, document type", retrieval.CANDIDATES_SQL.format(filters=type_filter), ["Rule"]),
+        ("candidates, agency", retrieval.CANDIDATES_SQL.format(filters=agency_filter), [54, 361]),
+        ("fetch by id", retrieval.FETCH_SQL.format(placeholders="?, ?"), ["2024-30535", "2024-30747"]),
+        ("agency lookup", agency_lookup_sql(SQLITE), [None, "commerce-department", "commerce-department"]),
+        ("agency tree", AGENCY_TREE_SQL.format(placeholders="?"), [54]),
+        ("document hashes", "SELECT id, content_hash FROM document_hashes WHERE id IN (?, ?)",
+         ["2024-30535", "2024-30747"])
+    ]
 
+# Plan steps that read every row without being a problem
+ACCEPTABLE_SCANS = ("VIRTUAL TABLE INDEX", "SCAN CONSTANT ROW", "SCAN tree")
+
+def explain_sqlite(db_path: Path) -> int:
+    """Print EXPLAIN QUERY PLAN for each query and flag full scans. Returns the number flagged."""
+    conn = sqlite3.connect(db_path)
+    flagged = 0
+    for name, sql, params in sqlite_queries():
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"\n[ERROR] {name}: {e}")
+            flagged += 1
+            continue
+        scans = [row[3] for row in plan
+                 if row[3].startswith("SCAN") and not any(ok in row[3] for ok in ACCEPTABLE_SCANS)]
+        print(f"\n[{'FULL SCAN' if scans else 'ok'}] {name}")
+        for row in plan:
+            print(f"    {row[3]}")
+        flagged += bool(scans)
     conn.close()
+    return flagged
+
+def mysql_queries():
+    """(name, sql, params) for every query the agent tools issue against MySQL."""
+    from agent import tools
+    from data_pipeline.agencies import AGENCY_TREE_SQL, agency_lookup_sql
+    from data_pipeline.storage import MYSQL
+    columns = tools._columns(list(tools.DEFAULT_FIELDS))
+    date_keyset = tools.DATE_KEYSET_SQL
+    page = ("2024-06-30", "2024-06-30", "2024-14000", 11)
+    return [
+        ("documents by date", tools.DATE_RANGE_SQL.format(columns=columns, keyset=""),
+         ("2024-01-01", "2024-12-31", 11)),
+        ("documents by date, next page", tools.DATE_RANGE_SQL.format(columns=columns, keyset=date_keyset),
+         ("2024-01-01", "2024-12-31") + page),
+        ("agency lookup", MYSQL.translate(agency_lookup_sql(MYSQL)), (None, "commerce-department", "commerce-department")),
+        ("agency tree", MYSQL.translate(AGENCY_TREE_SQL.format(placeholders="?")), (54,)),
+        ("documents by agency", tools.AGENCY_DOCUMENTS_SQL.format(
+            columns=columns, placeholders="%s, %s", keyset=date_keyset), (54, 361) + page),
+        ("latest documents", tools.LATEST_SQL.format(columns=columns, keyset=""), (11,)),
+        ("latest documents, next page", tools.LATEST_SQL.format(columns=columns, keyset=date_keyset), page),
+        ("documents by keyword", tools.KEYWORD_SQL.format(columns=columns, keyset=""),
+         ("clean air", "clean air", 11))
+    ]
+
+async def explain_mysql() -> int:
+    """Print EXPLAIN for each tool query and flag full table scans. Returns the number flagged."""
+    import aiomysql
+    from data_pipeline.db_config import DB_CONFIG
+
+    conn = await aiomysql.connect(**DB_CONFIG)
+    flagged = 0
+    try:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            for name, sql, params in mysql_queries():
+                await cur.execute(f"EXPLAIN {sql}", params)
+                plan = await cur.fetchall()
+                scans = [row for row in plan if row.get("type") == "ALL"]
+                print(f"\n[{'FULL SCAN' if scans else 'ok'}] {name}")
+                for row in plan:
+                    print(f"    {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                          f"rows={row.get('rows')} {row.get('Extra') or ''}")
+                flagged += bool(scans)
+    finally:
+        conn.close()
+    return flagged
+
+def explain_queries(mysql: bool = False) -> int:
+    """Run the query planner audit; returns the number of queries flagged."""
+    if mysql:
+        flagged = asyncio.run(explain_mysql())
+    else:
+        db_path = Path("data_pipeline/rag_chat.db")
+        if not db_path.exists():
+            print("Database file not found!")
+            return 1
+        flagged = explain_sqlite(db_path)
+    print(f"\n{flagged} query plan(s) flagged")
+    return flagged
 
 if __name__ == "__main__":
-    check_database() 
\ No newline at end of file
+    if "--explain" in sys.argv[1:]:
+        # python check_db.py --explain [--mysql]
+        sys.exit(1 if explain_queries(mysql="--mysql" in sys.argv[1:]) else 0)
+    # python check_db.py [--database-url mysql://...]
+    url = sys.argv[sys.argv.index("--database-url") + 1] if "--database-url" in sys.argv[1:] else None
+    check_database(url)
@@ -0,0 +1,264 @@
+import re
+import asyncio
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Union
+import aiosqlite
+from data_pipeline.utils import get_db_path
+from data_pipeline.payloads import load_payloads, ensure_payload_tables
+from data_pipeline.storage import Dialect, StorageConnection, SQLiteConnection
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Agencies keyed by their Federal Register id, and the document <-> agency links
+AGENCY_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS agencies (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        slug TEXT,
+        parent_id INTEGER
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_agencies_slug ON agencies(slug)",
+    "CREATE INDEX IF NOT EXISTS idx_agencies_name ON agencies(name COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_agencies_parent ON agencies(parent_id)",
+    """
+    CREATE TABLE IF NOT EXISTS document_agencies (
+        document_id TEXT NOT NULL,
+        agency_id INTEGER NOT NULL,
+        PRIMARY KEY (document_id, agency_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_document_agencies_agency ON document_agencies(agency_id, document_id)"
+]
+
+# An agency and, transitively, all of its sub-agencies (? placeholders, see Dialect.translate)
+AGENCY_TREE_SQL = """
+WITH RECURSIVE tree(id) AS (
+    SELECT id FROM agencies WHERE id IN ({placeholders})
+    UNION
+    SELECT child.id FROM agencies child JOIN tree ON child.parent_id = tree.id
+)
+SELECT id FROM tree
+"""
+
+# Words ignored when matching agency names loosely
+NAME_STOP_WORDS = frozenset({"of", "the", "and", "for", "on", "us", "u", "s"})
+
+# The agency resolvers take an aiosqlite connection or any StorageConnection
+Connection = Union[aiosqlite.Connection, StorageConnection]
+
+def _store(db: Connection) -> StorageConnection:
+    return db if isinstance(db, StorageConnection) else SQLiteConnection(db)
+
+def agency_lookup_sql(dialect: Dialect) -> str:
+    """Exact id, slug or case-insensitive name lookup (MySQL's default collation ignores case)."""
+    collate = " COLLATE NOCASE" if dialect.name == "sqlite" else ""
+    return f"SELECT id FROM agencies WHERE id = ? OR slug = ? OR name = ?{collate}"
+
+def name_terms(agency: str) -> List[str]:
+    """Significant words of an agency name, for order-insensitive matching.
+
+    The API lists "Department of Commerce" as "Commerce Department".
+    """
+    words = re.findall(r"[\w&-]+", agency.lower())
+    return [word for word in words if word not in NAME_STOP_WORDS]
+
+def name_matches(terms: List[str], name: str) -> bool:
+    """Whether every term is a whole word of an agency name, or the terms are its initials.
+
+    "EPA" matches "Environmental Protection Agency" but not "Commerce
+    Department", which merely contains the letters.
+    """
+    words = name_terms(name)
+    if all(term in words for term in terms):
+        return True
+    return len(terms) == 1 and len(words) > 1 and terms[0] == "".join(word[0] for word in words)
+
+def agency_names(agencies: List[Any]) -> str:
+    """Comma-separated display names of a raw document's agencies."""
+    names = []
+    for agency in agencies or []:
+        if isinstance(agency, dict):
+            name = agency.get('name') or agency.get('raw_name')
+        else:
+            name = agency
+        if name:
+            names.append(str(name))
+    return ', '.join(names)
+
+def agency_rows(agencies: List[Any]) -> List[Tuple[int, str, Optional[str], Optional[int]]]:
+    """(id, name, slug, parent_id) rows for a raw document's agencies.
+
+    Entries without a Federal Register id (some carry only a raw_name) cannot
+    be linked and are left to the agency_names column.
+    """
+    rows = {}
+    for agency in agencies or []:
+        if not isinstance(agency, dict) or agency.get('id') is None:
+            continue
+        name = agency.get('name') or agency.get('raw_name')
+        if not name:
+            continue
+        rows[int(agency['id'])] = (int(agency['id']), name, agency.get('slug'), agency.get('parent_id'))
+    return list(rows.values())
+
+async def ensure_agency_tables(db: aiosqlite.Connection) -> bool:
+    """Create the agency tables if missing. Returns True if they were created."""
+    async with db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'document_agencies'"
+    ) as cursor:
+        exists = await cursor.fetchone() is not None
+
+    for statement in AGENCY_SCHEMA_SQL:
+        await db.execute(statement)
+
+    if not exists:
+        # Link documents that were saved before the agency tables existed
+        count = await backfill_agencies(db)
+        logger.info(f"Created agency tables and linked {count} documents")
+    return not exists
+
+async def write_document_agencies(db: aiosqlite.Connection,
+                                  documents: List[Tuple[str, List[Any]]]) -> None:
+    """Replace the agency links of documents, given (document id, raw agencies) pairs."""
+    await SQLiteConnection(db).replace_document_agencies(documents)
+
+async def backfill_agencies(db: aiosqlite.Connection, batch_size: int = 2000) -> int:
+    """Populate the agency tables from the full payload of every stored document.
+
+    Also rewrites agency_names, which older pipeline versions filled with the
+    repr of the whole agency dicts.
+    """
+    count = 0
+    last_id = ""
+    while True:
+        # Keyset batches, so rows can be updated while the table is walked
+        async with db.execute(
+            "SELECT id, agency_names FROM federal_register_documents WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        try:
+            payloads = await load_payloads(db, [row[0] for row in rows])
+        except Exception as e:
+            logger.warning(f"Skipping batch after {last_id} with unreadable payloads: {str(e)}")
+            continue
+        documents = []
+        renamed = []
+        for document_id, names in rows:
+            if document_id not in payloads:
+                continue
+            raw_agencies = payloads.get(document_id, {}).get('agencies', [])
+            documents.append((document_id, raw_agencies))
+            if names != agency_names(raw_agencies):
+                renamed.append((agency_names(raw_agencies), document_id))
+        await write_document_agencies(db, documents)
+        if renamed:
+            await db.executemany("UPDATE federal_register_documents SET agency_names = ? WHERE id = ?", renamed)
+        count += len(documents)
+    return count
+
+async def resolve_agency(db: Connection, agency: str, include_subagencies: bool = False) -> List[int]:
+    """Ids of the agencies an id, slug or name refers to, on either backend.
+
+    Exact matches on id, slug or (case-insensitive) name win, and only they
+    are expanded to their sub-agencies. Otherwise the agencies whose name
+    has every significant word of the query as a whole word, or whose
+    initials it is, match on their own (see name_matches). The fallback only
+    reads the small agencies table, never the documents.
+    """
+    store = _store(db)
+    agency = str(agency).strip()
+    if not agency:
+        return []
+    agency_id = int(agency) if agency.isdigit() else None
+    rows = await store.fetch_all(agency_lookup_sql(store.dialect), (agency_id, agency.lower(), agency))
+    ids = [row[0] for row in rows]
+    if ids:
+        return await agency_tree(store, ids) if include_subagencies else ids
+    terms = name_terms(agency)
+    if not terms:
+        return []
+    return [row[0] for row in await store.fetch_all("SELECT id, name FROM agencies") if name_matches(terms, row[1])]
+
+async def agency_tree(db: Connection, agency_ids: List[int]) -> List[int]:
+    """The given agencies plus all of their sub-agencies."""
+    if not agency_ids:
+        return []
+    placeholders = ", ".join("?" for _ in agency_ids)
+    rows = await _store(db).fetch_all(AGENCY_TREE_SQL.format(placeholders=placeholders), agency_ids)
+    return [row[0] for row in rows]
+
+async def agency_document_filter(db: Connection, agency: str,
+                                 include_subagencies: bool = True) -> Tuple[str, list]:
+    """SQL condition on federal_register_documents (aliased d) restricting it to an agency."""
+    agency_ids = await resolve_agency(db, agency, include_subagencies)
+    if not agency_ids:
+        return "0", []
+    placeholders = ", ".join("?" for _ in agency_ids)
+    return (
+        f"d.id IN (SELECT document_id FROM document_agencies WHERE agency_id IN ({placeholders}))",
+        list(agency_ids)
+    )
+
+async def agency_document_counts(db: aiosqlite.Connection) -> List[Dict[str, Any]]:
+    """Documents per agency, rolled up so parents include their sub-agencies."""
+    async with db.execute("""
+    WITH RECURSIVE ancestry(agency_id, ancestor_id) AS (
+        SELECT id, id FROM agencies
+        UNION ALL
+        SELECT ancestry.agency_id, a.parent_id
+        FROM ancestry JOIN agencies a ON a.id = ancestry.ancestor_id
+        WHERE a.parent_id IS NOT NULL
+    )
+    SELECT a.id, a.name, a.slug, a.parent_id,
+           COUNT(DISTINCT CASE WHEN da.agency_id = a.id THEN da.document_id END) AS documents,
+           COUNT(DISTINCT da.document_id) AS total_documents
+    FROM agencies a
+    JOIN ancestry ON ancestry.ancestor_id = a.id
+    LEFT JOIN document_agencies da ON da.agency_id = ancestry.agency_id
+    GROUP BY a.id
+    ORDER BY total_documents DESC, a.name
+    """) as cursor:
+        rows = await cursor.fetchall()
+    return [{
+        "id": row[0],
+        "name": row[1],
+        "slug": row[2],
+        "parent_id": row[3],
+        "documents": row[4],
+        "total_documents": row[5]
+    } for row in rows]
+
+async def backfill(db_path: Path) -> int:
+    """Create (if needed) and fully repopulate the agency tables of an existing database."""
+    async with aiosqlite.connect(db_path) as db:
+        await ensure_payload_tables(db)
+        created = await ensure_agency_tables(db)
+        if created:
+            await db.commit()
+            async with db.execute("SELECT COUNT(*) FROM federal_register_documents") as cursor:
+                return (await cursor.fetchone())[0]
+        count = await backfill_agencies(db)
+        await db.commit()
+    return count
+
+async def main():
+    """Backfill the agency tables of the pipeline database."""
+    db_path = get_db_path()
+    if not db_path.exists():
+        logger.error(f"Database not found at {db_path}")
+        return
+    count = await backfill(db_path)
+    logger.info(f"Agency links rebuilt for {count} documents")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -11,6 +11,14 @@ DB_CONFIG = {
     'charset': 'utf8mb4'
 }
 
+# Shared connection pool settings used by the agent tools
+POOL_CONFIG = {
+    'minsize': int(os.getenv('MYSQL_POOL_MIN_SIZE', '2')),
+    'maxsize': int(os.getenv('MYSQL_POOL_MAX_SIZE', '10')),
+    'pool_recycle': int(os.getenv('MYSQL_POOL_RECYCLE', '3600')),
+    'health_check_interval': float(os.getenv('MYSQL_POOL_HEALTH_CHECK_INTERVAL', '30'))
+}
+
 # SQL schema for creating tables
 CREATE_TABLES_SQL = """
 CREATE TABLE IF NOT EXISTS federal_register_documents (
@@ -21,9 +29,49 @@ CREATE TABLE IF NOT EXISTS federal_register_documents (
     document_type VARCHAR(100),
     publication_date DATE,
     agency_names TEXT,
-    raw_json JSON,
+    raw_json JSON, -- legacy; full documents live in document_payloads
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FULLTEXT INDEX ft_documents (title, abstract, agency_names)
+);
+
+CREATE TABLE IF NOT EXISTS agencies (
+    id INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    slug VARCHAR(255),
+    parent_id INT,
+    UNIQUE INDEX idx_agencies_slug (slug),
+    INDEX idx_agencies_name (name),
+    INDEX idx_agencies_parent (parent_id)
+);
+
+CREATE TABLE IF NOT EXISTS document_agencies (
+    document_id VARCHAR(255) NOT NULL,
+    agency_id INT NOT NULL,
+    PRIMARY KEY (document_id, agency_id),
+    INDEX idx_document_agencies_agency (agency_id, document_id)
+);
+
+CREATE TABLE IF NOT EXISTS document_payloads (
+    document_id VARCHAR(255) PRIMARY KEY,
+    codec VARCHAR(16) NOT NULL,
+    dictionary_id VARCHAR(32),
+    raw_size INT NOT NULL,
+    payload LONGBLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS processed_files (
+    path VARCHAR(512) PRIMARY KEY,
+    size BIGINT,
+    mtime DOUBLE,
+    content_hash VARCHAR(64),
+    documents INT,
+    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS document_hashes (
+    id VARCHAR(255) PRIMARY KEY,
+    content_hash VARCHAR(64)
 );
 
 CREATE TABLE IF NOT EXISTS pipeline_logs (
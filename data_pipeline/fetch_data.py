@@ -1,9 +1,13 @@
 import aiohttp
 import asyncio
 import aiofiles
+import argparse
 import json
-from datetime import datetime, timedelta
+import random
+import time
+from datetime import date, datetime, timedelta
 from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 
 # Set up logging
@@ -11,39 +15,166 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class FederalRegisterFetcher:
-    def __init__(self, output_dir="data_pipeline/raw_data"):
-        self.base_url = "https://www.federalregister.gov/api/v1/documents"
+    BASE_URL = "https://www.federalregister.gov/api/v1/documents"
+    # HTTP statuses that are worth retrying
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, output_dir="data_pipeline/raw_data", base_url=None, per_page=1000,
+                 max_concurrency=4, max_retries=5, backoff_base=1.0, timeout=60):
+        self.base_url = base_url or self.BASE_URL
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        
-    async def fetch_documents(self, start_date: str, end_date: str) -> list:
-        """Fetch documents from the Federal Register API for a date range."""
+        self.per_page = per_page
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+        # Request counters for throughput reporting
+        self.requests_made = 0
+        self.retries = 0
+
+    @staticmethod
+    def split_date_range(start_date: str, end_date: str, window_days: int) -> List[Tuple[str, str]]:
+        """Split an inclusive date range into consecutive windows of window_days days."""
+        start = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        windows = []
+        while start <= end:
+            window_end = min(start + timedelta(days=window_days - 1), end)
+            windows.append((start.isoformat(), window_end.isoformat()))
+            start = window_end + timedelta(days=1)
+        return windows
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Exponential backoff with jitter, honouring a Retry-After header in seconds."""
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        delay = self.backoff_base * (2 ** attempt)
+        return delay + random.uniform(0, delay / 2)
+
+    async def _get_json(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                        url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """GET a JSON page, retrying 429/5xx responses and network errors with backoff."""
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            async with semaphore:
+                self.requests_made += 1
+                try:
+                    async with session.get(url, params=params) as response:
+                        if response.status == 200:
+                            return await response.json()
+                        if response.status not in self.RETRY_STATUSES:
+                            raise Exception(f"API request failed with status {response.status}")
+                        retry_after = response.headers.get('Retry-After')
+                        error = f"status {response.status}"
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = f"{type(e).__name__}: {str(e)}"
+
+            if attempt == self.max_retries:
+                break
+            delay = self._retry_delay(attempt, retry_after)
+            self.retries += 1
+            logger.warning(f"Request to {url} failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        raise Exception(f"API request failed after {self.max_retries + 1} attempts ({error})")
+
+    async def fetch_window(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                           start_date: str, end_date: str) -> list:
+        """Fetch every page of results for one date window.
+
+        The session and semaphore are shared by concurrent windows; the
+        semaphore bounds the requests in flight across all of them.
+        """
         params = {
             'conditions[publication_date][gte]': start_date,
             'conditions[publication_date][lte]': end_date,
-            'per_page': 1000,
+            'per_page': self.per_page,
             'order': 'newest'
         }
-        
+
+        data = await self._get_json(session, semaphore, self.base_url, params)
+        if not isinstance(data, dict):
+            raise Exception("Invalid API response format")
+        documents = list(data.get('results', []))
+
+        # next_page_url already carries all query parameters
+        while data.get('next_page_url'):
+            data = await self._get_json(session, semaphore, data['next_page_url'])
+            documents.extend(data.get('results', []))
+
+        expected = data.get('count')
+        if expected is not None and len(documents) < expected:
+            logger.warning(
+                f"Window {start_date}..{end_date} returned {len(documents)} of {expected} documents; "
+                f"use a smaller window to avoid the API result cap"
+            )
+        return documents
+
+    async def fetch_documents(self, start_date: str, end_date: str) -> list:
+        """Fetch all documents from the Federal Register API for a date range."""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.base_url, params=params) as response:
-                    if response.status != 200:
-                        logger.error(f"API request failed with status {response.status}")
-                        return []
-                    
-                    data = await response.json()
-                    if not isinstance(data, dict) or 'results' not in data:
-                        logger.error("Invalid API response format")
-                        return []
-                    
-                    documents = data['results']
-                    logger.info(f"Found {len(documents)} documents")
-                    return documents
+            async with aiohttp.ClientSession(timeout=self.timeout) as session:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                documents = await self.fetch_window(session, semaphore, start_date, end_date)
+                logger.info(f"Found {len(documents)} documents")
+                return documents
                     
         except Exception as e:
             logger.error(f"Error fetching documents: {str(e)}")
             return []
+
+    async def fetch_backfill(self, start_date: str, end_date: str, window_days: int = 7) -> list:
+        """Fetch a long date range as concurrent windows over one shared session.
+
+        Windows are fetched in parallel, bounded by max_concurrency in-flight
+        requests, and the combined result is de-duplicated by document number.
+        """
+        windows = self.split_date_range(start_date, end_date, window_days)
+        logger.info(f"Backfilling {start_date}..{end_date} in {len(windows)} windows of {window_days} days")
+
+        self.requests_made = 0
+        self.retries = 0
+        started = time.perf_counter()
+
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        async with aiohttp.ClientSession(timeout=self.timeout, connector=connector) as session:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            results = await asyncio.gather(*(
+                self.fetch_window(session, semaphore, window_start, window_end)
+                for window_start, window_end in windows
+            ))
+
+        documents = {}
+        for window_docs in results:
+            for doc in window_docs:
+                documents[doc.get('document_number')] = doc
+        documents = sorted(documents.values(), key=lambda d: d.get('publication_date', ''), reverse=True)
+
+        elapsed = time.perf_counter() - started
+        rate = len(documents) / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"Fetched {len(documents)} documents in {elapsed:.2f}s ({rate:.1f} docs/sec, "
+            f"{self.requests_made} requests, {self.retries} retries)"
+        )
+        return documents
+
+    async def save_documents(self, documents: list, output_file: Path) -> int:
+        """Write documents to a JSON file (or JSON Lines for .jsonl) and return how many were written."""
+        try:
+            async with aiofiles.open(output_file, 'w', encoding='utf-8') as f:
+                if Path(output_file).suffix == '.jsonl':
+                    # One compact document per line so readers can stream it
+                    for doc in documents:
+                        await f.write(json.dumps(doc) + '\n')
+                else:
+                    await f.write(json.dumps(documents, indent=2))
+            logger.info(f"Saved {len(documents)} documents to {output_file}")
+            return len(documents)
+        except Exception as e:
+            logger.error(f"Error saving documents: {str(e)}")
+            return 0
     
     async def fetch_2024_2025_data(self) -> int:
         """Fetch documents from 2024-01-01 to 2025-12-31."""
@@ -52,26 +183,38 @@ class FederalRegisterFetcher:
         
         logger.info(f"Fetching documents from {start_str} to {end_str}")
         
-        documents = await self.fetch_documents(start_str, end_str)
+        try:
+            documents = await self.fetch_backfill(start_str, end_str)
+        except Exception as e:
+            logger.error(f"Error fetching documents: {str(e)}")
+            return 0
         if not documents:
             logger.warning("No documents found")
             return 0
         
         # Save to file
         output_file = self.output_dir / "federal_register_2024_2025.json"
-        try:
-            async with aiofiles.open(output_file, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps(documents, indent=2))
-            logger.info(f"Saved {len(documents)} documents to {output_file}")
-            return len(documents)
-        except Exception as e:
-            logger.error(f"Error saving documents: {str(e)}")
-            return 0
+        return await self.save_documents(documents, output_file)
 
-async def main():
+async def main(args=None):
     """Main function to run the fetcher."""
-    fetcher = FederalRegisterFetcher()
-    count = await fetcher.fetch_2024_2025_data()
+    parser = argparse.ArgumentParser(description="Fetch Federal Register documents")
+    parser.add_argument("--start", help="Backfill start date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Backfill end date (YYYY-MM-DD)")
+    parser.add_argument("--window-days", type=int, default=7, help="Days per concurrent window")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum in-flight requests")
+    parser.add_argument("--jsonl", action="store_true", help="Write JSON Lines instead of a JSON array")
+    parser.add_argument("--base-url", help="Override the API endpoint (e.g. a local stub server)")
+    args = parser.parse_args(args)
+
+    fetcher = FederalRegisterFetcher(base_url=args.base_url, max_concurrency=args.concurrency)
+    if args.start and args.end:
+        documents = await fetcher.fetch_backfill(args.start, args.end, args.window_days)
+        suffix = "jsonl" if args.jsonl else "json"
+        output_file = fetcher.output_dir / f"federal_register_{args.start}_{args.end}.{suffix}"
+        count = await fetcher.save_documents(documents, output_file) if documents else 0
+    else:
+        count = await fetcher.fetch_2024_2025_data()
     logger.info(f"Pipeline completed. Fetched {count} documents.")
 
 if __name__ == "__main__":
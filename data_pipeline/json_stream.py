@@ -0,0 +1,95 @@
+import re
+import json
+from pathlib import Path
+from typing import Any, AsyncIterator, List
+import aiofiles
+
+CHUNK_SIZE = 64 * 1024
+
+# Characters that may continue a number, e.g. after "-0" of "-0.5e-3"
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+async def iter_json_array(filepath: Path, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time.
+
+    The file is read in chunks and each element is decoded as soon as it is
+    complete, so memory use is bounded by the chunk size plus one element.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    started = False
+
+    async with aiofiles.open(filepath, 'r', encoding='utf-8') as f:
+
+        async def fill() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = await f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            # Drop consumed input before appending
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        while True:
+            # Skip whitespace and element separators
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                if buffer[pos] == "," and not started:
+                    raise ValueError(f"Unexpected ',' before '[' in {filepath}")
+                pos += 1
+            if pos >= len(buffer):
+                if eof or not await fill():
+                    raise ValueError(f"Unexpected end of file in {filepath}")
+                continue
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError(f"Expected a JSON array in {filepath}")
+                started = True
+                pos += 1
+                continue
+
+            if buffer[pos] == "]":
+                return
+
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof or not await fill():
+                    raise
+                continue
+
+            # A value followed only by number characters up to the buffer edge
+            # may be a truncated number
+            if not eof and _NUMBER_TAIL.fullmatch(buffer, end) and await fill():
+                continue
+
+            pos = end
+            yield value
+
+async def iter_json_lines(filepath: Path) -> AsyncIterator[Any]:
+    """Yield one decoded value per non-empty line of a JSON Lines file."""
+    async with aiofiles.open(filepath, 'r', encoding='utf-8') as f:
+        async for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def iter_documents(filepath: Path) -> AsyncIterator[Any]:
+    """Stream documents from a raw data file (.jsonl as JSON Lines, otherwise a JSON array)."""
+    if Path(filepath).suffix == ".jsonl":
+        return iter_json_lines(filepath)
+    return iter_json_array(filepath)
+
+async def batched(items: AsyncIterator[Any], batch_size: int) -> AsyncIterator[List[Any]]:
+    """Group an async iterator into lists of at most batch_size items."""
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,59 +1,47 @@
+import signal
 import asyncio
-import aiomysql
-from datetime import datetime
-from .downloader import FederalRegisterDownloader
-from .processor import FederalRegisterProcessor
-from .db_config import DB_CONFIG
+import argparse
+from typing import Optional
+from .storage import open_repository
+from .scheduler import IngestScheduler, PIPELINE_INTERVAL, PIPELINE_MAX_CATCHUP_DAYS
 
-async def log_pipeline_run(pool, status, records_processed, error_message=None):
-    """Log pipeline execution details to database."""
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            sql = """
-            INSERT INTO pipeline_logs 
-            (pipeline_name, status, start_time, end_time, records_processed, error_message)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            await cur.execute(sql, (
-                'federal_register_pipeline',
-                status,
-                datetime.now(),
-                datetime.now(),
-                records_processed,
-                error_message
-            ))
-            await conn.commit()
+async def run_pipeline(max_catchup_days: int = PIPELINE_MAX_CATCHUP_DAYS, database_url: Optional[str] = None):
+    """Run the complete data pipeline once, catching up on any missed days."""
+    async with open_repository(database_url) as repository:
+        summary = await IngestScheduler(max_catchup_days=max_catchup_days).run_once(repository)
 
-async def run_pipeline():
-    """Run the complete data pipeline."""
-    # Create database connection pool
-    pool = await aiomysql.create_pool(**DB_CONFIG)
-    
-    try:
-        # Download new data
-        downloader = FederalRegisterDownloader()
-        records_downloaded = await downloader.download_daily_data()
-        
-        if records_downloaded > 0:
-            # Process and save to database
-            processor = FederalRegisterProcessor()
-            records_processed = await processor.process_latest_data()
-            
-            # Log successful run
-            await log_pipeline_run(pool, 'success', records_processed)
-            print(f"Pipeline completed successfully. Processed {records_processed} records.")
-        else:
-            await log_pipeline_run(pool, 'no_new_data', 0)
-            print("No new data to process.")
-            
-    except Exception as e:
-        error_message = str(e)
-        await log_pipeline_run(pool, 'error', 0, error_message)
-        print(f"Pipeline failed: {error_message}")
-        
-    finally:
-        pool.close()
-        await pool.wait_closed()
+    if summary["status"] == "success":
+        print(f"Pipeline completed successfully. Processed {summary['stages']['write']['rows']} records.")
+    elif summary["status"] == "no_new_data":
+        print("No new data to process.")
+    elif summary["status"] == "locked":
+        print("Another pipeline run is in progress.")
+    else:
+        print(f"Pipeline failed: {summary['error']}")
+    return summary
+
+async def main(args=None):
+    parser = argparse.ArgumentParser(description="Ingest Federal Register documents")
+    parser.add_argument("--daemon", action="store_true", help="Keep running on a schedule")
+    parser.add_argument("--interval", type=float, default=PIPELINE_INTERVAL,
+                        help="Seconds between scheduled runs (daemon mode)")
+    parser.add_argument("--catch-up-days", type=int, default=PIPELINE_MAX_CATCHUP_DAYS,
+                        help="Furthest back a run fetches missed days")
+    parser.add_argument("--database-url", default=None,
+                        help="Where to ingest: mysql://... or sqlite:///path.db (default: DATABASE_URL)")
+    args = parser.parse_args(args)
+
+    if args.daemon:
+        # Finish the current run and exit on SIGINT/SIGTERM
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        scheduler = IngestScheduler(interval=args.interval, max_catchup_days=args.catch_up_days)
+        async with open_repository(args.database_url) as repository:
+            await scheduler.run_forever(stop, repository)
+    else:
+        await run_pipeline(args.catch_up_days, args.database_url)
 
 if __name__ == "__main__":
-    asyncio.run(run_pipeline()) 
\ No newline at end of file
+    asyncio.run(main())
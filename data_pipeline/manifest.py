@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Union
+import aiosqlite
+from data_pipeline.storage import StorageConnection, SQLiteConnection
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS processed_files (
+        path TEXT PRIMARY KEY,
+        size INTEGER,
+        mtime REAL,
+        content_hash TEXT,
+        documents INTEGER,
+        processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS document_hashes (
+        id TEXT PRIMARY KEY,
+        content_hash TEXT
+    )
+    """
+]
+
+# The manifest functions take an aiosqlite connection or any StorageConnection
+Connection = Union[aiosqlite.Connection, StorageConnection]
+
+def _store(db: Connection) -> StorageConnection:
+    return db if isinstance(db, StorageConnection) else SQLiteConnection(db)
+
+async def ensure_manifest_tables(db: aiosqlite.Connection) -> None:
+    """Create the processed-file manifest and document hash tables if missing."""
+    for statement in MANIFEST_SCHEMA_SQL:
+        await db.execute(statement)
+
+def _hash_file_sync(filepath: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def hash_file(filepath: Path) -> str:
+    """SHA-256 of a file's contents, computed off the event loop."""
+    return await asyncio.to_thread(_hash_file_sync, filepath)
+
+def document_hash(row: tuple) -> str:
+    """Content hash of a document's database row."""
+    payload = "\x1f".join("" if value is None else str(value) for value in row)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+async def get_file_entry(db: Connection, filepath: Path) -> Optional[Tuple[int, float, str]]:
+    """Return the recorded (size, mtime, content_hash) of a file, if any."""
+    return await _store(db).file_entry(str(filepath.resolve()))
+
+async def file_needs_processing(db: Connection, filepath: Path) -> Tuple[bool, Optional[str]]:
+    """Decide whether a raw file is new or changed since it was last processed.
+
+    Size and mtime are checked first; the content is only hashed when they
+    differ, so unchanged files cost one stat() call. Returns the decision and
+    the content hash when one was computed.
+    """
+    stat = filepath.stat()
+    entry = await get_file_entry(db, filepath)
+    if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+        return False, entry[2]
+
+    content_hash = await hash_file(filepath)
+    if entry is not None and entry[2] == content_hash:
+        # Touched but not modified; remember the new mtime
+        await record_file(db, filepath, content_hash, None)
+        return False, content_hash
+    return True, content_hash
+
+async def record_file(db: Connection, filepath: Path, content_hash: str,
+                      documents: Optional[int]) -> None:
+    """Record a processed file in the manifest."""
+    stat = filepath.stat()
+    await _store(db).record_file(str(filepath.resolve()), stat.st_size, stat.st_mtime, content_hash, documents)
+
+async def known_hashes(db: Connection, ids: List[str]) -> Dict[str, str]:
+    """Stored content hashes of the given document ids."""
+    return await _store(db).known_hashes(ids)
+
+async def filter_changed_documents(db: Connection, rows: List[tuple]) -> List[Tuple[tuple, str]]:
+    """Return (row, hash) pairs for rows whose content hash differs from the stored one.
+
+    Each row's first element is the document id.
+    """
+    if not rows:
+        return []
+    hashed = [(row, document_hash(row)) for row in rows]
+    known = await known_hashes(db, [row[0] for row in rows])
+    return [(row, digest) for row, digest in hashed if known.get(row[0]) != digest]
+
+async def record_document_hashes(db: Connection, hashed_rows: List[Tuple[tuple, str]]) -> None:
+    """Store the content hashes of documents that were just written."""
+    await _store(db).record_document_hashes([(row[0], digest) for row, digest in hashed_rows])
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from typing import List, Tuple
+import aiosqlite
+from data_pipeline.utils import get_db_path
+from data_pipeline.search_index import FTS_SCHEMA_SQL
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+DOCUMENT_READ_INDEXES_SQL = [
+    # Date-range reads, newest first; with id appended the index covers
+    # the retriever's candidate-id pre-filter on date and type
+    "CREATE INDEX IF NOT EXISTS idx_documents_date "
+    "ON federal_register_documents(publication_date, document_type, id)",
+    "CREATE INDEX IF NOT EXISTS idx_documents_type_date "
+    "ON federal_register_documents(document_type, publication_date, id)",
+    "CREATE INDEX IF NOT EXISTS idx_documents_number "
+    "ON federal_register_documents(document_number)"
+]
+
+_DOCUMENT_COPY_COLUMNS = ("id, document_number, title, abstract, document_type, publication_date, "
+                          "agency_names, raw_json, created_at, updated_at")
+
+# (version, name, statements), applied in order and recorded in schema_migrations.
+# Append new migrations; never edit one that has shipped.
+SQLITE_MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "document_read_indexes", DOCUMENT_READ_INDEXES_SQL + [
+        "ANALYZE federal_register_documents"
+    ]),
+    # The FTS index is keyed on rowid, which VACUUM may renumber while it is
+    # implicit; as the alias of an INTEGER PRIMARY KEY it is kept. Existing
+    # rowids are copied over, so the index stays valid without a rebuild.
+    (2, "document_stable_rowid", [
+        "DROP TABLE IF EXISTS federal_register_documents_new",
+        """
+        CREATE TABLE federal_register_documents_new (
+            doc_rowid INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            document_number TEXT,
+            title TEXT,
+            abstract TEXT,
+            document_type TEXT,
+            publication_date TEXT,
+            agency_names TEXT,
+            raw_json TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        f"INSERT INTO federal_register_documents_new (doc_rowid, {_DOCUMENT_COPY_COLUMNS}) "
+        f"SELECT rowid, {_DOCUMENT_COPY_COLUMNS} FROM federal_register_documents",
+        "DROP TABLE federal_register_documents",
+        "ALTER TABLE federal_register_documents_new RENAME TO federal_register_documents"
+    ] + DOCUMENT_READ_INDEXES_SQL + FTS_SCHEMA_SQL + [
+        "ANALYZE federal_register_documents"
+    ]),
+]
+
+# SQLite migrations whose result tables created by create_sqlite_schema already
+# have, keyed by version: the (table, column) showing it. They are recorded
+# without running.
+SQLITE_SCHEMA_MARKERS = {
+    2: ("federal_register_documents", "doc_rowid")
+}
+
+# (version, name, [(table, index name, columns[, kind])]) for MySQL; kind is
+# INDEX unless given. InnoDB secondary indexes carry the primary key, so these
+# cover id-only lookups as well.
+MYSQL_MIGRATIONS: List[Tuple[int, str, List[Tuple[str, ...]]]] = [
+    (1, "document_read_indexes", [
+        ("federal_register_documents", "idx_documents_date", "publication_date, document_type"),
+        ("federal_register_documents", "idx_documents_type_date", "document_type, publication_date"),
+        ("federal_register_documents", "idx_documents_number", "document_number")
+    ]),
+    # (publication_date, id) order for the tools' keyset pagination; InnoDB
+    # appends the primary key, so the single column is enough
+    (2, "document_keyset_index", [
+        ("federal_register_documents", "idx_documents_date_id", "publication_date")
+    ]),
+    # The tools' keyword search; CREATE TABLE IF NOT EXISTS never added it to
+    # tables created before it was declared inline
+    (3, "document_fulltext_index", [
+        ("federal_register_documents", "ft_documents", "title, abstract, agency_names", "FULLTEXT INDEX")
+    ]),
+]
+
+async def applied_versions(db: aiosqlite.Connection) -> List[int]:
+    """Versions already recorded in schema_migrations."""
+    await db.execute(MIGRATIONS_TABLE_SQL)
+    async with db.execute("SELECT version FROM schema_migrations ORDER BY version") as cursor:
+        return [row[0] for row in await cursor.fetchall()]
+
+async def has_column(db: aiosqlite.Connection, table: str, column: str) -> bool:
+    """Whether an SQLite table has a column."""
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        return any(row[1] == column for row in await cursor.fetchall())
+
+async def apply_migrations(db: aiosqlite.Connection) -> List[int]:
+    """Apply pending SQLite migrations, each in its own transaction. Returns the versions applied."""
+    done = set(await applied_versions(db))
+    applied = []
+    for version, name, statements in SQLITE_MIGRATIONS:
+        if version in done:
+            continue
+        marker = SQLITE_SCHEMA_MARKERS.get(version)
+        if marker is not None and await has_column(db, *marker):
+            # e.g. a fresh database, created with doc_rowid: nothing to rebuild
+            statements = []
+        try:
+            for statement in statements:
+                await db.execute(statement)
+            await db.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (?, ?)", (version, name)
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.error(f"Migration {version} ({name}) failed")
+            raise
+        logger.info(f"Applied migration {version}: {name}")
+        applied.append(version)
+    return applied
+
+async def apply_mysql_migrations(conn) -> List[int]:
+    """Apply pending MySQL migrations on an aiomysql connection. Returns the versions applied.
+
+    MySQL has no CREATE INDEX IF NOT EXISTS, so indexes that already exist
+    (e.g. from db/init_db.sql) are skipped via information_schema.
+    """
+    applied = []
+    async with conn.cursor() as cur:
+        await cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        await cur.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in await cur.fetchall()}
+
+        for version, name, indexes in MYSQL_MIGRATIONS:
+            if version in done:
+                continue
+            for table, index_name, columns, *kind in indexes:
+                await cur.execute("""
+                SELECT 1 FROM information_schema.statistics
+                WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+                LIMIT 1
+                """, (table, index_name))
+                if await cur.fetchone() is None:
+                    kind = kind[0] if kind else "INDEX"
+                    await cur.execute(f"ALTER TABLE {table} ADD {kind} {index_name} ({columns})")
+            await cur.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name)
+            )
+            await conn.commit()
+            logger.info(f"Applied MySQL migration {version}: {name}")
+            applied.append(version)
+    return applied
+
+async def main():
+    """Apply pending migrations to the pipeline database."""
+    db_path = get_db_path()
+    if not db_path.exists():
+        logger.error(f"Database not found at {db_path}")
+        return
+    async with aiosqlite.connect(db_path) as db:
+        applied = await apply_migrations(db)
+        current = await applied_versions(db)
+    logger.info(f"Applied {len(applied)} migration(s); schema version {max(current, default=0)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,279 @@
+import os
+import json
+import math
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import aiosqlite
+from data_pipeline.manifest import file_needs_processing, record_file
+from data_pipeline.payloads import (
+    PayloadDictionary, current_dictionary, train_dictionary, train_from_database,
+    DICTIONARY_MIN_SAMPLES, DICTIONARY_MAX_SAMPLES
+)
+from data_pipeline.process_data import (
+    ParsedDocument, normalize_document, document_row, parse_document, write_parsed_documents,
+    FederalRegisterProcessor
+)
+from data_pipeline.utils import bump_data_version, create_sqlite_schema
+from data_pipeline.vector_index import VectorIndex
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# JSON Lines files larger than this are split into several shards
+PARSE_CHUNK_BYTES = int(os.getenv('PARSE_CHUNK_BYTES', str(1024 * 1024)))
+
+# The compression dictionary of the worker process, set by _init_worker
+_dictionary: Optional[PayloadDictionary] = None
+
+def _init_worker(dictionary: Optional[Tuple[str, bytes, str]]) -> None:
+    global _dictionary
+    _dictionary = PayloadDictionary(*dictionary) if dictionary else None
+
+def plan_shards(files: List[Path], workers: int,
+                chunk_bytes: int = PARSE_CHUNK_BYTES) -> List[Tuple[Path, int, int]]:
+    """(path, part, parts) shards covering files, in file order.
+
+    JSON Lines files are cut into chunk_bytes pieces, and further when there
+    are fewer files than workers, so a single large file still keeps every
+    worker busy. A JSON array cannot be entered mid-way and is always one
+    shard; large fetches split across workers only when written with --jsonl.
+    """
+    min_parts = math.ceil(workers / len(files)) if files else 1
+    shards = []
+    for path in files:
+        parts = 1
+        if path.suffix == ".jsonl":
+            parts = max(math.ceil(path.stat().st_size / chunk_bytes), min_parts, 1)
+        shards.extend((path, part, parts) for part in range(parts))
+    return shards
+
+def _read_shard(path: Path, part: int, parts: int) -> List[Any]:
+    """Raw documents of one shard of a file.
+
+    JSON Lines files are split by byte range, each line going to the shard
+    its first byte falls in, so workers only read their own part. A JSON
+    array is a single shard (see plan_shards).
+    """
+    if path.suffix != ".jsonl":
+        if parts != 1:
+            raise ValueError(f"{path} is a JSON array and cannot be split into {parts} shards")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    size = path.stat().st_size
+    start, end = size * part // parts, size * (part + 1) // parts
+    documents = []
+    with open(path, 'rb') as f:
+        if start > 0:
+            # Skip the line straddling the boundary; the previous shard owns it
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                documents.append(json.loads(line))
+    return documents
+
+def parse_shard(path: Path, part: int, parts: int) -> List[ParsedDocument]:
+    """Normalize, hash and compress the documents of one shard (runs in a worker process).
+
+    Everything the writer needs is returned as plain tuples, ready for
+    executemany; the raw JSON only crosses the process boundary compressed.
+    """
+    parsed = []
+    for doc in _read_shard(path, part, parts):
+        try:
+            processed_doc = normalize_document(doc)
+        except Exception as e:
+            logger.error(f"Error processing document: {str(e)}")
+            continue
+        if processed_doc is None:
+            continue
+        parsed.append(parse_document(document_row(processed_doc), processed_doc['agencies'], _dictionary))
+    return parsed
+
+def _discard(future: asyncio.Future) -> None:
+    """Cancel a shard that will not be written, retrieving its error if it already failed."""
+    if future.done() and not future.cancelled():
+        future.exception()
+    else:
+        future.cancel()
+
+async def process_files_parallel(db: aiosqlite.Connection, files: List[Path], vector_index: VectorIndex,
+                                 workers: int, batch_size: int = 500) -> int:
+    """Load new or changed raw data files, parsing them in a pool of worker processes.
+
+    Shards are parsed concurrently (at most two per worker ahead of the
+    writer) while this task, the only one touching the database, writes
+    their rows in file order. Files are recorded in the manifest once all of
+    their shards are written; a failed file is left out so the next run
+    retries it. Unlike the serial path, a first load into an empty database
+    compresses every file without a dictionary, the dictionary being trained
+    at the end. Returns the documents written.
+    """
+    pending = []
+    for filepath in files:
+        needs_processing, content_hash = await file_needs_processing(db, filepath)
+        if needs_processing:
+            pending.append((filepath, content_hash))
+        else:
+            logger.info(f"Skipping unchanged file: {filepath}")
+    await db.commit()
+    if not pending:
+        return 0
+
+    # Workers get the dictionary once, at startup, so train it before they start
+    dictionary = await current_dictionary(db) or await train_from_database(db)
+    await db.commit()
+    shards = plan_shards([filepath for filepath, _ in pending], workers)
+    hashes = dict(pending)
+    seen: Dict[Path, int] = {}
+    file_written: Dict[Path, int] = {}
+    file_started: Dict[Path, float] = {}
+    failed = set()
+    total_written = 0
+
+    loop = asyncio.get_running_loop()
+    # Not forked: the parent has aiosqlite and to_thread threads running
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=((dictionary.codec, dictionary.data, dictionary.id) if dictionary else None,)
+    )
+    queued = deque()
+    next_shard = 0
+    try:
+        while queued or next_shard < len(shards):
+            while next_shard < len(shards) and len(queued) < workers * 2:
+                shard = shards[next_shard]
+                queued.append((shard, loop.run_in_executor(executor, parse_shard, *shard)))
+                next_shard += 1
+
+            (filepath, part, parts), future = queued.popleft()
+            if filepath in failed:
+                _discard(future)
+                continue
+            if part == 0:
+                logger.info(f"Processing file: {filepath} ({parts} shards)")
+                file_started[filepath] = time.perf_counter()
+            try:
+                parsed = await future
+                written = await write_parsed_documents(db, parsed, vector_index, batch_size)
+                seen[filepath] = seen.get(filepath, 0) + len(parsed)
+                file_written[filepath] = file_written.get(filepath, 0) + written
+                total_written += written
+                if part == parts - 1:
+                    await record_file(db, filepath, hashes[filepath], seen[filepath])
+                    await db.commit()
+                    elapsed = time.perf_counter() - file_started[filepath]
+                    logger.info(
+                        f"Saved {file_written[filepath]} of {seen[filepath]} documents from {filepath.name} "
+                        f"in {elapsed:.2f}s ({seen[filepath] - file_written[filepath]} unchanged)"
+                    )
+            except BrokenProcessPool:
+                # A worker died; no later shard can be parsed either
+                await db.rollback()
+                raise
+            except Exception as e:
+                # Leave the file out of the manifest so the next run retries it
+                await db.rollback()
+                failed.add(filepath)
+                logger.error(f"Error processing file {filepath}: {str(e)}")
+    finally:
+        for _, future in queued:
+            _discard(future)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if total_written:
+        bump_data_version()
+    if dictionary is None and total_written >= DICTIONARY_MIN_SAMPLES:
+        # Later ingests compress against a dictionary learned from this one
+        await train_from_database(db)
+        await db.commit()
+    return total_written
+
+async def _max_stall(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Longest the event loop went without running this task, beyond interval."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+async def benchmark(worker_counts: List[int], processor: Optional[FederalRegisterProcessor] = None) -> List[Dict[str, Any]]:
+    """Time a full load of the raw data files into a fresh database per worker count.
+
+    Every run compresses against the same dictionary, trained up front on
+    the raw data, so all of them do the same work.
+    """
+    processor = processor or FederalRegisterProcessor()
+    files = sorted(processor.raw_data_files())
+    samples = []
+    for path in files:
+        for doc in _read_shard(path, 0, 1):
+            samples.append(json.dumps(doc).encode('utf-8'))
+    dictionary = train_dictionary(samples[-DICTIONARY_MAX_SAMPLES:])
+
+    results = []
+    tmp_dir = Path(tempfile.mkdtemp(prefix="ingest-benchmark-"))
+    try:
+        for workers in worker_counts:
+            db_path = tmp_dir / f"workers-{workers}.db"
+            async with aiosqlite.connect(db_path) as db:
+                await create_sqlite_schema(db)
+                await db.execute(
+                    "INSERT INTO payload_dictionaries (id, codec, dictionary, samples) VALUES (?, ?, ?, ?)",
+                    (dictionary.id, dictionary.codec, dictionary.data, len(samples))
+                )
+                await db.commit()
+
+            stop = asyncio.Event()
+            stall = asyncio.create_task(_max_stall(stop))
+            started = time.perf_counter()
+            written = await processor.process_new_data(db_path, workers=workers)
+            elapsed = time.perf_counter() - started
+            stop.set()
+            results.append({
+                "workers": workers,
+                "documents": written,
+                "elapsed_s": round(elapsed, 2),
+                "docs_per_s": round(written / elapsed) if elapsed > 0 else 0,
+                "max_stall_ms": round(await stall * 1000, 1)
+            })
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    for result in results:
+        result["speedup"] = round(results[0]["elapsed_s"] / result["elapsed_s"], 2) if result["elapsed_s"] else 0.0
+    return results
+
+async def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark parallel parsing of the raw data files")
+    parser.add_argument("--workers", default=f"1,2,{os.cpu_count() or 1}",
+                        help="Comma-separated worker counts to compare (the first is the baseline)")
+    args = parser.parse_args(args)
+
+    worker_counts = list(dict.fromkeys(int(count) for count in args.workers.split(",")))
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'documents':>11}{'seconds':>9}{'docs/s':>9}{'speedup':>9}{'max stall ms':>14}")
+    for result in await benchmark(worker_counts):
+        print(f"{result['workers']:>8}{result['documents']:>11}{result['elapsed_s']:>9}"
+              f"{result['docs_per_s']:>9}{result['speedup']:>9}{result['max_stall_ms']:>14}")
+
+if __name__ == "__main__":
+    # python -m data_pipeline.parallel_ingest --workers 1,2,4
+    asyncio.run(main())
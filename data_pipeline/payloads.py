@@ -0,0 +1,366 @@
+import sys
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import aiosqlite
+from data_pipeline.utils import get_db_path
+from data_pipeline.storage import SQLITE, PAYLOAD_COLUMNS, SQLiteConnection
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is used without it
+    zstandard = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Full API documents, compressed, kept out of federal_register_documents so
+# listing and search queries never page them in
+PAYLOAD_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS document_payloads (
+        document_id TEXT PRIMARY KEY,
+        codec TEXT NOT NULL,
+        dictionary_id TEXT,
+        raw_size INTEGER NOT NULL,
+        payload BLOB NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS payload_dictionaries (
+        id TEXT PRIMARY KEY,
+        codec TEXT NOT NULL,
+        dictionary BLOB NOT NULL,
+        samples INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+]
+
+PAYLOAD_UPSERT_SQL = SQLITE.upsert("document_payloads", PAYLOAD_COLUMNS, "document_id")
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+# A trained dictionary pays off once there are enough documents to learn from
+DICTIONARY_MIN_SAMPLES = 200
+DICTIONARY_MAX_SAMPLES = 2000
+DICTIONARY_SIZE = 64 * 1024
+# zlib only looks back 32 KiB, so a larger preset dictionary is wasted
+ZLIB_DICTIONARY_SIZE = 32 * 1024
+
+class PayloadDictionary:
+    """A compression dictionary trained on stored payloads; ids are content hashes."""
+
+    def __init__(self, codec: str, data: bytes, dictionary_id: Optional[str] = None):
+        self.codec = codec
+        self.data = data
+        self.id = dictionary_id or hashlib.sha256(data).hexdigest()[:16]
+        self._zstd = zstandard.ZstdCompressionDict(data) if codec == "zstd" and zstandard else None
+
+    def compress(self, raw: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=self._zstd).compress(raw)
+        compressor = zlib.compressobj(ZLIB_LEVEL, zdict=self.data)
+        return compressor.compress(raw) + compressor.flush()
+
+    def decompress(self, payload: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdDecompressor(dict_data=self._zstd).decompress(payload)
+        decompressor = zlib.decompressobj(zdict=self.data)
+        return decompressor.decompress(payload) + decompressor.flush()
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+def train_dictionary(samples: List[bytes], codec: Optional[str] = None) -> PayloadDictionary:
+    """Train a dictionary on sample payloads.
+
+    zstd has a real trainer; for zlib the preset dictionary is simply recent
+    sample text (field names, agency blocks, URL prefixes repeat across
+    documents), with the most common material nearest the end where zlib
+    matches it most cheaply.
+    """
+    codec = codec or default_codec()
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd dictionaries need the zstandard package")
+        return PayloadDictionary(codec, zstandard.train_dictionary(DICTIONARY_SIZE, samples).as_bytes())
+    data = b"".join(samples)[-ZLIB_DICTIONARY_SIZE:]
+    return PayloadDictionary(codec, data)
+
+def compress_payload(raw_json: str, dictionary: Optional[PayloadDictionary] = None) -> Tuple[str, Optional[str], int, bytes]:
+    """(codec, dictionary id, raw size, compressed bytes) for a JSON document."""
+    raw = raw_json.encode('utf-8')
+    if dictionary is not None:
+        return dictionary.codec, dictionary.id, len(raw), dictionary.compress(raw)
+    if zstandard is not None:
+        return "zstd", None, len(raw), zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", None, len(raw), zlib.compress(raw, ZLIB_LEVEL)
+
+def decompress_payload(codec: str, payload: bytes, dictionary: Optional[PayloadDictionary] = None) -> str:
+    """Inverse of compress_payload."""
+    if dictionary is not None:
+        raw = dictionary.decompress(payload)
+    elif codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Payload is zstd-compressed but the zstandard package is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    else:
+        raw = zlib.decompress(payload)
+    return raw.decode('utf-8')
+
+# Dictionaries by id; rows are immutable, so they are loaded once per process
+_dictionaries: Dict[str, PayloadDictionary] = {}
+
+async def _load_dictionaries(db: aiosqlite.Connection, ids: List[str]) -> None:
+    missing = [dictionary_id for dictionary_id in set(ids) if dictionary_id not in _dictionaries]
+    if not missing:
+        return
+    placeholders = ", ".join("?" for _ in missing)
+    async with db.execute(
+        f"SELECT id, codec, dictionary FROM payload_dictionaries WHERE id IN ({placeholders})", missing
+    ) as cursor:
+        for dictionary_id, codec, data in await cursor.fetchall():
+            _dictionaries[dictionary_id] = PayloadDictionary(codec, bytes(data), dictionary_id)
+
+async def current_dictionary(db: aiosqlite.Connection) -> Optional[PayloadDictionary]:
+    """The newest dictionary this process can use for compression, if any."""
+    async with db.execute(
+        "SELECT id, codec FROM payload_dictionaries ORDER BY created_at DESC, rowid DESC"
+    ) as cursor:
+        rows = await cursor.fetchall()
+    for dictionary_id, codec in rows:
+        if codec == "zlib" or zstandard is not None:
+            await _load_dictionaries(db, [dictionary_id])
+            return _dictionaries[dictionary_id]
+    return None
+
+async def write_payloads(db: aiosqlite.Connection, documents: List[Tuple[str, str]],
+                         dictionary: Optional[PayloadDictionary] = None) -> int:
+    """Compress and store (document id, raw JSON) pairs. Returns the bytes written."""
+    if not documents:
+        return 0
+    rows = []
+    for document_id, raw_json in documents:
+        codec, dictionary_id, raw_size, payload = compress_payload(raw_json, dictionary)
+        rows.append((document_id, codec, dictionary_id, raw_size, payload))
+    await SQLiteConnection(db).upsert_payloads(rows)
+    return sum(len(row[4]) for row in rows)
+
+async def load_payloads(db: aiosqlite.Connection, document_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Full API documents by id, read and decompressed on demand.
+
+    Documents not yet moved to document_payloads fall back to the legacy
+    raw_json column.
+    """
+    if not document_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in document_ids)
+    async with db.execute(
+        f"SELECT document_id, codec, dictionary_id, payload FROM document_payloads "
+        f"WHERE document_id IN ({placeholders})", list(document_ids)
+    ) as cursor:
+        rows = await cursor.fetchall()
+    await _load_dictionaries(db, [row[2] for row in rows if row[2]])
+
+    documents = {}
+    for document_id, codec, dictionary_id, payload in rows:
+        dictionary = _dictionaries.get(dictionary_id) if dictionary_id else None
+        documents[document_id] = json.loads(decompress_payload(codec, bytes(payload), dictionary))
+
+    missing = [document_id for document_id in document_ids if document_id not in documents]
+    if missing:
+        placeholders = ", ".join("?" for _ in missing)
+        async with db.execute(
+            f"SELECT id, raw_json FROM federal_register_documents "
+            f"WHERE id IN ({placeholders}) AND raw_json IS NOT NULL", missing
+        ) as cursor:
+            for document_id, raw_json in await cursor.fetchall():
+                documents[document_id] = json.loads(raw_json)
+    return documents
+
+async def load_payload(db: aiosqlite.Connection, document_id: str) -> Optional[Dict[str, Any]]:
+    """The full API document for one id, or None."""
+    return (await load_payloads(db, [document_id])).get(document_id)
+
+async def train_from_database(db: aiosqlite.Connection) -> Optional[PayloadDictionary]:
+    """Train and store a dictionary from the documents on hand, if there are enough."""
+    async with db.execute(
+        "SELECT raw_json FROM federal_register_documents WHERE raw_json IS NOT NULL "
+        "ORDER BY publication_date DESC LIMIT ?", (DICTIONARY_MAX_SAMPLES,)
+    ) as cursor:
+        samples = [row[0].encode('utf-8') for row in await cursor.fetchall()]
+    if len(samples) < DICTIONARY_MIN_SAMPLES:
+        async with db.execute(
+            "SELECT document_id FROM document_payloads ORDER BY rowid DESC LIMIT ?", (DICTIONARY_MAX_SAMPLES,)
+        ) as cursor:
+            ids = [row[0] for row in await cursor.fetchall()]
+        samples = [json.dumps(doc).encode('utf-8') for doc in (await load_payloads(db, ids)).values()]
+    if len(samples) < DICTIONARY_MIN_SAMPLES:
+        return None
+    dictionary = train_dictionary(samples)
+    await db.execute(
+        "INSERT OR IGNORE INTO payload_dictionaries (id, codec, dictionary, samples) VALUES (?, ?, ?, ?)",
+        (dictionary.id, dictionary.codec, dictionary.data, len(samples))
+    )
+    _dictionaries[dictionary.id] = dictionary
+    logger.info(f"Trained a {len(dictionary.data)} byte {dictionary.codec} dictionary on {len(samples)} documents")
+    return dictionary
+
+async def move_payloads(db: aiosqlite.Connection, batch_size: int = 1000) -> int:
+    """Compress raw_json of every document into document_payloads and clear the column."""
+    dictionary = await current_dictionary(db) or await train_from_database(db)
+    moved = 0
+    while True:
+        # Each batch clears the rows it moved, so the next one starts from the rest
+        async with db.execute(
+            "SELECT id, raw_json FROM federal_register_documents WHERE raw_json IS NOT NULL LIMIT ?",
+            (batch_size,)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        if not rows:
+            break
+        await write_payloads(db, rows, dictionary)
+        await db.executemany("UPDATE federal_register_documents SET raw_json = NULL WHERE id = ?",
+                             [(row[0],) for row in rows])
+        await db.commit()
+        moved += len(rows)
+    return moved
+
+async def ensure_payload_tables(db: aiosqlite.Connection) -> int:
+    """Create the payload tables and move any inline raw_json into them.
+
+    Returns the number of documents moved; 0 once the database is migrated.
+    """
+    for statement in PAYLOAD_SCHEMA_SQL:
+        await db.execute(statement)
+    async with db.execute(
+        "SELECT 1 FROM federal_register_documents WHERE raw_json IS NOT NULL LIMIT 1"
+    ) as cursor:
+        pending = await cursor.fetchone() is not None
+    if not pending:
+        return 0
+    moved = await move_payloads(db)
+    logger.info(f"Moved {moved} raw_json payloads to document_payloads; run VACUUM to reclaim the space")
+    return moved
+
+def _timed(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def storage_report(files: List[Path]) -> Dict[str, Any]:
+    """Compare inline raw_json with compressed side-table payloads on raw data files.
+
+    Builds one throwaway database per layout from the same documents and
+    measures file size, a metadata listing that never reads the payload,
+    and loading full documents by id.
+    """
+    import sqlite3
+    from data_pipeline.json_stream import iter_documents
+    from data_pipeline.agencies import agency_names
+
+    async def read_all() -> List[Dict[str, Any]]:
+        documents = {}
+        for filepath in files:
+            async for doc in iter_documents(filepath):
+                if doc.get('document_number'):
+                    documents[str(doc['document_number'])] = doc
+        return list(documents.values())
+
+    documents = asyncio.run(read_all())
+    raw = [(str(doc['document_number']), json.dumps(doc)) for doc in documents]
+    ids = [document_id for document_id, _ in raw]
+    sample_ids = ids[::max(1, len(ids) // 200)]
+    listing_sql = ("SELECT id, title, publication_date, agency_names FROM federal_register_documents "
+                   "ORDER BY publication_date DESC")
+
+    results: Dict[str, Any] = {"documents": len(raw), "raw_bytes": sum(len(j.encode('utf-8')) for _, j in raw)}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, mode in (("inline", None), ("compressed", "plain"), ("compressed+dictionary", "dictionary")):
+            path = Path(tmp) / f"{name}.db"
+            conn = sqlite3.connect(path)
+            conn.execute("""CREATE TABLE federal_register_documents (id TEXT PRIMARY KEY, document_number TEXT,
+                title TEXT, abstract TEXT, document_type TEXT, publication_date TEXT, agency_names TEXT,
+                raw_json TEXT)""")
+            for statement in PAYLOAD_SCHEMA_SQL:
+                conn.execute(statement)
+            dictionary = train_dictionary([j.encode('utf-8') for _, j in raw[:DICTIONARY_MAX_SAMPLES]]) \
+                if mode == "dictionary" else None
+            for doc, (document_id, raw_json) in zip(documents, raw):
+                conn.execute("INSERT INTO federal_register_documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (
+                    document_id, document_id, doc.get('title'), doc.get('abstract'), doc.get('type'),
+                    doc.get('publication_date'), agency_names(doc.get('agencies', [])),
+                    raw_json if mode is None else None
+                ))
+                if mode is not None:
+                    codec, dictionary_id, raw_size, payload = compress_payload(raw_json, dictionary)
+                    conn.execute(PAYLOAD_UPSERT_SQL, (document_id, codec, dictionary_id, raw_size, payload))
+            conn.commit()
+            conn.execute("VACUUM")
+
+            def listing():
+                conn.execute(listing_sql).fetchall()
+
+            def load():
+                placeholders = ", ".join("?" for _ in sample_ids)
+                if mode is None:
+                    rows = conn.execute(f"SELECT raw_json FROM federal_register_documents "
+                                        f"WHERE id IN ({placeholders})", sample_ids).fetchall()
+                    [json.loads(row[0]) for row in rows]
+                else:
+                    rows = conn.execute(f"SELECT codec, payload FROM document_payloads "
+                                        f"WHERE document_id IN ({placeholders})", sample_ids).fetchall()
+                    [json.loads(decompress_payload(codec, payload, dictionary)) for codec, payload in rows]
+
+            payload_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM document_payloads").fetchone()[0]
+            results[name] = {
+                "codec": (dictionary.codec if dictionary else default_codec()) if mode else "none",
+                "db_bytes": path.stat().st_size,
+                "payload_bytes": payload_bytes or results["raw_bytes"],
+                "listing_ms": round(_timed(listing) * 1000, 2),
+                "load_ms_per_doc": round(_timed(load) * 1000 / max(1, len(sample_ids)), 4)
+            }
+            conn.close()
+    return results
+
+async def main():
+    """Move raw_json of the pipeline database into compressed document_payloads."""
+    db_path = get_db_path()
+    if not db_path.exists():
+        logger.error(f"Database not found at {db_path}")
+        return
+    async with aiosqlite.connect(db_path) as db:
+        moved = await ensure_payload_tables(db)
+        await db.commit()
+        if moved:
+            # Stable document rowids, so VACUUM leaves the FTS index valid
+            from data_pipeline.migrations import apply_migrations
+            await apply_migrations(db)
+            await db.execute("VACUUM")
+    logger.info(f"Moved {moved} payloads")
+
+if __name__ == "__main__":
+    if "--report" in sys.argv[1:]:
+        # python -m data_pipeline.payloads --report [raw data files...]
+        paths = [Path(arg) for arg in sys.argv[1:] if arg != "--report"]
+        paths = paths or sorted(Path("data_pipeline/raw_data").glob("federal_register_*.json*"))
+        report = storage_report(paths)
+        print(f"{report['documents']} documents, {report['raw_bytes']} bytes of raw JSON")
+        print(f"{'layout':24}{'codec':>8}{'db bytes':>12}{'payload':>12}{'listing ms':>12}{'load ms/doc':>13}")
+        for layout in ("inline", "compressed", "compressed+dictionary"):
+            row = report[layout]
+            print(f"{layout:24}{row['codec']:>8}{row['db_bytes']:>12}{row['payload_bytes']:>12}"
+                  f"{row['listing_ms']:>12}{row['load_ms_per_doc']:>13}")
+    else:
+        asyncio.run(main())
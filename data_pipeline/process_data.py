@@ -1,113 +1,237 @@
+import os
 import json
+import time
 import asyncio
-import aiofiles
+import argparse
 from datetime import datetime
 from pathlib import Path
 import aiosqlite
 import logging
-from typing import List, Dict, Any
-from data_pipeline.utils import get_db_path
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple, Union
+from data_pipeline.utils import get_db_path, bump_data_version
+from data_pipeline.search_index import ensure_fts_index
+from data_pipeline.agencies import ensure_agency_tables, agency_names, agency_rows
+from data_pipeline.migrations import apply_migrations
+from data_pipeline.payloads import (
+    PayloadDictionary, ensure_payload_tables, compress_payload, current_dictionary,
+    train_from_database, DICTIONARY_MIN_SAMPLES
+)
+from data_pipeline.storage import StorageConnection, SQLiteConnection
+from data_pipeline.json_stream import iter_documents, batched
+from data_pipeline.vector_index import VectorIndex, document_text
+from data_pipeline.manifest import ensure_manifest_tables, file_needs_processing, record_file, document_hash
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Processes parsing raw data files in parallel; 1 parses on the event loop
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '1'))
+
+# Connection-level settings used while bulk loading
+INGEST_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY"
+]
+
+def document_row(doc: Dict[str, Any]) -> tuple:
+    """Return the StorageConnection.upsert_documents row for a processed document, followed by its raw_json.
+
+    raw_json is part of the content hash but goes to the compressed
+    document_payloads table, not this row.
+    """
+    return (
+        doc['id'],
+        doc['document_number'],
+        doc['title'],
+        doc['abstract'],
+        doc['document_type'],
+        doc['publication_date'],
+        doc['agency_names'],
+        doc['raw_json']
+    )
+
+# A document ready to write: its row without raw_json, content hash,
+# compressed payload (codec, dictionary id, raw size, bytes) and agency rows
+ParsedDocument = Tuple[tuple, str, Tuple[str, Optional[str], int, bytes], Tuple[tuple, ...]]
+
+def parse_document(row: tuple, agencies: List[Any],
+                   dictionary: Optional[PayloadDictionary] = None) -> ParsedDocument:
+    """Hash and compress a document row (raw_json last, as document_row() builds it) for writing."""
+    return row[:-1], document_hash(row), compress_payload(row[-1], dictionary), tuple(agency_rows(agencies))
+
+async def write_parsed_documents(db: Union[aiosqlite.Connection, StorageConnection], parsed: List[ParsedDocument],
+                                 vector_index: Optional[VectorIndex] = None, batch_size: int = 500) -> int:
+    """Write the changed documents of a parsed list in batched transactions. Returns those written.
+
+    Documents whose content hash is unchanged are skipped and the rest are
+    hashed (and embedded, given a vector index) before each commit. Every
+    ingest path writes through here. db is an aiosqlite connection or any
+    StorageConnection.
+    """
+    written = 0
+    store = db if isinstance(db, StorageConnection) else SQLiteConnection(db)
+    for i in range(0, len(parsed), batch_size):
+        batch = parsed[i:i + batch_size]
+        known = await store.known_hashes([row[0] for row, _, _, _ in batch])
+        changed = [doc for doc in batch if known.get(doc[0][0]) != doc[1]]
+        if changed:
+            await store.upsert_documents([row for row, _, _, _ in changed])
+            await store.upsert_payloads([(row[0],) + payload for row, _, payload, _ in changed])
+            await store.replace_agency_rows([(row[0], agencies) for row, _, _, agencies in changed])
+            await store.record_document_hashes([(row[0], digest) for row, digest, _, _ in changed])
+            if vector_index is not None:
+                # Embed before committing so a failure leaves the batch to be retried
+                await asyncio.to_thread(
+                    vector_index.add,
+                    [row[0] for row, _, _, _ in changed],
+                    [document_text(row[2], row[3]) for row, _, _, _ in changed]
+                )
+            written += len(changed)
+        await store.commit()
+    return written
+
+async def apply_ingest_pragmas(db: aiosqlite.Connection) -> None:
+    """Tune an SQLite connection for bulk writes."""
+    for pragma in INGEST_PRAGMAS:
+        await db.execute(pragma)
+
+def normalize_document(doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Map a raw API document to a database row, or None if required fields are missing."""
+    # Use document_number as the unique id
+    doc_id = str(doc.get('document_number', ''))
+    processed_doc = {
+        'id': doc_id,
+        'document_number': doc_id,
+        'title': str(doc.get('title', '')).strip(),
+        'abstract': str(doc.get('abstract', '')).strip(),
+        'document_type': str(doc.get('type', '')),
+        'publication_date': str(doc.get('publication_date', '')),
+        'agency_names': agency_names(doc.get('agencies', [])),
+        'agencies': doc.get('agencies', []),
+        'raw_json': json.dumps(doc)
+    }
+
+    # Only keep documents with required fields
+    if all([
+        processed_doc['id'],
+        processed_doc['title'],
+        processed_doc['publication_date']
+    ]):
+        return processed_doc
+    return None
+
 class FederalRegisterProcessor:
-    def __init__(self, raw_data_dir="data_pipeline/raw_data"):
+    def __init__(self, raw_data_dir="data_pipeline/raw_data", batch_size=500):
         self.raw_data_dir = Path(raw_data_dir)
+        self.batch_size = batch_size
         
+    async def iter_processed_documents(self, filepath: Path) -> AsyncIterator[Dict[str, Any]]:
+        """Stream normalized documents from a raw data file one at a time."""
+        async for doc in iter_documents(filepath):
+            try:
+                processed_doc = normalize_document(doc)
+            except Exception as e:
+                logger.error(f"Error processing document: {str(e)}")
+                continue
+            if processed_doc is not None:
+                yield processed_doc
+
     async def process_file(self, filepath: Path) -> List[Dict[str, Any]]:
         """Process a single JSON file of Federal Register documents."""
         try:
-            async with aiofiles.open(filepath, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                documents = json.loads(content)
-            
-            if not isinstance(documents, list):
-                logger.error(f"Expected a list of documents, got {type(documents)}")
-                return []
-            
-            processed_docs = []
-            for doc in documents:
-                try:
-                    # Use document_number as the unique id
-                    doc_id = str(doc.get('document_number', ''))
-                    processed_doc = {
-                        'id': doc_id,
-                        'document_number': doc_id,
-                        'title': str(doc.get('title', '')).strip(),
-                        'abstract': str(doc.get('abstract', '')).strip(),
-                        'document_type': str(doc.get('type', '')),
-                        'publication_date': str(doc.get('publication_date', '')),
-                        'agency_names': ', '.join(str(agency) for agency in doc.get('agencies', [])),
-                        'raw_json': json.dumps(doc)
-                    }
-                    
-                    # Only add documents with required fields
-                    if all([
-                        processed_doc['id'],
-                        processed_doc['title'],
-                        processed_doc['publication_date']
-                    ]):
-                        processed_docs.append(processed_doc)
-                except Exception as e:
-                    logger.error(f"Error processing document: {str(e)}")
-                    continue
-            
+            processed_docs = [doc async for doc in self.iter_processed_documents(filepath)]
             logger.info(f"Successfully processed {len(processed_docs)} documents")
             return processed_docs
             
         except Exception as e:
             logger.error(f"Error processing file {filepath}: {str(e)}")
             return []
+
+    def _batches(self, documents) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Split a list or async stream of documents into batch_size chunks."""
+        if not isinstance(documents, list):
+            return batched(documents, self.batch_size)
+
+        async def list_batches():
+            for i in range(0, len(documents), self.batch_size):
+                yield documents[i:i + self.batch_size]
+        return list_batches()
     
-    async def save_to_database(self, documents: List[Dict[str, Any]], db_path: Path) -> int:
-        """Save processed documents to SQLite database."""
-        if not documents:
+    async def _prepare_database(self, db: aiosqlite.Connection) -> None:
+        """Apply ingest pragmas, make sure the FTS, agency, manifest and payload tables exist and migrate."""
+        await apply_ingest_pragmas(db)
+
+        # Make sure the full-text index and its sync triggers exist
+        await ensure_fts_index(db)
+        # Payloads first: creating the agency tables backfills them from payloads
+        await ensure_payload_tables(db)
+        await ensure_agency_tables(db)
+        await ensure_manifest_tables(db)
+        await db.commit()
+        await apply_migrations(db)
+
+    async def _write_documents(self, db: aiosqlite.Connection, documents,
+                               vector_index: VectorIndex) -> Tuple[int, int]:
+        """Parse documents and write those whose content changed. Returns (documents seen, documents written)."""
+        seen = 0
+        written = 0
+        dictionary = await current_dictionary(db)
+        # One transaction per batch
+        async for batch in self._batches(documents):
+            seen += len(batch)
+            parsed = [parse_document(document_row(doc), doc.get('agencies', []), dictionary) for doc in batch]
+            written += await write_parsed_documents(db, parsed, vector_index, len(parsed))
+        if written:
+            bump_data_version()
+        if dictionary is None and written >= DICTIONARY_MIN_SAMPLES:
+            # Later ingests compress against a dictionary learned from this one
+            await train_from_database(db)
+            await db.commit()
+        return seen, written
+
+    async def save_to_database(self, documents: Union[List[Dict[str, Any]], AsyncIterator[Dict[str, Any]]],
+                               db_path: Path) -> int:
+        """Save processed documents to SQLite database in batched transactions.
+
+        documents may be a list or an async iterator; iterators are consumed
+        one batch at a time so the whole file is never held in memory.
+        Documents whose content hash is unchanged are skipped.
+        """
+        if isinstance(documents, list) and not documents:
             logger.warning("No documents to save")
             return 0
             
+        started = time.perf_counter()
         try:
             async with aiosqlite.connect(db_path) as db:
-                # Insert documents
-                for doc in documents:
-                    sql = """
-                    INSERT INTO federal_register_documents 
-                    (id, document_number, title, abstract, document_type, 
-                     publication_date, agency_names, raw_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(id) DO UPDATE SET
-                    title = excluded.title,
-                    abstract = excluded.abstract,
-                    document_type = excluded.document_type,
-                    publication_date = excluded.publication_date,
-                    agency_names = excluded.agency_names,
-                    raw_json = excluded.raw_json
-                    """
-                    await db.execute(sql, (
-                        doc['id'],
-                        doc['document_number'],
-                        doc['title'],
-                        doc['abstract'],
-                        doc['document_type'],
-                        doc['publication_date'],
-                        doc['agency_names'],
-                        doc['raw_json']
-                    ))
-                
-                await db.commit()
-            logger.info(f"Successfully saved {len(documents)} documents to database")
-            return len(documents)
+                await self._prepare_database(db)
+                seen, saved = await self._write_documents(db, documents, VectorIndex.for_database(db_path))
+
+            elapsed = time.perf_counter() - started
+            rate = seen / elapsed if elapsed > 0 else 0.0
+            logger.info(
+                f"Successfully saved {saved} of {seen} documents to database in {elapsed:.2f}s "
+                f"({rate:.0f} rows/sec, {seen - saved} unchanged)"
+            )
+            return saved
             
         except Exception as e:
             logger.error(f"Error saving to database: {str(e)}")
             return 0
     
+    def raw_data_files(self) -> List[Path]:
+        """List raw data files (JSON arrays and JSON Lines)."""
+        return (list(self.raw_data_dir.glob('federal_register_*.json')) +
+                list(self.raw_data_dir.glob('federal_register_*.jsonl')))
+
     async def process_latest_data(self, db_path: Path) -> int:
         """Process the most recent data file."""
         try:
             # Get the most recent file
-            files = list(self.raw_data_dir.glob('federal_register_*.json'))
+            files = self.raw_data_files()
             if not files:
                 logger.warning("No data files found to process")
                 return 0
@@ -115,23 +239,74 @@ class FederalRegisterProcessor:
             latest_file = max(files, key=lambda x: x.stat().st_mtime)
             logger.info(f"Processing file: {latest_file}")
             
-            # Process and save to database
-            processed_docs = await self.process_file(latest_file)
-            if processed_docs:
-                saved_count = await self.save_to_database(processed_docs, db_path)
-                return saved_count
-            
-            return 0
+            # Stream, process and save to database batch by batch
+            return await self.save_to_database(self.iter_processed_documents(latest_file), db_path)
             
         except Exception as e:
             logger.error(f"Error in process_latest_data: {str(e)}")
             return 0
 
-async def main():
+    async def process_new_data(self, db_path: Path, workers: int = INGEST_WORKERS) -> int:
+        """Process every raw data file that is new or changed since the last run.
+
+        Files are tracked in the processed_files manifest by size, mtime and
+        content hash; within a changed file only documents whose content hash
+        differs from the stored one are written. With more than one worker,
+        files are parsed in a process pool (see data_pipeline.parallel_ingest).
+        Returns the documents written.
+        """
+        files = sorted(self.raw_data_files(), key=lambda x: x.stat().st_mtime)
+        if not files:
+            logger.warning("No data files found to process")
+            return 0
+
+        total_written = 0
+        vector_index = VectorIndex.for_database(db_path)
+        async with aiosqlite.connect(db_path) as db:
+            await self._prepare_database(db)
+            if workers > 1:
+                from data_pipeline.parallel_ingest import process_files_parallel
+                return await process_files_parallel(db, files, vector_index, workers, self.batch_size)
+
+            for filepath in files:
+                try:
+                    needs_processing, content_hash = await file_needs_processing(db, filepath)
+                    if not needs_processing:
+                        logger.info(f"Skipping unchanged file: {filepath}")
+                        await db.commit()
+                        continue
+
+                    logger.info(f"Processing file: {filepath}")
+                    started = time.perf_counter()
+                    seen, written = await self._write_documents(
+                        db, self.iter_processed_documents(filepath), vector_index
+                    )
+                    await record_file(db, filepath, content_hash, seen)
+                    await db.commit()
+
+                    total_written += written
+                    elapsed = time.perf_counter() - started
+                    logger.info(
+                        f"Saved {written} of {seen} documents from {filepath.name} in {elapsed:.2f}s "
+                        f"({seen - written} unchanged)"
+                    )
+                except Exception as e:
+                    # Leave the file out of the manifest so the next run retries it
+                    await db.rollback()
+                    logger.error(f"Error processing file {filepath}: {str(e)}")
+
+        return total_written
+
+async def main(args=None):
     """Main function to run the processor."""
+    parser = argparse.ArgumentParser(description="Load raw data files into the SQLite database")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                        help="Processes parsing files in parallel (1 parses on the event loop)")
+    args = parser.parse_args(args)
+
     db_path = get_db_path()
     processor = FederalRegisterProcessor()
-    count = await processor.process_latest_data(db_path)
+    count = await processor.process_new_data(db_path, workers=args.workers)
     logger.info(f"Pipeline completed. Processed {count} documents.")
 
 if __name__ == "__main__":
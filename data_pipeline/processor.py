@@ -1,98 +1,233 @@
+import sys
 import json
+import time
 import asyncio
-import aiofiles
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 import aiomysql
-from .db_config import DB_CONFIG, CREATE_TABLES_SQL
+from .json_stream import iter_documents, batched
+from .utils import bump_data_version
+from .agencies import agency_names
+from .payloads import compress_payload, decompress_payload
+from .storage import Repository, MySQLRepository
+from .manifest import file_needs_processing, record_file
+from .process_data import document_row, parse_document, write_parsed_documents
+
+def process_document(doc):
+    """Normalize a raw API document into the fields the processor writes."""
+    return {
+        # API search results carry no id; the document number is unique
+        'id': doc.get('id') or doc.get('document_number'),
+        'document_number': doc.get('document_number'),
+        'title': doc.get('title'),
+        'abstract': doc.get('abstract'),
+        'document_type': doc.get('type'),
+        'publication_date': doc.get('publication_date'),
+        'agency_names': agency_names(doc.get('agencies', [])),
+        'agencies': doc.get('agencies', []),
+        'raw_json': json.dumps(doc)
+    }
+
+def payload_row(doc):
+    """Return the StorageConnection.upsert_payloads row for a processed document."""
+    return (doc['id'],) + compress_payload(doc['raw_json'])
 
 class FederalRegisterProcessor:
-    def __init__(self, raw_data_dir="data_pipeline/raw_data"):
+    def __init__(self, raw_data_dir="data_pipeline/raw_data", batch_size=500):
         self.raw_data_dir = Path(raw_data_dir)
+        self.batch_size = batch_size
         
+    async def iter_processed_documents(self, filepath):
+        """Stream processed documents from a raw data file one at a time."""
+        async for doc in iter_documents(filepath):
+            yield process_document(doc)
+
     async def process_file(self, filepath):
         """Process a single JSON file of Federal Register documents."""
-        async with aiofiles.open(filepath, 'r') as f:
-            content = await f.read()
-            documents = json.loads(content)
-        
-        processed_docs = []
-        for doc in documents:
-            processed_doc = {
-                'id': doc.get('id'),
-                'document_number': doc.get('document_number'),
-                'title': doc.get('title'),
-                'abstract': doc.get('abstract'),
-                'document_type': doc.get('type'),
-                'publication_date': doc.get('publication_date'),
-                'agency_names': ', '.join(doc.get('agencies', [])),
-                'raw_json': json.dumps(doc)
-            }
-            processed_docs.append(processed_doc)
-        
-        return processed_docs
+        return [doc async for doc in self.iter_processed_documents(filepath)]
     
-    async def save_to_database(self, documents):
-        """Save processed documents to MySQL database."""
-        pool = await aiomysql.create_pool(**DB_CONFIG)
-        
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                # Create tables if they don't exist
-                await cur.execute(CREATE_TABLES_SQL)
-                
-                # Insert documents
-                for doc in documents:
-                    sql = """
-                    INSERT INTO federal_register_documents 
-                    (id, document_number, title, abstract, document_type, 
-                     publication_date, agency_names, raw_json)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    title = VALUES(title),
-                    abstract = VALUES(abstract),
-                    document_type = VALUES(document_type),
-                    publication_date = VALUES(publication_date),
-                    agency_names = VALUES(agency_names),
-                    raw_json = VALUES(raw_json)
-                    """
-                    await cur.execute(sql, (
-                        doc['id'],
-                        doc['document_number'],
-                        doc['title'],
-                        doc['abstract'],
-                        doc['document_type'],
-                        doc['publication_date'],
-                        doc['agency_names'],
-                        doc['raw_json']
-                    ))
-                
-                await conn.commit()
+    async def save_to_database(self, documents, repository: Optional[Repository] = None):
+        """Save processed documents (a list or async iterator) in batched transactions.
+
+        Writes to MySQL unless another repository is given.
+        """
+        owned = repository is None
+        repository = repository or MySQLRepository()
+        started = time.perf_counter()
+        saved = 0
+
+        if isinstance(documents, list):
+            async def list_batches():
+                for i in range(0, len(documents), self.batch_size):
+                    yield documents[i:i + self.batch_size]
+            batches = list_batches()
+        else:
+            batches = batched(documents, self.batch_size)
         
-        pool.close()
-        await pool.wait_closed()
+        try:
+            # Create tables if they don't exist
+            await repository.ensure_schema()
+            async with repository.acquire() as conn:
+                # Each bulk write is a single multi-row statement per batch
+                async for batch in batches:
+                    await conn.upsert_documents([document_row(doc)[:-1] for doc in batch])
+                    await conn.upsert_payloads([payload_row(doc) for doc in batch])
+                    await conn.replace_document_agencies([(doc['id'], doc['agencies']) for doc in batch])
+                    await conn.commit()
+                    saved += len(batch)
+        finally:
+            if owned:
+                await repository.close()
+
+        if saved:
+            bump_data_version()
+
+        elapsed = time.perf_counter() - started
+        rate = saved / elapsed if elapsed > 0 else 0.0
+        print(f"Saved {saved} documents in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+        return saved
     
+    async def backfill_agencies(self):
+        """Populate the agency tables from the payloads of documents already in MySQL."""
+        repository = MySQLRepository()
+        linked = 0
+        try:
+            await repository.ensure_schema()
+            async with repository.acquire() as reader, repository.acquire() as writer:
+                # Stream rows on one connection while writing on the other
+                async with reader.raw.cursor(aiomysql.SSCursor) as read_cur:
+                    await read_cur.execute("""
+                    SELECT d.id, p.codec, p.payload, d.raw_json
+                    FROM federal_register_documents d
+                    LEFT JOIN document_payloads p ON p.document_id = d.id
+                    """)
+                    while True:
+                        rows = await read_cur.fetchmany(self.batch_size)
+                        if not rows:
+                            break
+                        documents = []
+                        for doc_id, codec, payload, raw_json in rows:
+                            # Rows not yet moved by --move-payloads still have raw_json
+                            raw_json = decompress_payload(codec, payload) if payload is not None else raw_json
+                            if raw_json:
+                                documents.append((doc_id, json.loads(raw_json).get('agencies', [])))
+                        await writer.replace_document_agencies(documents)
+                        await writer.commit()
+                        linked += len(documents)
+        finally:
+            await repository.close()
+
+        print(f"Linked agencies for {linked} documents")
+        return linked
+
+    async def move_payloads(self):
+        """Compress the raw_json column of existing rows into document_payloads and clear it."""
+        repository = MySQLRepository()
+        moved = 0
+        try:
+            await repository.ensure_schema()
+            async with repository.acquire() as conn:
+                while True:
+                    # Moved rows are cleared, so each batch starts from the remaining ones
+                    rows = await conn.fetch_all(
+                        "SELECT id, raw_json FROM federal_register_documents WHERE raw_json IS NOT NULL LIMIT ?",
+                        (self.batch_size,)
+                    )
+                    if not rows:
+                        break
+                    await conn.upsert_payloads([
+                        (doc_id,) + compress_payload(raw_json) for doc_id, raw_json in rows
+                    ])
+                    await conn.execute_many("UPDATE federal_register_documents SET raw_json = NULL WHERE id = ?",
+                                            [(doc_id,) for doc_id, _ in rows])
+                    await conn.commit()
+                    moved += len(rows)
+        finally:
+            await repository.close()
+
+        print(f"Moved {moved} payloads to document_payloads; OPTIMIZE TABLE federal_register_documents reclaims the space")
+        return moved
+
+    def raw_data_files(self):
+        """Raw data files in the order they were written."""
+        files = (list(self.raw_data_dir.glob('federal_register_*.json')) +
+                 list(self.raw_data_dir.glob('federal_register_*.jsonl')))
+        return sorted(files, key=lambda x: x.stat().st_mtime)
+
+    async def process_new_data(self, repository: Optional[Repository] = None):
+        """Load the raw data files that are new or changed since they were last processed.
+
+        Files are tracked in the processed_files manifest and documents whose
+        content hash is unchanged are not rewritten. A file is recorded in the
+        same transaction as its last batch; a failed file is rolled back and
+        left out of the manifest so the next run retries it. Writes to MySQL
+        unless another repository is given.
+        """
+        owned = repository is None
+        repository = repository or MySQLRepository()
+        started = time.perf_counter()
+        saved = 0
+        try:
+            await repository.ensure_schema()
+            async with repository.acquire() as conn:
+                for filepath in self.raw_data_files():
+                    needs_processing, content_hash = await file_needs_processing(conn, filepath)
+                    if not needs_processing:
+                        print(f"Skipping unchanged file: {filepath}")
+                        # Keep the refreshed mtime of a touched file
+                        await conn.commit()
+                        continue
+                    seen = written = 0
+                    try:
+                        async for batch in batched(self.iter_processed_documents(filepath), self.batch_size):
+                            seen += len(batch)
+                            # Hashed with raw_json, like the SQLite path, so payload-only changes are written
+                            parsed = [parse_document(document_row(doc), doc['agencies']) for doc in batch]
+                            written += await write_parsed_documents(conn, parsed, batch_size=len(parsed))
+                        await record_file(conn, filepath, content_hash, seen)
+                        await conn.commit()
+                    except Exception as e:
+                        await conn.rollback()
+                        print(f"Error processing file {filepath}: {str(e)}")
+                        continue
+                    saved += written
+                    print(f"Saved {written} of {seen} documents from {filepath.name} ({seen - written} unchanged)")
+        finally:
+            if owned:
+                await repository.close()
+
+        if saved:
+            bump_data_version()
+
+        elapsed = time.perf_counter() - started
+        print(f"Loaded {saved} new or changed documents in {elapsed:.2f}s")
+        return saved
+
     async def process_latest_data(self):
-        """Process the most recent data file."""
+        """Process the most recent data file, whether or not it was loaded before."""
         try:
-            # Get the most recent file
-            files = list(self.raw_data_dir.glob('federal_register_*.json'))
+            files = self.raw_data_files()
             if not files:
                 return 0
             
-            latest_file = max(files, key=lambda x: x.stat().st_mtime)
-            
-            # Process and save to database
-            processed_docs = await self.process_file(latest_file)
-            await self.save_to_database(processed_docs)
-            
-            return len(processed_docs)
+            # Stream, process and save to database batch by batch
+            return await self.save_to_database(self.iter_processed_documents(files[-1]))
             
         except Exception as e:
             print(f"Error processing data: {str(e)}")
             return 0
 
 if __name__ == "__main__":
-    # Test the processor
     processor = FederalRegisterProcessor()
-    asyncio.run(processor.process_latest_data()) 
\ No newline at end of file
+    if "--backfill-agencies" in sys.argv[1:]:
+        # One-off migration for databases created before the agency tables
+        asyncio.run(processor.backfill_agencies())
+    elif "--move-payloads" in sys.argv[1:]:
+        # One-off migration for databases that store raw_json inline
+        asyncio.run(processor.move_payloads())
+    elif "--latest" in sys.argv[1:]:
+        # Reload the newest raw data file regardless of the manifest
+        asyncio.run(processor.process_latest_data())
+    else:
+        asyncio.run(processor.process_new_data()) 
\ No newline at end of file
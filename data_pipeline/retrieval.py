@@ -0,0 +1,204 @@
+import re
+import asyncio
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from data_pipeline.utils import get_db_path
+from data_pipeline.storage import SQLiteRepository
+from data_pipeline.search_index import FTS_TABLE, BM25_WEIGHTS, build_match_query
+from data_pipeline.vector_index import VectorIndex
+from data_pipeline.agencies import agency_document_filter
+
+logger = logging.getLogger(__name__)
+
+# Federal Register document numbers look like 2025-08860
+DOCUMENT_NUMBER_RE = re.compile(r"\b\d{4}-\d{4,6}\b")
+
+DOCUMENT_COLUMNS = "d.id, d.document_number, d.title, d.abstract, d.document_type, d.publication_date, d.agency_names"
+
+# Statement templates; {filters} is "" or "AND <conditions>" from HybridRetriever._filters.
+# check_db.py explains these, so keep every query the retriever issues here.
+EXACT_SQL = f"""
+SELECT {DOCUMENT_COLUMNS}, NULL FROM federal_register_documents d
+WHERE d.document_number IN ({{placeholders}}) {{filters}}
+"""
+
+LEXICAL_SQL = f"""
+SELECT {DOCUMENT_COLUMNS}, snippet({FTS_TABLE}, -1, '[', ']', '...', 16)
+FROM {FTS_TABLE}
+JOIN federal_register_documents d ON d.rowid = {FTS_TABLE}.rowid
+WHERE {FTS_TABLE} MATCH ? {{filters}}
+ORDER BY bm25({FTS_TABLE}, {', '.join(str(w) for w in BM25_WEIGHTS)})
+LIMIT ?
+"""
+
+CANDIDATES_SQL = "SELECT d.id FROM federal_register_documents d WHERE 1 {filters}"
+
+FETCH_SQL = f"SELECT {DOCUMENT_COLUMNS}, NULL FROM federal_register_documents d WHERE d.id IN ({{placeholders}})"
+
+class HybridRetriever:
+    """Lexical + vector retrieval fused with reciprocal rank fusion.
+
+    The lexical ranker is the BM25-ranked FTS5 index and the vector ranker is
+    cosine similarity over the embedding index. Both run concurrently over the
+    same pre-filtered candidate set (date range, agency and its sub-agencies,
+    document type), and each document's fused score is the sum of
+    1 / (rrf_k + rank) over the rankers that found it.
+    Documents whose number appears verbatim in the query are returned first.
+
+    Queries run on pooled read-only connections, so the database may be a
+    replica the web tier never writes to. When a new snapshot is published
+    the retriever switches to it and to the vector index stored with it.
+    """
+
+    def __init__(self, db_path: Path, vector_index: Optional[VectorIndex] = None,
+                 rrf_k: int = 60, candidates: int = 50, repository: Optional[SQLiteRepository] = None):
+        self.db_path = Path(db_path)
+        self.repository = repository or SQLiteRepository(self.db_path, readonly=True)
+        self._vector_index = vector_index
+        self._vector_indexes: Dict[Path, VectorIndex] = {}
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+
+    def vector_index(self, db_path: Optional[Path] = None) -> VectorIndex:
+        """The vector index stored with a database file (the one given at construction, if any)."""
+        if self._vector_index is not None:
+            return self._vector_index
+        db_path = db_path or self.repository.path
+        index = self._vector_indexes.get(db_path)
+        if index is None:
+            # Keep only the index of the file being read; a superseded snapshot's is released
+            self._vector_indexes = {db_path: VectorIndex.for_database(db_path)}
+            index = self._vector_indexes[db_path]
+        return index
+
+    async def _filters(self, start_date: Optional[str], end_date: Optional[str], agency: Optional[str],
+                       document_type: Optional[str]) -> Tuple[str, list]:
+        """SQL conditions on federal_register_documents (aliased d) for the metadata filters."""
+        clauses = []
+        params = []
+        if start_date:
+            clauses.append("d.publication_date >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("d.publication_date <= ?")
+            params.append(end_date)
+        if agency:
+            # Resolved through the agencies table, including sub-agencies
+            async with self.repository.acquire() as conn:
+                clause, agency_params = await agency_document_filter(conn, agency)
+            clauses.append(clause)
+            params.extend(agency_params)
+        if document_type:
+            clauses.append("d.document_type = ?")
+            params.append(document_type)
+        return " AND ".join(clauses), params
+
+    async def _lexical(self, query: str, where: str, params: list) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return (exact document-number matches, BM25-ranked FTS matches)."""
+        exact = []
+        results = []
+        async with self.repository.acquire() as conn:
+            db = conn.raw
+            filters = f"AND {where}" if where else ""
+            numbers = DOCUMENT_NUMBER_RE.findall(query)
+            if numbers:
+                placeholders = ", ".join("?" for _ in numbers)
+                sql = EXACT_SQL.format(placeholders=placeholders, filters=filters)
+                async with db.execute(sql, numbers + params) as cursor:
+                    exact = await cursor.fetchall()
+
+            match_query = build_match_query(query)
+            if match_query is not None:
+                sql = LEXICAL_SQL.format(filters=filters)
+                async with db.execute(sql, [match_query] + params + [self.candidates]) as cursor:
+                    results = await cursor.fetchall()
+
+        return [self._row_to_dict(row) for row in exact], [self._row_to_dict(row) for row in results]
+
+    async def _vector(self, query: str, where: str, params: list) -> List[Dict[str, Any]]:
+        """Cosine top-k restricted to documents that pass the filters."""
+        async with self.repository.acquire() as conn:
+            db = conn.raw
+            candidate_ids = None
+            if where:
+                # Pre-filter: score only the documents that satisfy the metadata filters
+                async with db.execute(CANDIDATES_SQL.format(filters=f"AND {where}"), params) as cursor:
+                    candidate_ids = [row[0] for row in await cursor.fetchall()]
+                if not candidate_ids:
+                    return []
+
+            index = self.vector_index(conn.path)
+            hits = await asyncio.to_thread(index.search, query, self.candidates, candidate_ids)
+            if not hits:
+                return []
+
+            placeholders = ", ".join("?" for _ in hits)
+            async with db.execute(
+                FETCH_SQL.format(placeholders=placeholders), [doc_id for doc_id, _ in hits]
+            ) as cursor:
+                rows = {row[0]: row for row in await cursor.fetchall()}
+
+        return [self._row_to_dict(rows[doc_id]) for doc_id, _ in hits if doc_id in rows]
+
+    @staticmethod
+    def _row_to_dict(row: tuple) -> Dict[str, Any]:
+        return {
+            "id": row[0],
+            "document_number": row[1],
+            "title": row[2],
+            "abstract": row[3],
+            "document_type": row[4],
+            "publication_date": row[5],
+            "agency_names": row[6],
+            "snippet": row[7] or (row[3] or "")[:200]
+        }
+
+    async def search(self, query: str, limit: int = 10, start_date: Optional[str] = None,
+                     end_date: Optional[str] = None, agency: Optional[str] = None,
+                     document_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Run both rankers concurrently and return the top documents by fused score."""
+        where, params = await self._filters(start_date, end_date, agency, document_type)
+        (exact, lexical), vector = await asyncio.gather(
+            self._lexical(query, where, params),
+            self._vector(query, where, params)
+        )
+
+        fused: Dict[str, Dict[str, Any]] = {}
+        # A document number named in the query is unambiguous: pin it above every fused score
+        for doc in exact:
+            fused[doc["id"]] = {**doc, "score": 1.0, "lexical_rank": None, "vector_rank": None}
+        for ranker, ranked in (("lexical", lexical), ("vector", vector)):
+            seen = set()
+            for doc in ranked:
+                if doc["id"] in seen:
+                    continue
+                rank = len(seen) + 1
+                seen.add(doc["id"])
+                entry = fused.setdefault(doc["id"], {**doc, "score": 0.0, "lexical_rank": None, "vector_rank": None})
+                entry["score"] += 1.0 / (self.rrf_k + rank)
+                entry[f"{ranker}_rank"] = rank
+                # Prefer the FTS snippet, which highlights the matched terms
+                if ranker == "lexical" and doc["snippet"]:
+                    entry["snippet"] = doc["snippet"]
+
+        results = sorted(fused.values(), key=lambda d: d["score"], reverse=True)
+        return results[:limit]
+
+    async def close(self) -> None:
+        """Close the pooled connections."""
+        await self.repository.close()
+
+_retriever = None
+
+def get_retriever() -> HybridRetriever:
+    """Shared retriever over the pipeline database."""
+    global _retriever
+    if _retriever is None:
+        _retriever = HybridRetriever(get_db_path())
+    return _retriever
+
+async def close_retriever() -> None:
+    """Close the shared retriever's connections (called at application shutdown)."""
+    if _retriever is not None:
+        await _retriever.close()
@@ -0,0 +1,277 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Optional
+import aiohttp
+from .fetch_data import FederalRegisterFetcher
+from .processor import process_document
+from .process_data import ParsedDocument, document_row, parse_document, write_parsed_documents
+from .payloads import PayloadDictionary, current_dictionary, train_from_database, DICTIONARY_MIN_SAMPLES
+from .storage import Repository, SQLiteConnection, open_repository
+from .utils import bump_data_version
+from .vector_index import VectorIndex
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PIPELINE_NAME = 'federal_register_pipeline'
+
+# Seconds between scheduled runs in daemon mode
+PIPELINE_INTERVAL = float(os.getenv('PIPELINE_INTERVAL', '21600'))
+# Furthest back a run catches up when days were missed (or the database is empty)
+PIPELINE_MAX_CATCHUP_DAYS = int(os.getenv('PIPELINE_MAX_CATCHUP_DAYS', '30'))
+# Items buffered between stages; a slow stage makes the ones before it wait
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '4'))
+
+# Sentinel closing a stage queue
+_DONE = None
+
+async def log_pipeline_run(repository: Repository, pipeline_name: str, status: str, start_time: datetime,
+                           end_time: datetime, records_processed: int,
+                           error_message: Optional[str] = None) -> None:
+    """Log a pipeline run (or one stage of it) to the database."""
+    try:
+        async with repository.transaction() as conn:
+            await conn.log_pipeline_run(pipeline_name, status, start_time, end_time,
+                                        records_processed, error_message)
+    except Exception as e:
+        logger.error(f"Error logging pipeline run: {str(e)}")
+
+class StageStats:
+    """Wall-clock span and row count of one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start_time: Optional[datetime] = None
+        self.end_time: Optional[datetime] = None
+        self.rows = 0
+        self.busy = 0.0
+        self.error: Optional[str] = None
+        self.cancelled = False
+
+    def __enter__(self) -> "StageStats":
+        self.start_time = datetime.now()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end_time = datetime.now()
+        if isinstance(exc, asyncio.CancelledError):
+            self.cancelled = True
+        elif exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+
+    @property
+    def status(self) -> str:
+        if self.error:
+            return 'error'
+        return 'cancelled' if self.cancelled else 'success'
+
+class IngestScheduler:
+    """Incremental ingest as overlapping download, parse and write stages.
+
+    Each run works out the days to fetch from the newest publication_date
+    already stored (re-fetching that day, which may have been partial, and
+    catching up on any missed days up to max_catchup_days). Days are
+    downloaded one at a time, parsed into row batches and written in
+    batched transactions; the stages run concurrently, connected by bounded
+    queues, so at most queue_size items wait between any two of them.
+
+    Rows go to any storage Repository, MySQL by default. On SQLite they go
+    through the same writer as process_data: unchanged documents are skipped
+    and the rest are embedded into the vector index. A named lock (a
+    MySQL GET_LOCK, or a lock file next to an SQLite database) keeps a single
+    instance ingesting at a time. Every stage and the run as a whole are recorded in
+    pipeline_logs with their real start/end times and row counts.
+    """
+
+    LOCK_NAME = PIPELINE_NAME
+
+    def __init__(self, fetcher: Optional[FederalRegisterFetcher] = None, batch_size: int = 500,
+                 queue_size: int = PIPELINE_QUEUE_SIZE, interval: float = PIPELINE_INTERVAL,
+                 max_catchup_days: int = PIPELINE_MAX_CATCHUP_DAYS, archive: bool = True):
+        self.fetcher = fetcher or FederalRegisterFetcher()
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.interval = interval
+        self.max_catchup_days = max_catchup_days
+        # Keep the raw API responses in raw_data as one JSON Lines file per day
+        self.archive = archive
+
+    async def pending_days(self, conn, today: Optional[date] = None) -> List[date]:
+        """Days to fetch: from the newest stored publication date through today."""
+        today = today or date.today()
+        latest = await conn.latest_publication_date()
+        earliest = today - timedelta(days=self.max_catchup_days - 1)
+        start = max(latest, earliest) if latest else earliest
+        return [start + timedelta(days=i) for i in range((today - start).days + 1)]
+
+    async def _download(self, days: List[date], out: asyncio.Queue, stats: StageStats) -> None:
+        with stats:
+            connector = aiohttp.TCPConnector(limit=self.fetcher.max_concurrency)
+            async with aiohttp.ClientSession(timeout=self.fetcher.timeout, connector=connector) as session:
+                semaphore = asyncio.Semaphore(self.fetcher.max_concurrency)
+                for day in days:
+                    started = time.perf_counter()
+                    documents = await self.fetcher.fetch_window(
+                        session, semaphore, day.isoformat(), day.isoformat()
+                    )
+                    if self.archive and documents:
+                        await self.fetcher.save_documents(
+                            documents, self.fetcher.output_dir / f"federal_register_{day.isoformat()}.jsonl"
+                        )
+                    stats.busy += time.perf_counter() - started
+                    stats.rows += len(documents)
+                    logger.info(f"Downloaded {len(documents)} documents for {day.isoformat()}")
+                    await out.put(documents)
+            # On failure there is no sentinel: _run_stages cancels the other stages
+            await out.put(_DONE)
+
+    async def _parse(self, source: asyncio.Queue, out: asyncio.Queue, stats: StageStats,
+                     dictionary: Optional[PayloadDictionary] = None) -> None:
+        with stats:
+            batch: List[ParsedDocument] = []
+            while (documents := await source.get()) is not _DONE:
+                started = time.perf_counter()
+                for raw in documents:
+                    doc = process_document(raw)
+                    if not doc['id']:
+                        continue
+                    batch.append(parse_document(document_row(doc), doc['agencies'], dictionary))
+                    stats.rows += 1
+                    if len(batch) >= self.batch_size:
+                        stats.busy += time.perf_counter() - started
+                        await out.put(batch)
+                        batch = []
+                        started = time.perf_counter()
+                stats.busy += time.perf_counter() - started
+            if batch:
+                await out.put(batch)
+            await out.put(_DONE)
+
+    async def _write(self, conn, source: asyncio.Queue, stats: StageStats,
+                     vector_index: Optional[VectorIndex] = None) -> None:
+        with stats:
+            while (batch := await source.get()) is not _DONE:
+                started = time.perf_counter()
+                # Skips unchanged documents and hashes (and, on SQLite, embeds) the rest
+                stats.rows += await write_parsed_documents(conn, batch, vector_index, len(batch))
+                stats.busy += time.perf_counter() - started
+
+    @staticmethod
+    async def _run_stages(*coroutines) -> None:
+        """Run stages concurrently; the first failure cancels the others and is raised."""
+        tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+    async def run_once(self, repository: Repository) -> Dict[str, Any]:
+        """Ingest every pending day, unless another instance holds the lock."""
+        async with repository.lock(self.LOCK_NAME) as locked:
+            if not locked:
+                logger.info("Another pipeline instance is running, skipping this run")
+                return {"status": "locked"}
+            return await self._run_locked(repository)
+
+    async def _ingest(self, conn, days: List[date], stages: List[StageStats]) -> None:
+        download, parse, write = stages
+        logger.info(f"Ingesting {days[0].isoformat()}..{days[-1].isoformat()} ({len(days)} days)")
+
+        # SQLite keeps the vector index and payload dictionary that
+        # process_data maintains; MySQL has neither
+        vector_index = dictionary = None
+        if isinstance(conn, SQLiteConnection):
+            vector_index = VectorIndex.for_database(conn.path)
+            dictionary = await current_dictionary(conn.raw)
+
+        downloaded: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        parsed: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        await self._run_stages(
+            self._download(days, downloaded, download),
+            self._parse(downloaded, parsed, parse, dictionary),
+            self._write(conn, parsed, write, vector_index)
+        )
+
+        if vector_index is not None and dictionary is None and write.rows >= DICTIONARY_MIN_SAMPLES:
+            # Later ingests compress against a dictionary learned from this one
+            await train_from_database(conn.raw)
+            await conn.commit()
+
+    async def _run_locked(self, repository: Repository) -> Dict[str, Any]:
+        start_time = datetime.now()
+        stages = [StageStats(name) for name in ("download", "parse", "write")]
+        write = stages[-1]
+        days: List[date] = []
+        error = None
+
+        try:
+            await repository.ensure_schema()
+            async with repository.acquire() as conn:
+                days = await self.pending_days(conn)
+                if not days:
+                    logger.info("Newest stored publication date is after today, nothing to fetch")
+                else:
+                    await self._ingest(conn, days, stages)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.error(f"Pipeline failed: {error}")
+
+        if write.rows:
+            bump_data_version()
+        end_time = datetime.now()
+        status = 'error' if error else ('success' if write.rows else 'no_new_data')
+
+        for stage in stages:
+            if stage.start_time is None:
+                continue
+            await log_pipeline_run(repository, f"{PIPELINE_NAME}.{stage.name}", stage.status, stage.start_time,
+                                   stage.end_time or end_time, stage.rows, stage.error)
+        await log_pipeline_run(repository, PIPELINE_NAME, status, start_time, end_time, write.rows, error)
+
+        summary = {
+            "status": status,
+            "days": [day.isoformat() for day in days],
+            "elapsed_s": round((end_time - start_time).total_seconds(), 2),
+            "stages": {stage.name: {"rows": stage.rows, "busy_s": round(stage.busy, 2)} for stage in stages},
+            "error": error
+        }
+        logger.info(f"Pipeline {status}: {summary['stages']} in {summary['elapsed_s']}s")
+        return summary
+
+    async def run_forever(self, stop: Optional[asyncio.Event] = None,
+                          repository: Optional[Repository] = None) -> None:
+        """Run now and then every interval seconds until stop is set.
+
+        Runs are spaced from the start of the previous one; a run that takes
+        longer than the interval is followed immediately by the next, which
+        catches up on whatever it missed.
+        """
+        stop = stop or asyncio.Event()
+        owned = repository is None
+        repository = repository or open_repository()
+        try:
+            while not stop.is_set():
+                started = time.monotonic()
+                try:
+                    await self.run_once(repository)
+                except Exception as e:
+                    # Keep the daemon alive through database outages
+                    logger.error(f"Scheduled run failed: {str(e)}")
+                delay = max(0.0, self.interval - (time.monotonic() - started))
+                logger.info(f"Next run in {delay:.0f}s")
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if owned:
+                await repository.close()
@@ -0,0 +1,108 @@
+import re
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional
+import aiosqlite
+from data_pipeline.utils import get_db_path
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "documents_fts"
+
+# External-content FTS5 table over federal_register_documents, kept in sync by
+# triggers. Its rowid is the doc_rowid INTEGER PRIMARY KEY (SQLite migration 2),
+# so VACUUM never renumbers the rows the index points at.
+FTS_SCHEMA_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, abstract, agency_names,
+        content='federal_register_documents',
+        content_rowid='rowid',
+        tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON federal_register_documents BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, abstract, agency_names)
+        VALUES (new.rowid, new.title, new.abstract, new.agency_names);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON federal_register_documents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, abstract, agency_names)
+        VALUES ('delete', old.rowid, old.title, old.abstract, old.agency_names);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF title, abstract, agency_names ON federal_register_documents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, abstract, agency_names)
+        VALUES ('delete', old.rowid, old.title, old.abstract, old.agency_names);
+        INSERT INTO {FTS_TABLE}(rowid, title, abstract, agency_names)
+        VALUES (new.rowid, new.title, new.abstract, new.agency_names);
+    END
+    """
+]
+
+# BM25 column weights for title, abstract and agency_names
+BM25_WEIGHTS = (10.0, 5.0, 2.0)
+
+def build_match_query(text: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 MATCH expression.
+
+    Each term is quoted so user input cannot inject FTS5 operators; terms are
+    OR-ed together and BM25 ranks documents matching more of them higher.
+    """
+    terms = re.findall(r"[\w-]+", text)
+    terms = [term.strip('-') for term in terms if term.strip('-')]
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+async def ensure_fts_index(db: aiosqlite.Connection) -> bool:
+    """Create the FTS table and triggers if missing. Returns True if they were created."""
+    async with db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ) as cursor:
+        exists = await cursor.fetchone() is not None
+
+    for statement in FTS_SCHEMA_SQL:
+        await db.execute(statement)
+
+    if not exists:
+        # Index documents that were saved before the FTS table existed
+        await rebuild_fts_index(db)
+        logger.info(f"Created full-text index {FTS_TABLE}")
+    return not exists
+
+async def rebuild_fts_index(db: aiosqlite.Connection) -> None:
+    """Rebuild the FTS index from the contents of federal_register_documents."""
+    await db.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+async def backfill(db_path: Path) -> int:
+    """Create (if needed) and fully rebuild the FTS index of an existing database."""
+    async with aiosqlite.connect(db_path) as db:
+        created = await ensure_fts_index(db)
+        if not created:
+            await rebuild_fts_index(db)
+        await db.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        await db.commit()
+
+        async with db.execute("SELECT COUNT(*) FROM federal_register_documents") as cursor:
+            count = (await cursor.fetchone())[0]
+    return count
+
+async def main():
+    """Backfill the full-text index of the pipeline database."""
+    db_path = get_db_path()
+    if not db_path.exists():
+        logger.error(f"Database not found at {db_path}")
+        return
+    count = await backfill(db_path)
+    logger.info(f"Full-text index rebuilt for {count} documents")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,187 @@
+import os
+import sys
+import time
+import shutil
+import asyncio
+import sqlite3
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import aiosqlite
+from data_pipeline.utils import get_db_path, bump_data_version, create_sqlite_schema
+from data_pipeline.search_index import FTS_TABLE
+from data_pipeline.vector_index import VectorIndex
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Published snapshots kept on disk: the current one and those readers may still have open
+SNAPSHOT_KEEP = int(os.getenv('SNAPSHOT_KEEP', '2'))
+
+def snapshot_dir(db_path: Path) -> Path:
+    """Directory holding the snapshots of a database."""
+    return Path(db_path).parent / "snapshots"
+
+def pointer_path(db_path: Path) -> Path:
+    """File naming the published snapshot (rag_chat.current for rag_chat.db)."""
+    db_path = Path(db_path)
+    return db_path.with_name(db_path.stem + ".current")
+
+def current_snapshot(db_path: Path) -> Optional[Path]:
+    """The published snapshot of a database, or None if none was published."""
+    try:
+        name = pointer_path(db_path).read_text().strip()
+    except FileNotFoundError:
+        return None
+    path = snapshot_dir(db_path) / name
+    return path if name and path.exists() else None
+
+def _vector_files(db_path: Path) -> List[Path]:
+    index = VectorIndex.for_database(db_path)
+    # Metadata first: its row count is authoritative, so copying it before the
+    # data never exposes rows that were not copied
+    return [index.meta_path, index.vectors_path, index.ids_path]
+
+def copy_database(source: Path, target: Path) -> None:
+    """Consistent copy of a database (even one being written) and its vector index."""
+    src = sqlite3.connect(f"{source.resolve().as_uri()}?mode=ro", uri=True)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    for src_file, dst_file in zip(_vector_files(source), _vector_files(target)):
+        if src_file.exists():
+            shutil.copyfile(src_file, dst_file)
+
+async def finalize_snapshot(db: aiosqlite.Connection) -> None:
+    """Compact, optimize and analyze a freshly loaded snapshot, leaving it a single file.
+
+    The snapshot must be migrated (create_sqlite_schema), so that the
+    document rowids the FTS index is keyed on survive VACUUM.
+    """
+    # Readers open the snapshot immutable, which ignores any -wal file
+    async with db.execute("PRAGMA journal_mode = DELETE") as cursor:
+        await cursor.fetchone()
+    await db.execute("VACUUM")
+    await db.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    await db.execute("ANALYZE")
+    await db.commit()
+    async with db.execute("PRAGMA quick_check") as cursor:
+        result = (await cursor.fetchone())[0]
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"Snapshot failed quick_check: {result}")
+
+def publish_snapshot(db_path: Path, staged: Path) -> Path:
+    """Move a finalized snapshot into place and point readers at it.
+
+    Nothing refers to the snapshot files until the pointer is replaced, and
+    os.replace is atomic, so readers see either the old snapshot or the new
+    one (database and vector index together), never a mix.
+    """
+    directory = snapshot_dir(db_path)
+    published = directory / staged.name
+    for src_file, dst_file in zip(_vector_files(staged), _vector_files(published)):
+        if src_file.exists():
+            os.replace(src_file, dst_file)
+    os.replace(staged, published)
+
+    pointer = pointer_path(db_path)
+    tmp_path = pointer.with_suffix(".tmp")
+    tmp_path.write_text(published.name)
+    os.replace(tmp_path, pointer)
+    bump_data_version()
+    return published
+
+def prune_snapshots(db_path: Path, keep: int = SNAPSHOT_KEEP) -> List[Path]:
+    """Delete all but the newest keep snapshots (never the published one). Returns the removed ones.
+
+    Readers still holding a removed snapshot open keep reading it until they
+    reconnect; they switch to the published one on their next checkout.
+    """
+    db_path = Path(db_path)
+    current = current_snapshot(db_path)
+    snapshots = sorted(snapshot_dir(db_path).glob(f"{db_path.stem}-*.db"), reverse=True)
+    removed = []
+    for path in snapshots[keep:]:
+        if path == current:
+            continue
+        for file in [path] + _vector_files(path):
+            file.unlink(missing_ok=True)
+        removed.append(path)
+    return removed
+
+async def build_snapshot(db_path: Optional[Path] = None, processor=None) -> Dict[str, Any]:
+    """Ingest new raw data into a fresh snapshot built off to the side, then swap it in.
+
+    The snapshot starts as a copy of the published one (or of the database
+    itself before the first snapshot), loads every new or changed raw data
+    file, and is finalized before being published. Readers are never blocked
+    by the load; a failed build leaves the published snapshot untouched.
+    """
+    from data_pipeline.process_data import FederalRegisterProcessor
+    from data_pipeline.storage import SQLiteRepository
+
+    db_path = Path(db_path or get_db_path())
+    processor = processor or FederalRegisterProcessor()
+    directory = snapshot_dir(db_path)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # One builder at a time; a second one would publish a snapshot missing the first one's data
+    async with SQLiteRepository(db_path).lock("snapshot") as locked:
+        if not locked:
+            logger.info("Another snapshot build is running, skipping")
+            return {"status": "locked"}
+
+        started = time.perf_counter()
+        name = f"{db_path.stem}-{datetime.now().strftime('%Y%m%d%H%M%S%f')}.db"
+        # Built in its own directory so the vector index files keep their final names
+        staging_dir = directory / f".staging-{name}"
+        staging_dir.mkdir()
+        staged = staging_dir / name
+        try:
+            source = current_snapshot(db_path) or (db_path if db_path.exists() else None)
+            if source is not None:
+                await asyncio.to_thread(copy_database, source, staged)
+            # Creates a new database's schema, or migrates a copied one
+            async with aiosqlite.connect(staged) as db:
+                await create_sqlite_schema(db)
+
+            written = await processor.process_new_data(staged)
+            async with aiosqlite.connect(staged) as db:
+                await finalize_snapshot(db)
+                async with db.execute("SELECT COUNT(*) FROM federal_register_documents") as cursor:
+                    count = (await cursor.fetchone())[0]
+
+            published = publish_snapshot(db_path, staged)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        removed = prune_snapshots(db_path)
+
+    summary = {
+        "status": "success",
+        "snapshot": published.name,
+        "source": source.name if source else None,
+        "documents_written": written,
+        "documents": count,
+        "bytes": published.stat().st_size,
+        "build_s": round(time.perf_counter() - started, 2),
+        "pruned": [path.name for path in removed]
+    }
+    logger.info(f"Published snapshot {published.name}: {count} documents ({written} new or changed) "
+                f"in {summary['build_s']}s")
+    return summary
+
+async def main():
+    """Build and publish a snapshot of the pipeline database."""
+    if "--current" in sys.argv[1:]:
+        # python -m data_pipeline.snapshot --current
+        print(current_snapshot(get_db_path()) or "No snapshot published")
+        return
+    await build_snapshot()
+
+if __name__ == "__main__":
+    asyncio.run(main())
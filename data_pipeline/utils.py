@@ -10,31 +10,79 @@ logger = logging.getLogger(__name__)
 
 DB_PATH = Path("data_pipeline/rag_chat.db")
 
-async def log_pipeline_run(db_path: Path, status: str, records_processed: int, error_message: str = None) -> None:
-    """Log pipeline execution details to database."""
-    try:
-        async with aiosqlite.connect(db_path) as db:
-            sql = """
-            INSERT INTO pipeline_logs 
-            (pipeline_name, status, start_time, end_time, records_processed, error_message)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """
-            await db.execute(sql, (
-                'federal_register_pipeline',
-                status,
-                datetime.now().isoformat(),
-                datetime.now().isoformat(),
-                records_processed,
-                error_message
-            ))
-            await db.commit()
-    except Exception as e:
-        logger.error(f"Error logging pipeline run: {str(e)}")
-
 def get_db_path() -> Path:
     """Get database path."""
     return DB_PATH
 
+# Touched after every ingest that changes documents; caches key on its mtime
+DATA_VERSION_PATH = DB_PATH.with_name("data_version")
+
+def get_data_version() -> str:
+    """Return a stamp that changes whenever the pipeline ingests new documents."""
+    try:
+        return str(DATA_VERSION_PATH.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return "0"
+
+def bump_data_version() -> None:
+    """Record that the document set changed, invalidating dependent caches."""
+    DATA_VERSION_PATH.parent.mkdir(parents=True, exist_ok=True)
+    DATA_VERSION_PATH.write_text(datetime.now().isoformat())
+
+async def create_sqlite_schema(db: aiosqlite.Connection) -> None:
+    """Create missing tables and indexes and apply pending migrations."""
+    # Create tables
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS federal_register_documents (
+        doc_rowid INTEGER PRIMARY KEY, -- stable rowid for the FTS index
+        id TEXT NOT NULL UNIQUE,
+        document_number TEXT,
+        title TEXT,
+        abstract TEXT,
+        document_type TEXT,
+        publication_date TEXT,
+        agency_names TEXT,
+        raw_json TEXT, -- legacy; full documents live in document_payloads
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS pipeline_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pipeline_name TEXT,
+        status TEXT,
+        start_time TIMESTAMP,
+        end_time TIMESTAMP,
+        records_processed INTEGER,
+        error_message TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # Full-text index over title/abstract/agency_names
+    from data_pipeline.search_index import ensure_fts_index
+    await ensure_fts_index(db)
+
+    # Compressed full documents, read only on demand
+    from data_pipeline.payloads import ensure_payload_tables
+    await ensure_payload_tables(db)
+
+    # Normalized agencies and document links for indexed agency lookups
+    from data_pipeline.agencies import ensure_agency_tables
+    await ensure_agency_tables(db)
+
+    # Processed-file manifest and per-document content hashes
+    from data_pipeline.manifest import ensure_manifest_tables
+    await ensure_manifest_tables(db)
+
+    await db.commit()
+
+    # Secondary indexes and later schema changes
+    from data_pipeline.migrations import apply_migrations
+    await apply_migrations(db)
+
 async def create_database_if_not_exists() -> None:
     """Create the database and tables if they don't exist."""
     try:
@@ -42,36 +90,7 @@ async def create_database_if_not_exists() -> None:
         DB_PATH.parent.mkdir(parents=True, exist_ok=True)
         
         async with aiosqlite.connect(DB_PATH) as db:
-            # Create tables
-            await db.execute("""
-            CREATE TABLE IF NOT EXISTS federal_register_documents (
-                id TEXT PRIMARY KEY,
-                document_number TEXT,
-                title TEXT,
-                abstract TEXT,
-                document_type TEXT,
-                publication_date TEXT,
-                agency_names TEXT,
-                raw_json TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
-            
-            await db.execute("""
-            CREATE TABLE IF NOT EXISTS pipeline_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pipeline_name TEXT,
-                status TEXT,
-                start_time TIMESTAMP,
-                end_time TIMESTAMP,
-                records_processed INTEGER,
-                error_message TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
-            
-            await db.commit()
+            await create_sqlite_schema(db)
         
         logger.info("Database and tables created successfully")
         
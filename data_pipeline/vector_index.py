@@ -0,0 +1,228 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Optional, Sequence, Tuple, Iterable
+import numpy as np
+import aiosqlite
+from data_pipeline.utils import get_db_path
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STOP_WORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were which will with
+""".split())
+
+class HashingEmbedder:
+    """Deterministic, offline text embedder using the hashing trick.
+
+    Unigrams and bigrams are hashed (crc32) into `dim` buckets with a hashed
+    sign, weighted by sublinear term frequency and L2-normalized, so the dot
+    product of two vectors is their cosine similarity. No vocabulary or
+    corpus statistics are needed, so vectors never have to be recomputed as
+    the corpus grows. Any object with `name`, `dim` and `embed()` can be used
+    in its place.
+    """
+
+    name = "hashing-v1"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        words = [w for w in re.findall(r"\w+", text.lower()) if w not in STOP_WORDS]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts into an (n, dim) float32 matrix of unit vectors."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token, count in Counter(self.tokenize(text)).items():
+                h = zlib.crc32(token.encode('utf-8'))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dim] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+def document_text(title: Optional[str], abstract: Optional[str]) -> str:
+    """Text that is embedded for a document."""
+    parts = [part for part in (title, abstract) if part and part != "None"]
+    return "\n".join(parts)
+
+class VectorIndex:
+    """Embedding matrix stored next to the SQLite database and memory-mapped for search.
+
+    Files (for rag_chat.db):
+      rag_chat.vectors.f32   raw float32 rows, appended as documents arrive
+      rag_chat.vectors.ids   one document id per line, row-aligned
+      rag_chat.vectors.json  metadata; its row count is written last and is
+                             authoritative, so a torn append is ignored
+    """
+
+    def __init__(self, base_path: Path, embedder=None):
+        self.base_path = Path(base_path)
+        self.embedder = embedder or HashingEmbedder()
+        self.vectors_path = self.base_path.with_name(self.base_path.name + ".vectors.f32")
+        self.ids_path = self.base_path.with_name(self.base_path.name + ".vectors.ids")
+        self.meta_path = self.base_path.with_name(self.base_path.name + ".vectors.json")
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._meta_mtime: Optional[int] = None
+
+    @classmethod
+    def for_database(cls, db_path: Path, embedder=None) -> "VectorIndex":
+        """Index stored alongside the given database file."""
+        db_path = Path(db_path)
+        return cls(db_path.with_suffix(""), embedder)
+
+    def _read_meta(self) -> Dict:
+        if not self.meta_path.exists():
+            return {"count": 0, "dim": self.embedder.dim, "embedder": self.embedder.name}
+        meta = json.loads(self.meta_path.read_text())
+        if meta["dim"] != self.embedder.dim or meta["embedder"] != self.embedder.name:
+            raise ValueError(
+                f"Vector index {self.meta_path} was built with {meta['embedder']}/{meta['dim']}; "
+                f"rebuild it for {self.embedder.name}/{self.embedder.dim}"
+            )
+        return meta
+
+    def _write_meta(self, count: int) -> None:
+        tmp_path = self.meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"count": count, "dim": self.embedder.dim, "embedder": self.embedder.name}))
+        os.replace(tmp_path, self.meta_path)
+
+    def load(self) -> None:
+        """(Re)open the memory map if the index changed on disk since the last load."""
+        try:
+            mtime = self.meta_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._matrix is not None and mtime == self._meta_mtime:
+            return
+
+        count = self._read_meta()["count"]
+        ids = []
+        if count:
+            with open(self.ids_path, encoding='utf-8') as f:
+                ids = [line.rstrip("\n") for _, line in zip(range(count), f)]
+            matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(count, self.embedder.dim))
+        else:
+            matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._ids = ids
+        self._positions = {doc_id: i for i, doc_id in enumerate(ids)}
+        self._matrix = matrix
+        self._meta_mtime = mtime
+
+    def __len__(self) -> int:
+        self.load()
+        return len(self._ids)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> int:
+        """Embed and store documents; existing ids are overwritten in place. Returns rows appended."""
+        if not ids:
+            return 0
+        self.load()
+        vectors = self.embedder.embed(texts)
+
+        # The last occurrence wins when an id repeats within one call
+        last = {doc_id: i for i, doc_id in enumerate(ids)}
+        updates = [(self._positions[doc_id], i) for doc_id, i in last.items() if doc_id in self._positions]
+        new_rows = [i for doc_id, i in last.items() if doc_id not in self._positions]
+
+        count = len(self._ids)
+        if updates:
+            matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(count, self.embedder.dim))
+            for position, i in updates:
+                matrix[position] = vectors[i]
+            matrix.flush()
+            del matrix
+
+        if new_rows:
+            self.vectors_path.parent.mkdir(parents=True, exist_ok=True)
+            # Truncate anything past the committed row count left by an interrupted append
+            with open(self.vectors_path, 'ab') as f:
+                f.truncate(count * self.embedder.dim * 4)
+                f.write(np.ascontiguousarray(vectors[new_rows]).tobytes())
+            with open(self.ids_path, 'ab') as f:
+                f.truncate(sum(len(doc_id.encode('utf-8')) + 1 for doc_id in self._ids))
+                f.write("".join(f"{ids[i]}\n" for i in new_rows).encode('utf-8'))
+            count += len(new_rows)
+
+        self._write_meta(count)
+        self._matrix = None
+        return len(new_rows)
+
+    def search(self, query: str, k: int = 5,
+               candidate_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Return the k most similar documents as (id, cosine similarity), best first.
+
+        When candidate_ids is given, only those documents are scored.
+        """
+        self.load()
+        if not self._ids:
+            return []
+        q = self.embedder.embed([query])[0]
+        if not q.any():
+            return []
+
+        if candidate_ids is None:
+            rows = None
+            scores = self._matrix @ q
+        else:
+            rows = np.fromiter((self._positions[i] for i in candidate_ids if i in self._positions), dtype=np.int64)
+            if rows.size == 0:
+                return []
+            scores = self._matrix[rows] @ q
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if rows is not None:
+            return [(self._ids[rows[i]], float(scores[i])) for i in top]
+        return [(self._ids[i], float(scores[i])) for i in top]
+
+    def clear(self) -> None:
+        """Delete the index files."""
+        for path in (self.meta_path, self.vectors_path, self.ids_path):
+            path.unlink(missing_ok=True)
+        self._matrix = None
+        self._ids = []
+        self._positions = {}
+
+async def build_index(db_path: Path, batch_size: int = 2000) -> int:
+    """Rebuild the vector index of a database from scratch."""
+    index = VectorIndex.for_database(db_path)
+    index.clear()
+    total = 0
+    async with aiosqlite.connect(db_path) as db:
+        async with db.execute("SELECT id, title, abstract FROM federal_register_documents") as cursor:
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                ids = [row[0] for row in rows]
+                texts = [document_text(row[1], row[2]) for row in rows]
+                total += await asyncio.to_thread(index.add, ids, texts)
+    return total
+
+async def main():
+    """Rebuild the vector index of the pipeline database."""
+    db_path = get_db_path()
+    if not db_path.exists():
+        logger.error(f"Database not found at {db_path}")
+        return
+    count = await build_index(db_path)
+    logger.info(f"Vector index built for {count} documents")
+
+if __name__ == "__main__":
+    asyncio.run(main())
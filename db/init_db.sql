@@ -11,9 +11,58 @@ CREATE TABLE IF NOT EXISTS federal_register_documents (
     document_type VARCHAR(100),
     publication_date DATE,
     agency_names TEXT,
-    raw_json JSON,
+    raw_json JSON, -- legacy; full documents live in document_payloads
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FULLTEXT INDEX ft_documents (title, abstract, agency_names),
+    INDEX idx_documents_date (publication_date, document_type),
+    INDEX idx_documents_type_date (document_type, publication_date),
+    INDEX idx_documents_number (document_number),
+    INDEX idx_documents_date_id (publication_date)
+);
+
+-- Create the agencies table, keyed by Federal Register agency id
+CREATE TABLE IF NOT EXISTS agencies (
+    id INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    slug VARCHAR(255),
+    parent_id INT,
+    UNIQUE INDEX idx_agencies_slug (slug),
+    INDEX idx_agencies_name (name),
+    INDEX idx_agencies_parent (parent_id)
+);
+
+-- Create the document_agencies link table
+CREATE TABLE IF NOT EXISTS document_agencies (
+    document_id VARCHAR(255) NOT NULL,
+    agency_id INT NOT NULL,
+    PRIMARY KEY (document_id, agency_id),
+    INDEX idx_document_agencies_agency (agency_id, document_id)
+);
+
+-- Create the document_payloads table: full API documents, compressed
+CREATE TABLE IF NOT EXISTS document_payloads (
+    document_id VARCHAR(255) PRIMARY KEY,
+    codec VARCHAR(16) NOT NULL,
+    dictionary_id VARCHAR(32),
+    raw_size INT NOT NULL,
+    payload LONGBLOB NOT NULL
+);
+
+-- Create the processed_files table: raw data files already loaded
+CREATE TABLE IF NOT EXISTS processed_files (
+    path VARCHAR(512) PRIMARY KEY,
+    size BIGINT,
+    mtime DOUBLE,
+    content_hash VARCHAR(64),
+    documents INT,
+    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create the document_hashes table: content hashes of stored documents
+CREATE TABLE IF NOT EXISTS document_hashes (
+    id VARCHAR(255) PRIMARY KEY,
+    content_hash VARCHAR(64)
 );
 
 -- Create the pipeline_logs table
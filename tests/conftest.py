@@ -0,0 +1,9 @@
+import pytest
+from data_pipeline import utils
+
+@pytest.fixture(autouse=True)
+def data_version(tmp_path, monkeypatch):
+    """Keep ingests under test from bumping the real data version."""
+    path = tmp_path / "data_version"
+    monkeypatch.setattr(utils, "DATA_VERSION_PATH", path)
+    return path
@@ -0,0 +1,60 @@
+import asyncio
+import aiosqlite
+import pytest
+from data_pipeline.agencies import AGENCY_SCHEMA_SQL, resolve_agency, agency_document_filter, name_matches
+from data_pipeline.storage import SQLiteConnection
+
+AGENCIES = [
+    (1, "Environmental Protection Agency", "environmental-protection-agency", None),
+    (2, "Commerce Department", "commerce-department", None),
+    (3, "Census Bureau", "census-bureau", 2),
+    (4, "National Oceanic and Atmospheric Administration", "national-oceanic-and-atmospheric-administration", 2),
+    (5, "National Marine Fisheries Service", "national-marine-fisheries-service", 4),
+    (6, "Health and Human Services Department", "health-and-human-services-department", None),
+    (7, "Food and Drug Administration", "food-and-drug-administration", 6),
+    (8, "Treasury Department", "treasury-department", None)
+]
+
+def resolve(*args, **kwargs):
+    async def run():
+        async with aiosqlite.connect(":memory:") as db:
+            for statement in AGENCY_SCHEMA_SQL:
+                await db.execute(statement)
+            await db.executemany("INSERT INTO agencies VALUES (?, ?, ?, ?)", AGENCIES)
+            return sorted(await resolve_agency(SQLiteConnection(db), *args, **kwargs))
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("agency", ["2", "commerce-department", "Commerce Department", "commerce department"])
+def test_exact_match_expands_to_subagencies(agency):
+    assert resolve(agency) == [2]
+    assert resolve(agency, include_subagencies=True) == [2, 3, 4, 5]
+
+def test_acronym_does_not_match_letters_inside_words():
+    # "Department" contains "epa"; only the agency whose initials these are matches
+    assert resolve("EPA", include_subagencies=True) == [1]
+    assert resolve("FDA") == [7]
+    assert resolve("NOAA") == [4]
+
+def test_loose_match_needs_whole_words_and_is_not_expanded():
+    assert resolve("Department of Commerce", include_subagencies=True) == [2]
+    assert resolve("Department") == [2, 6, 8]
+    assert resolve("Fisheries") == [5]
+    assert resolve("Fish") == []
+    assert resolve("Commerce Bureau") == []
+
+@pytest.mark.parametrize("agency", ["", "  ", "of the", "99"])
+def test_unknown_agency(agency):
+    assert resolve(agency) == []
+
+def test_name_matches():
+    assert name_matches(["treasury"], "Treasury Department")
+    # A one-word name has no acronym to match
+    assert not name_matches(["t"], "Treasury")
+
+def test_agency_document_filter_without_match():
+    async def run():
+        async with aiosqlite.connect(":memory:") as db:
+            for statement in AGENCY_SCHEMA_SQL:
+                await db.execute(statement)
+            return await agency_document_filter(db, "Nonexistent Office")
+    assert asyncio.run(run()) == ("0", [])
@@ -0,0 +1,89 @@
+import asyncio
+import aiohttp
+import pytest
+from aiohttp import web
+from data_pipeline.fetch_data import FederalRegisterFetcher
+
+class StubAPI:
+    """Federal Register API stub answering each request with the next scripted response.
+
+    A response is (status, body, headers), where body may be a function of
+    the request (to build a next_page_url on the stub's own address); the
+    last response repeats once the script runs out. Request URLs are
+    recorded in order.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def documents(self, request: web.Request) -> web.Response:
+        self.requests.append(request.rel_url)
+        status, body, headers = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if status != 200:
+            return web.Response(status=status, headers=headers)
+        return web.json_response(body(request) if callable(body) else body, headers=headers)
+
+async def fetch_window(stub: StubAPI, tmp_path, **kwargs):
+    """Fetch one date window from the stub; returns the fetcher and the documents."""
+    app = web.Application()
+    app.router.add_get("/api/v1/documents", stub.documents)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    base_url = f"http://127.0.0.1:{runner.addresses[0][1]}/api/v1/documents"
+    fetcher = FederalRegisterFetcher(output_dir=tmp_path, base_url=base_url, **kwargs)
+    try:
+        async with aiohttp.ClientSession(timeout=fetcher.timeout) as session:
+            documents = await fetcher.fetch_window(session, asyncio.Semaphore(2), "2024-01-01", "2024-01-07")
+        return fetcher, documents
+    finally:
+        await runner.cleanup()
+
+def page(numbers, next_page_url=None, count=None):
+    return {"results": [{"document_number": number} for number in numbers],
+            "next_page_url": next_page_url, "count": count}
+
+def test_follows_next_page_url(tmp_path):
+    stub = StubAPI([
+        (200, lambda request: page(["a", "b"], f"http://{request.host}{request.path}?page=2", 3), {}),
+        (200, page(["c"], count=3), {})
+    ])
+    fetcher, documents = asyncio.run(fetch_window(stub, tmp_path, per_page=2))
+
+    assert [doc["document_number"] for doc in documents] == ["a", "b", "c"]
+    assert fetcher.requests_made == 2
+    first, second = stub.requests
+    assert first.query["conditions[publication_date][gte]"] == "2024-01-01"
+    assert first.query["conditions[publication_date][lte]"] == "2024-01-07"
+    assert first.query["per_page"] == "2"
+    # next_page_url is followed as given
+    assert dict(second.query) == {"page": "2"}
+
+def test_honours_retry_after(tmp_path):
+    # Without Retry-After the backoff would wait a minute
+    stub = StubAPI([(429, None, {"Retry-After": "0"}), (200, page(["a"]), {})])
+    fetcher, documents = asyncio.run(fetch_window(stub, tmp_path, backoff_base=60.0))
+
+    assert [doc["document_number"] for doc in documents] == ["a"]
+    assert fetcher.requests_made == 2
+    assert fetcher.retries == 1
+
+def test_retry_delay(tmp_path):
+    fetcher = FederalRegisterFetcher(output_dir=tmp_path, backoff_base=1.0)
+    assert fetcher._retry_delay(3, "7") == 7.0
+    # Otherwise exponential backoff with up to 50% jitter; HTTP dates are not parsed
+    assert 4.0 <= fetcher._retry_delay(2) <= 6.0
+    assert 4.0 <= fetcher._retry_delay(2, "Wed, 21 Oct 2015 07:28:00 GMT") <= 6.0
+
+def test_gives_up_after_max_retries(tmp_path):
+    stub = StubAPI([(503, None, {})])
+    with pytest.raises(Exception, match="after 3 attempts"):
+        asyncio.run(fetch_window(stub, tmp_path, max_retries=2, backoff_base=0.0))
+    assert len(stub.requests) == 3
+
+def test_does_not_retry_client_errors(tmp_path):
+    stub = StubAPI([(404, None, {})])
+    with pytest.raises(Exception, match="status 404"):
+        asyncio.run(fetch_window(stub, tmp_path, max_retries=2, backoff_base=0.0))
+    assert len(stub.requests) == 1
@@ -0,0 +1,56 @@
+import asyncio
+import json
+import pytest
+from data_pipeline.json_stream import iter_json_array, iter_documents, batched
+
+DOCUMENTS = [
+    {"document_number": "2024-00001", "title": "Rule with \"quotes\", commas and ] brackets",
+     "agencies": [{"id": 1, "name": "EPA"}], "page_views": {"count": 12345}},
+    12345678901234567890,
+    -0.5e-3,
+    "a string with \\ and \\u00e9 and é and \U0001f600",
+    [[], {}, [1, [2, [3]]]],
+    True,
+    False,
+    None,
+    {"abstract": None, "empty": "", "nested": {"a": [True, None]}}
+]
+
+async def collect(items):
+    return [item async for item in items]
+
+def write(tmp_path, text, name="documents.json"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return path
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 16, 64 * 1024])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_elements_split_across_chunks(tmp_path, chunk_size, indent):
+    # Every chunk size cuts values, strings, escapes and separators at different points
+    path = write(tmp_path, json.dumps(DOCUMENTS, indent=indent, ensure_ascii=False))
+    assert asyncio.run(collect(iter_json_array(path, chunk_size))) == DOCUMENTS
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 64 * 1024])
+def test_number_at_end_of_chunk_is_not_truncated(tmp_path, chunk_size):
+    # A chunk may end after "12" of "1234", "-0" of "-0.5e-3" or "1.25E" of "1.25E+10"
+    path = write(tmp_path, "[1234, -0.5e-3,\n1.25E+10,90]")
+    assert asyncio.run(collect(iter_json_array(path, chunk_size))) == [1234, -0.5e-3, 1.25E+10, 90]
+
+@pytest.mark.parametrize("text", ["[]", "  [ ]  ", "\n[\n]\n"])
+def test_empty_array(tmp_path, text):
+    assert asyncio.run(collect(iter_json_array(write(tmp_path, text), 1))) == []
+
+@pytest.mark.parametrize("text", ['{"results": []}', ", [1]", "[1, 2", "[1, {\"a\": ", ""])
+def test_rejects_invalid_input(tmp_path, text):
+    with pytest.raises(ValueError):
+        asyncio.run(collect(iter_json_array(write(tmp_path, text), 3)))
+
+def test_iter_documents_reads_json_lines(tmp_path):
+    path = write(tmp_path, "\n".join(json.dumps(doc) for doc in DOCUMENTS) + "\n\n", "documents.jsonl")
+    assert asyncio.run(collect(iter_documents(path))) == DOCUMENTS
+
+def test_batched(tmp_path):
+    path = write(tmp_path, json.dumps(list(range(7))))
+    batches = asyncio.run(collect(batched(iter_json_array(path, 2), 3)))
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+import aiosqlite
+from data_pipeline.manifest import file_needs_processing, record_file
+from data_pipeline.process_data import FederalRegisterProcessor
+from data_pipeline import processor as mysql_processor
+from data_pipeline.storage import SQLiteRepository
+from data_pipeline.utils import create_sqlite_schema
+
+def raw_documents(count=20):
+    return [{
+        "document_number": f"2024-{i:05d}",
+        "title": f"Document {i}",
+        "abstract": "An abstract",
+        "type": "Rule",
+        "publication_date": "2024-01-02",
+        "agencies": [{"id": 1, "name": "Environmental Protection Agency", "slug": "environmental-protection-agency"}]
+    } for i in range(count)]
+
+def write_raw(path, documents):
+    path.write_text(json.dumps(documents), encoding="utf-8")
+    return path
+
+async def fetch_all(db_path, sql, params=()):
+    async with aiosqlite.connect(db_path) as db:
+        async with db.execute(sql, params) as cursor:
+            return await cursor.fetchall()
+
+async def create_database(db_path):
+    async with aiosqlite.connect(db_path) as db:
+        await create_sqlite_schema(db)
+
+def make_processor(tmp_path):
+    """A processor reading tmp_path/raw, its raw data file and a fresh database."""
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    db_path = tmp_path / "test.db"
+    asyncio.run(create_database(db_path))
+    return FederalRegisterProcessor(raw_dir, batch_size=8), raw_dir / "federal_register_test.json", db_path
+
+def test_unchanged_file_is_skipped(tmp_path):
+    processor, raw_file, db_path = make_processor(tmp_path)
+    write_raw(raw_file, raw_documents())
+
+    assert asyncio.run(processor.process_new_data(db_path, workers=1)) == 20
+    assert asyncio.run(processor.process_new_data(db_path, workers=1)) == 0
+    assert asyncio.run(fetch_all(db_path, "SELECT path, documents FROM processed_files")) == [
+        (str(raw_file.resolve()), 20)
+    ]
+    assert asyncio.run(fetch_all(db_path, "SELECT COUNT(*) FROM document_hashes")) == [(20,)]
+
+def test_touched_file_is_not_reloaded(tmp_path):
+    processor, raw_file, db_path = make_processor(tmp_path)
+    write_raw(raw_file, raw_documents())
+    asyncio.run(processor.process_new_data(db_path, workers=1))
+
+    stat = raw_file.stat()
+    os.utime(raw_file, (stat.st_atime, stat.st_mtime + 60))
+    assert asyncio.run(processor.process_new_data(db_path, workers=1)) == 0
+    # The new mtime is recorded, so the next run does not hash the file again
+    assert asyncio.run(fetch_all(db_path, "SELECT mtime, documents FROM processed_files")) == [
+        (stat.st_mtime + 60, 20)
+    ]
+
+def test_changed_file_writes_only_changed_documents(tmp_path):
+    processor, raw_file, db_path = make_processor(tmp_path)
+    documents = raw_documents()
+    write_raw(raw_file, documents)
+    asyncio.run(processor.process_new_data(db_path, workers=1))
+
+    documents[3]["title"] = "Corrected title"
+    documents.append(dict(documents[0], document_number="2024-99999"))
+    write_raw(raw_file, documents)
+    assert asyncio.run(processor.process_new_data(db_path, workers=1)) == 2
+    assert asyncio.run(fetch_all(
+        db_path, "SELECT title FROM federal_register_documents WHERE id = ?", ("2024-00003",)
+    )) == [("Corrected title",)]
+    assert asyncio.run(fetch_all(db_path, "SELECT documents FROM processed_files")) == [(21,)]
+
+def test_failed_file_is_retried(tmp_path):
+    processor, raw_file, db_path = make_processor(tmp_path)
+    raw_file.write_text(json.dumps(raw_documents())[:-40], encoding="utf-8")
+
+    assert asyncio.run(processor.process_new_data(db_path, workers=1)) == 0
+    assert asyncio.run(fetch_all(db_path, "SELECT COUNT(*) FROM processed_files")) == [(0,)]
+
+    # Batches committed before the error are not written again
+    write_raw(raw_file, raw_documents())
+    assert asyncio.run(processor.process_new_data(db_path, workers=1)) == 4
+    assert asyncio.run(fetch_all(db_path, "SELECT COUNT(*) FROM federal_register_documents")) == [(20,)]
+    assert asyncio.run(fetch_all(db_path, "SELECT documents FROM processed_files")) == [(20,)]
+
+def test_file_needs_processing(tmp_path):
+    raw_file = write_raw(tmp_path / "federal_register_test.json", raw_documents(2))
+
+    async def run():
+        async with aiosqlite.connect(tmp_path / "test.db") as db:
+            await create_sqlite_schema(db)
+            needs_processing, content_hash = await file_needs_processing(db, raw_file)
+            assert needs_processing and len(content_hash) == 64
+            await record_file(db, raw_file, content_hash, 2)
+            assert await file_needs_processing(db, raw_file) == (False, content_hash)
+
+            write_raw(raw_file, raw_documents(3))
+            needs_processing, new_hash = await file_needs_processing(db, raw_file)
+            assert needs_processing and new_hash != content_hash
+
+    asyncio.run(run())
+
+def test_repository_loader_skips_unchanged(tmp_path):
+    # The MySQL loader goes through the repository layer; SQLite stands in for MySQL here
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    raw_file = write_raw(raw_dir / "federal_register_test.json", raw_documents())
+    loader = mysql_processor.FederalRegisterProcessor(raw_dir, batch_size=8)
+
+    async def run():
+        async with SQLiteRepository(tmp_path / "test.db") as repository:
+            assert await loader.process_new_data(repository) == 20
+            assert await loader.process_new_data(repository) == 0
+
+            documents = raw_documents()
+            documents[5]["abstract"] = "A revised abstract"
+            write_raw(raw_file, documents)
+            assert await loader.process_new_data(repository) == 1
+            async with repository.acquire() as conn:
+                assert await conn.fetch_all("SELECT documents FROM processed_files") == [(20,)]
+                assert await conn.fetch_one(
+                    "SELECT abstract FROM federal_register_documents WHERE id = ?", ("2024-00005",)
+                ) == ("A revised abstract",)
+
+    asyncio.run(run())
+
+def test_repository_loader_writes_payload_only_changes(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    raw_file = write_raw(raw_dir / "federal_register_test.json", raw_documents())
+    loader = mysql_processor.FederalRegisterProcessor(raw_dir, batch_size=8)
+
+    async def run():
+        async with SQLiteRepository(tmp_path / "test.db") as repository:
+            await loader.process_new_data(repository)
+
+            # Same agency name, so only raw_json and the agency rows change
+            documents = raw_documents()
+            documents[5]["agencies"] = [dict(documents[5]["agencies"][0], id=2, slug="epa")]
+            write_raw(raw_file, documents)
+            assert await loader.process_new_data(repository) == 1
+            async with repository.acquire() as conn:
+                assert await conn.fetch_all(
+                    "SELECT agency_id FROM document_agencies WHERE document_id = ?", ("2024-00005",)
+                ) == [(2,)]
+
+    asyncio.run(run())
+
+def test_repository_loader_keeps_touched_mtime(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    raw_file = write_raw(raw_dir / "federal_register_test.json", raw_documents())
+    loader = mysql_processor.FederalRegisterProcessor(raw_dir, batch_size=8)
+
+    async def run():
+        async with SQLiteRepository(tmp_path / "test.db") as repository:
+            await loader.process_new_data(repository)
+            stat = raw_file.stat()
+            os.utime(raw_file, (stat.st_atime, stat.st_mtime + 60))
+            assert await loader.process_new_data(repository) == 0
+        # Read on a fresh connection: the refreshed mtime was committed
+        assert await fetch_all(tmp_path / "test.db", "SELECT mtime FROM processed_files") == [
+            (stat.st_mtime + 60,)
+        ]
+
+    asyncio.run(run())
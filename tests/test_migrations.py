@@ -0,0 +1,52 @@
+import asyncio
+import aiosqlite
+from data_pipeline.migrations import apply_migrations, applied_versions
+from data_pipeline.utils import create_sqlite_schema
+
+LEGACY_TABLE_SQL = """
+CREATE TABLE federal_register_documents (
+    id TEXT PRIMARY KEY,
+    document_number TEXT,
+    title TEXT,
+    abstract TEXT,
+    document_type TEXT,
+    publication_date TEXT,
+    agency_names TEXT,
+    raw_json TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+async def table_sql(db):
+    async with db.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'federal_register_documents'"
+    ) as cursor:
+        return (await cursor.fetchone())[0]
+
+def test_fresh_database_is_not_rebuilt(tmp_path):
+    async def run():
+        async with aiosqlite.connect(tmp_path / "test.db") as db:
+            await create_sqlite_schema(db)
+            assert await applied_versions(db) == [1, 2]
+            # Still the table create_sqlite_schema made, not the migration's copy
+            assert "stable rowid" in await table_sql(db)
+
+    asyncio.run(run())
+
+def test_legacy_table_keeps_its_rowids(tmp_path):
+    async def run():
+        async with aiosqlite.connect(tmp_path / "test.db") as db:
+            await db.execute(LEGACY_TABLE_SQL)
+            await db.executemany(
+                "INSERT INTO federal_register_documents (rowid, id, title) VALUES (?, ?, ?)",
+                [(7, "2024-00001", "First"), (9, "2024-00002", "Second")]
+            )
+            await db.commit()
+
+            assert await apply_migrations(db) == [1, 2]
+            async with db.execute("SELECT doc_rowid, id FROM federal_register_documents ORDER BY id") as cursor:
+                assert await cursor.fetchall() == [(7, "2024-00001"), (9, "2024-00002")]
+            assert await apply_migrations(db) == []
+
+    asyncio.run(run())
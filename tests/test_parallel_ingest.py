@@ -0,0 +1,117 @@
+import asyncio
+import json
+import aiosqlite
+import pytest
+from data_pipeline.parallel_ingest import plan_shards, _read_shard
+from data_pipeline.payloads import load_payloads
+from data_pipeline.process_data import FederalRegisterProcessor
+from data_pipeline.utils import create_sqlite_schema
+from data_pipeline.vector_index import VectorIndex
+
+AGENCIES = [
+    {"id": 1, "name": "Environmental Protection Agency", "slug": "environmental-protection-agency"},
+    {"id": 2, "name": "Commerce Department", "slug": "commerce-department"},
+    {"id": 3, "name": "Census Bureau", "slug": "census-bureau", "parent_id": 2}
+]
+
+def raw_documents(first, count):
+    return [{
+        "document_number": f"2024-{i:05d}",
+        "title": f"Document {i} on {'air quality' if i % 2 else 'trade statistics'}",
+        "abstract": f"Abstract of document {i}",
+        "type": ["Rule", "Notice", "Proposed Rule"][i % 3],
+        "publication_date": f"2024-03-{1 + i % 28:02d}",
+        "agencies": AGENCIES[i % 3:i % 3 + 2]
+    } for i in range(first, first + count)]
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    """A JSON array file and a JSON Lines file, overlapping on a few documents."""
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    documents = raw_documents(0, 40)
+    # Dropped by normalize_document
+    documents.append({"document_number": "2024-99999", "title": "", "publication_date": "2024-03-01"})
+    (raw_dir / "federal_register_a.json").write_text(json.dumps(documents), encoding="utf-8")
+    lines = [json.dumps(doc) for doc in raw_documents(35, 40)]
+    (raw_dir / "federal_register_b.jsonl").write_text("\n\n".join(lines) + "\n", encoding="utf-8")
+    return raw_dir
+
+async def load(raw_dir, db_path, workers):
+    """Load raw_dir into a fresh database; returns the documents written by a first and a second run."""
+    async with aiosqlite.connect(db_path) as db:
+        await create_sqlite_schema(db)
+    processor = FederalRegisterProcessor(raw_dir, batch_size=16)
+    return (await processor.process_new_data(db_path, workers=workers),
+            await processor.process_new_data(db_path, workers=workers))
+
+async def contents(db_path):
+    """Everything an ingest stores, independent of how payloads were compressed."""
+    queries = {
+        "documents": "SELECT id, document_number, title, abstract, document_type, publication_date, "
+                     "agency_names FROM federal_register_documents ORDER BY id",
+        "agencies": "SELECT * FROM agencies ORDER BY id",
+        "links": "SELECT * FROM document_agencies ORDER BY document_id, agency_id",
+        "hashes": "SELECT * FROM document_hashes ORDER BY id",
+        "files": "SELECT path, content_hash, documents FROM processed_files ORDER BY path",
+        "search": "SELECT rowid FROM documents_fts WHERE documents_fts MATCH 'quality' ORDER BY rowid"
+    }
+    result = {}
+    async with aiosqlite.connect(db_path) as db:
+        for name, sql in queries.items():
+            async with db.execute(sql) as cursor:
+                result[name] = await cursor.fetchall()
+        result["payloads"] = await load_payloads(db, [row[0] for row in result["documents"]])
+    index = VectorIndex.for_database(db_path)
+    index.load()
+    # Every document, ranked: the same ids with the same vectors
+    result["vectors"] = index.search("air quality", k=len(index))
+    return result
+
+def test_parallel_load_matches_serial(tmp_path, raw_dir):
+    serial = asyncio.run(load(raw_dir, tmp_path / "serial.db", 1))
+    parallel = asyncio.run(load(raw_dir, tmp_path / "parallel.db", 2))
+    # 75 distinct documents; the second run skips both files
+    assert serial == parallel == (75, 0)
+
+    expected = asyncio.run(contents(tmp_path / "serial.db"))
+    actual = asyncio.run(contents(tmp_path / "parallel.db"))
+    assert len(expected["documents"]) == 75
+    assert expected["payloads"]["2024-00001"]["agencies"] == AGENCIES[1:3]
+    for name in expected:
+        assert actual[name] == expected[name], name
+
+def test_parallel_load_writes_only_changed_documents(tmp_path, raw_dir):
+    asyncio.run(load(raw_dir, tmp_path / "parallel.db", 2))
+    documents = raw_documents(35, 40)
+    documents[10]["abstract"] = "A corrected abstract"
+    (raw_dir / "federal_register_b.jsonl").write_text(
+        "".join(json.dumps(doc) + "\n" for doc in documents), encoding="utf-8"
+    )
+
+    processor = FederalRegisterProcessor(raw_dir, batch_size=16)
+    assert asyncio.run(processor.process_new_data(tmp_path / "parallel.db", workers=2)) == 1
+
+@pytest.mark.parametrize("parts", [1, 2, 3, 7, 50])
+def test_shards_cover_each_line_once(raw_dir, parts):
+    path = raw_dir / "federal_register_b.jsonl"
+    whole = _read_shard(path, 0, 1)
+    assert len(whole) == 40
+    assert [doc for part in range(parts) for doc in _read_shard(path, part, parts)] == whole
+
+def test_json_array_is_one_shard(raw_dir):
+    path = raw_dir / "federal_register_a.json"
+    assert len(_read_shard(path, 0, 1)) == 41
+    with pytest.raises(ValueError):
+        _read_shard(path, 0, 2)
+
+def test_plan_shards(raw_dir):
+    array, lines = sorted(raw_dir.iterdir())
+    # Fewer files than workers: a JSON Lines file is split so every worker gets a shard
+    assert plan_shards([lines], workers=3) == [(lines, part, 3) for part in range(3)]
+    assert plan_shards([array], workers=3) == [(array, 0, 1)]
+
+    shards = plan_shards([array, lines], workers=2, chunk_bytes=1024)
+    parts = -(-lines.stat().st_size // 1024)
+    assert array.stat().st_size > 1024 and parts > 1
+    assert shards == [(array, 0, 1)] + [(lines, part, parts) for part in range(parts)]
@@ -0,0 +1,37 @@
+import asyncio
+from data_pipeline.process_data import document_row, parse_document
+from data_pipeline.processor import process_document
+from data_pipeline.scheduler import IngestScheduler, StageStats, _DONE
+from data_pipeline.storage import SQLiteRepository
+
+def parsed_documents(abstract="An abstract"):
+    return [parse_document(document_row(process_document({
+        "document_number": f"2024-{i:05d}",
+        "title": f"Document {i}",
+        "abstract": abstract if i == 0 else "An abstract",
+        "type": "Notice",
+        "publication_date": "2024-02-01",
+        "agencies": [{"id": 1, "name": "Environmental Protection Agency"}]
+    })), [{"id": 1, "name": "Environmental Protection Agency"}]) for i in range(6)]
+
+async def write(conn, batches):
+    """Run the write stage over batches without a vector index, as on MySQL."""
+    queue = asyncio.Queue()
+    for batch in batches + [_DONE]:
+        await queue.put(batch)
+    stats = StageStats("write")
+    await IngestScheduler(archive=False)._write(conn, queue, stats)
+    return stats.rows
+
+def test_write_stage_skips_unchanged_documents_without_vector_index(tmp_path):
+    async def run():
+        async with SQLiteRepository(tmp_path / "test.db") as repository:
+            await repository.ensure_schema()
+            async with repository.acquire() as conn:
+                documents = parsed_documents()
+                assert await write(conn, [documents[:4], documents[4:]]) == 6
+                assert await write(conn, [documents]) == 0
+                assert await write(conn, [parsed_documents("A revised abstract")]) == 1
+                assert (await conn.fetch_one("SELECT COUNT(*) FROM document_hashes"))[0] == 6
+
+    asyncio.run(run())
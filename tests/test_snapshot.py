@@ -0,0 +1,117 @@
+import asyncio
+import json
+import pytest
+from data_pipeline.process_data import FederalRegisterProcessor
+from data_pipeline.snapshot import (
+    build_snapshot, current_snapshot, pointer_path, prune_snapshots, snapshot_dir
+)
+from data_pipeline.storage import SQLiteRepository
+from data_pipeline.vector_index import VectorIndex
+
+def write_raw(raw_dir, name, first, count):
+    documents = [{
+        "document_number": f"2024-{i:05d}",
+        "title": f"Document {i}",
+        "abstract": "An abstract",
+        "type": "Notice",
+        "publication_date": "2024-02-01",
+        "agencies": []
+    } for i in range(first, first + count)]
+    (raw_dir / f"federal_register_{name}.json").write_text(json.dumps(documents), encoding="utf-8")
+
+@pytest.fixture
+def setup(tmp_path):
+    """Database path and a processor reading tmp_path/raw."""
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    return tmp_path / "rag_chat.db", FederalRegisterProcessor(raw_dir), raw_dir
+
+async def document_count(repository):
+    async with repository.acquire() as conn:
+        return (await conn.fetch_one("SELECT COUNT(*) FROM federal_register_documents"))[0]
+
+def test_build_publishes_snapshot(setup):
+    db_path, processor, raw_dir = setup
+    write_raw(raw_dir, "a", 0, 10)
+
+    summary = asyncio.run(build_snapshot(db_path, processor))
+    published = snapshot_dir(db_path) / summary["snapshot"]
+    assert summary["status"] == "success"
+    assert summary["documents"] == summary["documents_written"] == 10
+    assert current_snapshot(db_path) == published
+    assert pointer_path(db_path).read_text() == published.name
+    # The vector index moves with the database; the staging directory is gone
+    assert VectorIndex.for_database(published).meta_path.exists()
+    assert [path.name for path in snapshot_dir(db_path).iterdir() if path.is_dir()] == []
+    assert not db_path.exists()
+
+def test_next_build_starts_from_published_snapshot(setup):
+    db_path, processor, raw_dir = setup
+    write_raw(raw_dir, "a", 0, 10)
+    first = asyncio.run(build_snapshot(db_path, processor))
+
+    write_raw(raw_dir, "b", 10, 5)
+    second = asyncio.run(build_snapshot(db_path, processor))
+    assert second["source"] == first["snapshot"]
+    assert second["documents_written"] == 5
+    assert second["documents"] == 15
+    assert current_snapshot(db_path).name == second["snapshot"]
+
+def test_failed_build_keeps_published_snapshot(setup):
+    db_path, processor, raw_dir = setup
+    write_raw(raw_dir, "a", 0, 10)
+    first = asyncio.run(build_snapshot(db_path, processor))
+
+    class FailingProcessor:
+        async def process_new_data(self, db_path):
+            raise RuntimeError("ingest failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(build_snapshot(db_path, FailingProcessor()))
+    assert current_snapshot(db_path).name == first["snapshot"]
+    # The staged copy is removed with its staging directory
+    assert [path.name for path in snapshot_dir(db_path).iterdir() if path.is_dir()] == []
+    assert [path.name for path in snapshot_dir(db_path).glob("*.db")] == [first["snapshot"]]
+
+def test_builds_prune_old_snapshots(setup):
+    db_path, processor, raw_dir = setup
+    names = []
+    for build in range(3):
+        write_raw(raw_dir, str(build), build * 5, 5)
+        summary = asyncio.run(build_snapshot(db_path, processor))
+        names.append(summary["snapshot"])
+
+    assert summary["pruned"] == [names[0]]
+    assert sorted(path.name for path in snapshot_dir(db_path).glob("*.db")) == names[1:]
+    assert list(snapshot_dir(db_path).glob(f"{names[0][:-3]}.*")) == []
+
+def test_prune_never_removes_published_snapshot(tmp_path):
+    db_path = tmp_path / "rag_chat.db"
+    directory = snapshot_dir(db_path)
+    directory.mkdir()
+    names = [f"rag_chat-2024010{day}000000000000.db" for day in range(1, 5)]
+    for name in names:
+        (directory / name).write_bytes(b"")
+    # Published, but older than the newest two
+    pointer_path(db_path).write_text(names[0])
+
+    removed = prune_snapshots(db_path, keep=2)
+    assert sorted(path.name for path in removed) == [names[1]]
+    assert sorted(path.name for path in directory.iterdir()) == [names[0], names[2], names[3]]
+
+def test_readers_switch_on_next_checkout(setup):
+    db_path, processor, raw_dir = setup
+    write_raw(raw_dir, "a", 0, 10)
+    asyncio.run(build_snapshot(db_path, processor))
+
+    async def run():
+        async with SQLiteRepository(db_path, readonly=True, pool_size=2) as repository:
+            assert await document_count(repository) == 10
+            async with repository.acquire() as held:
+                write_raw(raw_dir, "b", 10, 5)
+                await build_snapshot(db_path, processor)
+                # A connection in use finishes on the snapshot it opened
+                assert (await held.fetch_one("SELECT COUNT(*) FROM federal_register_documents"))[0] == 10
+                assert await document_count(repository) == 15
+
+    asyncio.run(run())